@@ -0,0 +1,148 @@
+"""
+In-process execution of `/batch` sub-requests.
+
+Each sub-request is dispatched straight into the ASGI application with a
+scope derived from the batch request, so it goes through the same routing,
+validation and dependencies as a normal call, without another HTTP round
+trip. The batch authenticates once: sub-requests carry the verified user id
+in their scope and `get_current_user` loads the user by primary key instead
+of decoding the token again.
+
+In parallel mode only reads run concurrently. Writes still run one after
+another, in request order, since concurrent read-modify-write updates of one
+user's balance in separate sessions could lose each other. An unhandled
+error in a sub-request answers that item with 500; the other items, which
+may already have committed, are still returned.
+"""
+import asyncio
+import json
+import logging
+from typing import List
+from urllib.parse import urlencode
+
+from fastapi import Request
+
+from app.schemas import batch as batch_schemas
+
+logger = logging.getLogger(__name__)
+
+# Scope key holding the id of the user the batch was authenticated as
+BATCH_USER_KEY = "ziver.batch_user_id"
+
+# Paths that cannot run inside a batch (nested batches, endless streams)
+EXCLUDED_PATHS = ("/batch", "/users/me/events", "/logout", "/logout-all")
+
+# Response headers worth passing back to the client
+FORWARDED_HEADERS = ("etag", "cache-control", "location")
+
+
+def _sub_scope(parent: Request, item: batch_schemas.BatchItem, body: bytes, user_id: int) -> dict:
+    headers = [
+        (name, value)
+        for name, value in parent.scope["headers"]
+        if name not in (b"content-length", b"content-type", b"if-none-match")
+    ]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    return {
+        "type": "http",
+        "asgi": parent.scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent.scope.get("http_version", "1.1"),
+        "method": item.method,
+        "scheme": parent.scope.get("scheme", "http"),
+        "server": parent.scope.get("server"),
+        "client": parent.scope.get("client"),
+        "root_path": parent.scope.get("root_path", ""),
+        "path": item.path,
+        "raw_path": item.path.encode(),
+        "query_string": urlencode(item.query or {}).encode(),
+        "headers": headers,
+        "state": {},
+        BATCH_USER_KEY: user_id,
+    }
+
+
+async def _dispatch(
+    parent: Request, item: batch_schemas.BatchItem, user_id: int
+) -> batch_schemas.BatchItemResponse:
+    if item.path.rstrip("/") in EXCLUDED_PATHS:
+        return batch_schemas.BatchItemResponse(
+            id=item.id, status=400, body={"detail": f"{item.path} cannot be used in a batch."}
+        )
+
+    body = json.dumps(item.body).encode() if item.body is not None else b""
+    scope = _sub_scope(parent, item, body, user_id)
+    request_sent = False
+    status_code = 500
+    response_headers = {}
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            for name, value in message.get("headers", []):
+                name = name.decode("latin-1").lower()
+                if name in FORWARDED_HEADERS:
+                    response_headers[name] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await parent.app(scope, receive, send)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Batch sub-request %s %s failed", item.method, item.path)
+        return batch_schemas.BatchItemResponse(
+            id=item.id, status=500, body={"detail": "Internal Server Error"}
+        )
+
+    raw = b"".join(chunks)
+    try:
+        content = json.loads(raw) if raw else None
+    except ValueError:
+        content = raw.decode("utf-8", errors="replace")
+    return batch_schemas.BatchItemResponse(
+        id=item.id, status=status_code, headers=response_headers, body=content
+    )
+
+
+async def run_batch(
+    request: Request, batch: batch_schemas.BatchRequest, user_id: int
+) -> List[batch_schemas.BatchItemResponse]:
+    """Runs the sub-requests in order or concurrently, as the batch declares."""
+    if batch.mode == "parallel":
+        writes = [item for item in batch.requests if item.method != "GET"]
+
+        async def run_writes():
+            return [await _dispatch(request, item, user_id) for item in writes]
+
+        results = await asyncio.gather(
+            run_writes(),
+            *(_dispatch(request, item, user_id) for item in batch.requests if item.method == "GET"),
+        )
+        write_responses, read_responses = iter(results[0]), iter(results[1:])
+        return [
+            next(read_responses) if item.method == "GET" else next(write_responses)
+            for item in batch.requests
+        ]
+
+    responses = []
+    for index, item in enumerate(batch.requests):
+        response = await _dispatch(request, item, user_id)
+        responses.append(response)
+        if batch.stop_on_error and response.status >= 400:
+            responses.extend(
+                batch_schemas.BatchItemResponse(
+                    id=skipped.id, status=424, body={"detail": "Skipped after an earlier failure."}
+                )
+                for skipped in batch.requests[index + 1:]
+            )
+            break
+    return responses
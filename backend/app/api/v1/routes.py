@@ -5,37 +5,56 @@ This module defines all the API endpoints for user management, authentication,
 mining, tasks, micro-jobs, and referrals.
 """
 # --- Standard Library Imports ---
-from datetime import datetime, timedelta, timezone
-from typing import List, Annotated
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Annotated, Literal, Optional
 
 # --- Third-Party Imports ---
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 # --- Application-Specific Imports ---
-from app.core import security
+from app.api.v1 import batch
+from app.core import etag, profiling, security, singleflight, threadpools
 from app.core.config import settings
-from app.db import database, models
+from app.db import database, models, slow_queries
 from app.schemas import (
+    analytics as analytics_schemas,
+    batch as batch_schemas,
+    dashboard as dashboard_schemas,
     mining as mining_schemas,
     microjob as microjob_schemas,
+    profiling as profiling_schemas,
     referral as referral_schemas,
+    slow_query as slow_query_schemas,
     sponsored_task as sponsored_task_schemas,
+    single_flight as single_flight_schemas,
+    sybil as sybil_schemas,
     task as task_schemas,
+    threadpool as threadpool_schemas,
     user as user_schemas,
     wallet as wallet_schemas,
 )
 from app.services import (
+    analytics as analytics_service,
+    dashboard as dashboard_service,
+    exports as exports_service,
     mining as mining_service,
     microjobs as microjobs_service,
+    realtime as realtime_service,
     referrals as referrals_service,
+    sybil as sybil_service,
     tasks as tasks_service,
+    token_revocation,
+    ton_proof as ton_proof_service,
     two_factor_auth as two_fa_service,
+    wallets as wallets_service,
 )
 
 # --- Router & Auth Setup ---
-router = APIRouter()
+router = APIRouter(route_class=profiling.ProfiledRoute)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/token")
 
 # =================================================================
@@ -43,26 +62,37 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/token")
 # =================================================================
 
 async def get_current_user(
+    request: Request,
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[Session, Depends(database.get_db)],
 ):
     """
     Dependency to get the current authenticated user from a JWT token.
-    Validates the token and fetches the user from the database.
+    Validates the token, fetches the user from the database and rejects
+    revoked tokens. The token's claims are kept in `request.state`.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Sub-requests of a batch were authenticated once by the batch itself.
+    batch_user_id = request.scope.get(batch.BATCH_USER_KEY)
+    if batch_user_id is not None:
+        user = db.get(models.User, batch_user_id)
+        if user is None:
+            raise credentials_exception
+        return user
+
     payload = security.decode_access_token(token)
     if not payload or not payload.get("sub"):
         raise credentials_exception
 
     email: str = payload.get("sub")
     user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+    if user is None or not token_revocation.is_token_valid(db, user, payload):
         raise credentials_exception
+    request.state.token_claims = payload
     return user
 
 
@@ -77,6 +107,17 @@ async def get_active_user(
     return current_user
 
 
+async def get_admin_user(
+    current_user: Annotated[models.User, Depends(get_active_user)]
+):
+    """Dependency to ensure the current user is an administrator."""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required"
+        )
+    return current_user
+
+
 # =================================================================
 #              --- AUTHENTICATION & USER MANAGEMENT ---
 # =================================================================
@@ -86,6 +127,7 @@ async def get_active_user(
     response_model=user_schemas.UserResponse,
     status_code=status.HTTP_201_CREATED,
 )
+@threadpools.in_pool(threadpools.auth_pool)
 def register_user(
     user: user_schemas.UserCreate, db: Annotated[Session, Depends(database.get_db)]
 ):
@@ -134,6 +176,7 @@ def register_user(
 
 
 @router.post("/token", response_model=user_schemas.Token)
+@threadpools.in_pool(threadpools.auth_pool)
 def login_for_access_token(
     login_data: user_schemas.UserLoginWith2FA,
     db: Annotated[Session, Depends(database.get_db)],
@@ -172,29 +215,184 @@ def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    request: Request,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Revokes the access token used for this request."""
+    token_revocation.revoke_token(db, current_user, request.state.token_claims)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_all(
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Revokes every access token issued to the current user so far."""
+    token_revocation.revoke_all_tokens(db, current_user)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/users/me/2fa/enable", response_model=user_schemas.TwoFASetupResponse)
+async def enable_two_factor_auth(
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+    qr_format: Annotated[
+        str, Query(alias="format", description="QR code image format: png or svg")
+    ] = "png",
+):
+    """
+    Starts 2FA setup, or resumes a pending one, and returns the secret with
+    its QR code. 2FA is enabled once a code is confirmed.
+    """
+    # Reject a bad format before a pending secret is stored
+    two_fa_service.check_qr_format(qr_format)
+    secret = await threadpools.twofa_pool.run(two_fa_service.begin_2fa_setup, db, current_user)
+    return await two_fa_service.get_setup_payload(secret, current_user.email, qr_format)
+
+
+@router.post("/users/me/2fa/confirm", status_code=status.HTTP_204_NO_CONTENT)
+@threadpools.in_pool(threadpools.twofa_pool)
+def confirm_two_factor_auth(
+    two_fa: user_schemas.TwoFACode,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Enables 2FA after verifying a first code from the authenticator app."""
+    two_fa_service.confirm_2fa_setup(db, current_user, two_fa.code)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/users/me/2fa/disable", status_code=status.HTTP_204_NO_CONTENT)
+@threadpools.in_pool(threadpools.twofa_pool)
+def disable_two_factor_auth(
+    two_fa: user_schemas.TwoFACode,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Disables 2FA after verifying a current code; other sessions are logged out."""
+    two_fa_service.disable_2fa_for_user(db, current_user, two_fa.code)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.get("/users/me", response_model=user_schemas.UserResponse)
-def read_users_me(current_user: Annotated[models.User, Depends(get_active_user)]):
-    """Retrieves the profile of the current authenticated user."""
+@threadpools.in_pool(threadpools.reads_pool)
+def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+):
+    """
+    Retrieves the profile of the current authenticated user.
+    Answers 304 when `If-None-Match` matches the profile's ETag.
+    """
+    tag = etag.make_etag(
+        "user", current_user.id, current_user.updated_at or current_user.created_at
+    )
+    if etag.is_not_modified(request, tag):
+        return etag.not_modified(tag)
+    etag.set_etag(response, tag)
     return current_user
 
 
+@router.get(
+    "/dashboard",
+    response_model=dashboard_schemas.DashboardResponse,
+    response_model_exclude_unset=True,
+)
+def read_dashboard(
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+    fields: Annotated[
+        Optional[str],
+        Query(description="Comma-separated sections: user, mining, tasks, microjobs, referrals"),
+    ] = None,
+):
+    """
+    Everything the app shows on open in one request: profile, mining status,
+    available tasks, the user's micro-jobs and referral summary. Use `fields`
+    to fetch only the sections the client renders.
+    """
+    return dashboard_service.get_dashboard(db, current_user, fields)
+
+
+@router.post("/batch", response_model=batch_schemas.BatchResponse)
+async def run_batch(
+    batch_request: batch_schemas.BatchRequest,
+    request: Request,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """
+    Runs several API calls in one request. Sub-requests target the routes of
+    this API, share the batch's authentication and run in order or in
+    parallel as declared. Each gets its own status and body in the response.
+    """
+    if len(batch_request.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.BATCH_MAX_REQUESTS} requests.",
+        )
+    user_id = current_user.id
+    # Sub-requests use their own sessions; release this one's connection.
+    db.close()
+    responses = await batch.run_batch(request, batch_request, user_id)
+    return {"responses": responses}
+
+
+@router.get("/users/me/events")
+async def stream_user_events(
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """
+    Server-Sent Events stream of the current user's mining, balance and task
+    events. Replaces polling `/users/me` for cycle completion.
+    """
+    # Detach the user and release the DB connection for the stream's lifetime.
+    db.expunge(current_user)
+    db.close()
+    return StreamingResponse(
+        realtime_service.user_event_stream(current_user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/users/me/ton-proof-payload", response_model=wallet_schemas.TonProofPayloadResponse)
+def get_ton_proof_payload(
+    current_user: Annotated[models.User, Depends(get_active_user)],
+):
+    """Issues the payload the user's wallet signs in its `ton_proof`."""
+    payload, expires_at = ton_proof_service.issue_payload(current_user.id)
+    return {"payload": payload, "expires_at": expires_at}
+
+
 @router.post("/users/me/link-wallet", response_model=user_schemas.UserResponse)
-def link_ton_wallet(
+async def link_ton_wallet(
     wallet_data: wallet_schemas.WalletLinkRequest,
     current_user: Annotated[models.User, Depends(get_active_user)],
     db: Annotated[Session, Depends(database.get_db)],
 ):
-    """Links a TON wallet address to the current user's profile."""
-    if db.query(models.User).filter(
-        models.User.ton_wallet_address == wallet_data.wallet_address
-    ).first():
+    """
+    Links a TON wallet address to the current user's profile. A `ton_proof`
+    of ownership is verified when given, and required when
+    `TON_PROOF_REQUIRED` is set.
+    """
+    address = wallets_service.parse_wallet_address(wallet_data.wallet_address)
+    if wallet_data.proof is not None:
+        await ton_proof_service.check_ownership(current_user.id, address, wallet_data.proof)
+    elif settings.TON_PROOF_REQUIRED:
         raise HTTPException(
-            status_code=409, detail="This wallet address is already linked to another account."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A ton_proof of wallet ownership is required.",
         )
-    current_user.ton_wallet_address = wallet_data.wallet_address
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    return await run_in_threadpool(
+        wallets_service.link_wallet, db, current_user, wallet_data.wallet_address, address
+    )
 
 
 @router.post("/users/me/daily-checkin", response_model=mining_schemas.ZPClaimResponse)
@@ -224,8 +422,10 @@ def perform_daily_checkin(
     current_user.zp_balance += zp_bonus
     current_user.social_capital_score += zp_bonus
     db.add(current_user)
+    analytics_service.record_checkin(db, zp_bonus)
     db.commit()
     db.refresh(current_user)
+    realtime_service.publish_balance_changed(current_user)
     return {
         "message": (
             f"Daily check-in successful! You received {zp_bonus} ZP. "
@@ -267,11 +467,80 @@ def upgrade_miner_stats(
     """Upgrades the user's ZP miner capabilities."""
     return mining_service.upgrade_miner(db, current_user, upgrade_req)
 
+# =================================================================
+#                     --- INTERACTIVE TASKS ---
+# =================================================================
+
+
+@router.get("/tasks", response_model=List[task_schemas.TaskResponse])
+@threadpools.in_pool(threadpools.reads_pool)
+def list_available_tasks(
+    request: Request,
+    response: Response,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """
+    Lists the active tasks the current user has not completed yet.
+    Answers 304 when `If-None-Match` matches the list's ETag.
+    """
+    tag = etag.make_etag(
+        "tasks", current_user.id, *tasks_service.get_available_tasks_version(db, current_user.id)
+    )
+    if etag.is_not_modified(request, tag):
+        return etag.not_modified(tag)
+    etag.set_etag(response, tag)
+    return tasks_service.get_available_tasks(db, current_user.id)
+
+
+@router.post(
+    "/tasks/sponsor",
+    response_model=task_schemas.TaskResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_sponsored_task(
+    task_data: sponsored_task_schemas.UserSponsoredTaskCreate,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Creates a user-sponsored task paid for with ZP."""
+    return tasks_service.create_sponsored_task(db, current_user, task_data)
+
+
+@router.post("/tasks/{task_id}/complete", response_model=task_schemas.TaskCompletionResponse)
+def complete_task(
+    task_id: int,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Marks a task as completed by the current user and awards its ZP."""
+    return tasks_service.complete_task(db, current_user, task_id)
+
 # =================================================================
 #                  --- MICRO-JOB MARKETPLACE ---
 # =================================================================
 
 
+@router.get("/microjobs", response_model=List[microjob_schemas.MicroJobResponse])
+@threadpools.in_pool(threadpools.reads_pool)
+def list_microjobs(
+    request: Request,
+    response: Response,
+    current_user: Annotated[models.User, Depends(get_active_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """
+    Lists the active, funded micro-jobs of the public feed.
+    Answers 304 when `If-None-Match` matches the feed's ETag.
+    """
+    version = microjobs_service.get_public_feed_version(db)
+    tag = etag.make_etag("microjobs", *version)
+    if etag.is_not_modified(request, tag):
+        return etag.not_modified(tag)
+    etag.set_etag(response, tag)
+    return microjobs_service.get_public_feed(db, version)
+
+
 @router.post(
     "/microjobs",
     response_model=microjob_schemas.MicroJobResponse,
@@ -286,4 +555,148 @@ def create_new_microjob(
     return microjobs_service.create_microjob(db, current_user, job_data)
 
 
+# =================================================================
+#                        --- ADMIN ---
+# =================================================================
+
+
+@router.get("/admin/stats/daily", response_model=analytics_schemas.DailyStatsResponse)
+def read_daily_stats(
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+    start: Annotated[Optional[date], Query(description="First day (UTC), default 30 days ago")] = None,
+    end: Annotated[Optional[date], Query(description="Last day (UTC), default today")] = None,
+    metrics: Annotated[
+        Optional[str], Query(description="Comma-separated metrics; all by default")
+    ] = None,
+):
+    """
+    Daily ZP issued by source, active miners, task completions and micro-job
+    volume and fees, read from the analytics rollups.
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    selected = [metric.strip() for metric in metrics.split(",") if metric.strip()] if metrics else None
+    return {
+        "start": start,
+        "end": end,
+        "stats": analytics_service.get_daily_stats(db, start, end, selected),
+    }
+
+
+@router.get("/admin/exports/{dataset}")
+def export_dataset(
+    dataset: str,
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+    export_format: Annotated[str, Query(alias="format", description="csv or jsonl")] = "csv",
+    gzip: bool = False,
+    columns: Annotated[Optional[str], Query(description="Comma-separated columns")] = None,
+    min_zp_balance: Optional[int] = None,
+    has_wallet: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status_filter: Annotated[Optional[str], Query(alias="status")] = None,
+):
+    """
+    Streams `users`, `completions` or `microjobs` as CSV or JSON Lines,
+    optionally gzipped, for partner exports and airdrop snapshots.
+    """
+    selected = exports_service.resolve_columns(dataset, columns)
+    media_type = exports_service.media_type(export_format)
+    filters = exports_service.ExportFilters(
+        min_zp_balance=min_zp_balance,
+        has_wallet=has_wallet,
+        since=since,
+        until=until,
+        status=status_filter,
+    )
+    exports_service.check_filters(dataset, filters)
+    # The stream reads through its own session; release this one's connection.
+    db.close()
+    filename = f"{dataset}.{export_format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        exports_service.stream_export_in_session(dataset, selected, filters, export_format, gzip),
+        media_type="application/gzip" if gzip else media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/admin/sybil/clusters", response_model=List[sybil_schemas.SybilClusterResponse])
+def list_sybil_clusters(
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+    status_filter: Annotated[Optional[str], Query(alias="status")] = "flagged",
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+):
+    """Clusters of suspected farm accounts, highest score first."""
+    return sybil_service.list_clusters(db, status_filter, limit)
+
+
+@router.post(
+    "/admin/sybil/clusters/{cluster_id}/review",
+    response_model=sybil_schemas.SybilClusterResponse,
+)
+def review_sybil_cluster(
+    cluster_id: int,
+    review: sybil_schemas.SybilReviewRequest,
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+    db: Annotated[Session, Depends(database.get_db)],
+):
+    """Confirms a cluster as a farm, or clears it and pays out its members' held referral rewards."""
+    return sybil_service.review_cluster(db, admin_user, cluster_id, review.status.value)
+
+
+@router.get("/admin/threadpools", response_model=List[threadpool_schemas.ThreadPoolStats])
+async def read_threadpool_stats(
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+):
+    """
+    Size and current usage of each worker thread pool, with histograms of
+    how long calls waited for a thread. Counts are per worker process.
+    """
+    return threadpools.snapshot()
+
+
+@router.post("/admin/profiling/token", response_model=profiling_schemas.ProfilingTokenResponse)
+def issue_profiling_token(
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+):
+    """
+    Issues a header value that gets any request carrying it profiled, for
+    reproducing a slow request. Requires `PROFILING_ENABLED`.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Request profiling is disabled."
+        )
+    value, expires_at = profiling.issue_token()
+    return {"header": profiling.HEADER, "value": value, "expires_at": expires_at}
+
+
+@router.get("/admin/slow-queries", response_model=List[slow_query_schemas.SlowQueryResponse])
+def list_slow_queries(
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    order_by: Literal["total", "max", "mean", "count"] = "total",
+):
+    """
+    Statements that took at least `SLOW_QUERY_THRESHOLD_MS`, aggregated by
+    normalized SQL, with their callers, routes and captured plans. Counts are
+    per worker process.
+    """
+    return slow_queries.top(limit, order_by)
+
+
+@router.get("/admin/single-flight", response_model=List[single_flight_schemas.SingleFlightStats])
+def read_single_flight_stats(
+    admin_user: Annotated[models.User, Depends(get_admin_user)],
+):
+    """
+    Calls of each coalesced read in this worker process: how many ran the
+    query, waited for a running one or reused a recent result.
+    """
+    return singleflight.stats()
+
+
 # Add more endpoints here as they are developed
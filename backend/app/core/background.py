@@ -0,0 +1,44 @@
+"""
+Runs periodic maintenance jobs alongside the API.
+
+Jobs are plain sync functions (they use their own DB sessions), so each run
+happens in a worker thread and never blocks the event loop. A failing run is
+logged and retried on the next interval.
+"""
+import asyncio
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """Calls a sync function every `interval_seconds` in a worker thread."""
+
+    def __init__(self, name: str, func: Callable[[], object], interval_seconds: float):
+        self.name = name
+        self._func = func
+        self._interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._func)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Background job %s failed", self.name)
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        """Starts the job on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        """Cancels the job; a run in progress finishes in its thread."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
@@ -18,8 +18,12 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str
     SECRET_KEY: str
-    ALGORITHM: str = "HS256"
+    ALGORITHM: str = "HS256"  # HS256/384/512, or EdDSA with the key files below
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    JWT_BACKEND: str = "jose"  # "jose", "native" or "pyjwt"
+    JWT_PRIVATE_KEY_FILE: str = ""  # PEM; only needed by services that issue tokens
+    JWT_PUBLIC_KEY_FILE: str = ""
+    JWT_VERIFY_CACHE_SIZE: int = 10000  # Verified tokens kept in memory; 0 disables
     APP_NAME: str = "Ziver"
 
     # Ziver specific configurations
@@ -32,6 +36,118 @@ class Settings(BaseSettings):
     REFERRAL_DAILY_STREAK_ZP_BONUS: int = 50
     REFERRAL_DELETION_ZP_COST_PERCENTAGE: float = 0.5
 
+    # Miner upgrade catalog (JSON file; empty uses the built-in table)
+    MINER_UPGRADE_CATALOG_FILE: str = ""
+
+    # Real-time event stream
+    EVENT_STREAM_KEEPALIVE_SECONDS: int = 15
+
+    # Batch endpoint
+    BATCH_MAX_REQUESTS: int = 20
+
+    # Mining-cycle reminders ("event_stream", "log" or "memory")
+    MINING_REMINDER_NOTIFIER: str = "event_stream"
+    MINING_REMINDER_BATCH_SIZE: int = 500
+    MINING_REMINDER_ELECTION_SECONDS: int = 10  # How soon another worker takes over
+
+    # Expiration sweeper for micro-jobs and sponsored tasks
+    EXPIRATION_SWEEP_INTERVAL_SECONDS: int = 60
+    EXPIRATION_SWEEP_CHUNK_SIZE: int = 1000
+
+    # Escrow contract indexer ("none" or "file")
+    ESCROW_INDEXER_SOURCE: str = "none"
+    ESCROW_INDEXER_FILE: str = ""
+    ESCROW_INDEXER_BATCH_SIZE: int = 1000
+    ESCROW_INDEXER_INTERVAL_SECONDS: int = 5
+
+    # Payout outbox dispatcher
+    PAYOUT_CHAIN_CLIENT: str = "simulator"
+    PAYOUT_DISPATCH_INTERVAL_SECONDS: int = 5
+    PAYOUT_BATCH_SIZE: int = 100  # Messages per wallet transfer
+    PAYOUT_WORKERS: int = 4
+    PAYOUT_MAX_ATTEMPTS: int = 8
+    PAYOUT_RETRY_BASE_SECONDS: int = 10
+    PAYOUT_RETRY_MAX_SECONDS: int = 3600
+    PAYOUT_CLAIM_TIMEOUT_SECONDS: int = 300
+
+    # Active task catalog cache
+    TASK_CATALOG_CHECK_SECONDS: float = 2.0
+    TASK_CATALOG_MAX_AGE_SECONDS: float = 300.0
+
+    # Counter shards per sponsored-task completion budget
+    TASK_BUDGET_SHARDS: int = 16
+
+    # Archival of completions of long-expired tasks
+    TASK_COMPLETION_ARCHIVE_AFTER_DAYS: int = 30
+    TASK_COMPLETION_ARCHIVE_BATCH_SIZE: int = 5000
+    TASK_COMPLETION_ARCHIVE_INTERVAL_SECONDS: int = 3600
+
+    # Access token revocation
+    TOKEN_REVOCATION_CHECK_SECONDS: float = 1.0
+    # Revocations read again on each refresh, for ones committed out of order
+    TOKEN_REVOCATION_OVERLAP_SECONDS: float = 30.0
+    TOKEN_REVOCATION_FILTER_CAPACITY: int = 100000
+    TOKEN_REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_FILTER_MAX_AGE_SECONDS: float = 3600.0
+    TOKEN_REVOCATION_PURGE_INTERVAL_SECONDS: int = 3600
+
+    # Daily analytics rollups
+    ANALYTICS_ROLLUP_SHARDS: int = 8
+    ANALYTICS_BACKFILL_CHUNK_DAYS: int = 7
+    ANALYTICS_MAX_RANGE_DAYS: int = 366
+
+    # Bulk exports
+    EXPORT_YIELD_PER: int = 10000  # Rows fetched per round trip of the server-side cursor
+    EXPORT_CHUNK_BYTES: int = 256 * 1024
+
+    # Sybil detection job
+    SYBIL_BURST_SECONDS: int = 600  # Referred accounts created this close together are linked
+    SYBIL_MAX_KEY_GROUP: int = 200  # Larger groups sharing a handle pattern are too generic to link
+    SYBIL_MIN_CLUSTER_SIZE: int = 3
+    SYBIL_FLAG_SCORE: float = 0.5
+
+    # TON wallet ownership proofs (ton_proof)
+    TON_PROOF_REQUIRED: bool = False  # Require a proof to link a wallet
+    TON_PROOF_DOMAINS: str = ""  # Comma-separated app domains; empty accepts any
+    TON_PROOF_TTL_SECONDS: int = 900
+    TON_PROOF_EXECUTOR: str = "process"  # "process" or "thread"
+    TON_PROOF_WORKERS: int = 2
+    TON_PROOF_BATCH_SIZE: int = 64
+    TON_PROOF_BATCH_WINDOW_MS: float = 5.0
+
+    # Worker threads for sync endpoints (see app/core/threadpools.py)
+    THREADPOOL_DEFAULT_TOKENS: int = 40  # AnyIO's default limiter, used by most routes
+    THREADPOOL_AUTH_TOKENS: int = 8  # /token and /register (password hashing)
+    THREADPOOL_2FA_TOKENS: int = 4  # 2FA setup, confirmation and removal
+    THREADPOOL_READS_TOKENS: int = 16  # Fast polled reads (/users/me, /tasks, ...)
+
+    # 2FA setup QR codes
+    TWO_FA_QR_EXECUTOR: str = "process"  # "process" or "thread"
+    TWO_FA_QR_WORKERS: int = 1
+    TWO_FA_SETUP_CACHE_SIZE: int = 1024  # Rendered QR codes kept per worker; 0 disables
+    TWO_FA_SETUP_CACHE_TTL_SECONDS: int = 900
+
+    # Request profiling (see app/core/profiling.py); off unless enabled
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of requests; header-signed ones always
+    PROFILING_INTERVAL_MS: float = 1.0  # Stack sampling interval
+    PROFILING_MIN_DURATION_MS: float = 0.0  # Only keep profiles of requests at least this slow
+    PROFILING_DIR: str = "profiles"
+    PROFILING_TOKEN_TTL_SECONDS: int = 3600
+
+    # Slow-query log (see app/db/slow_queries.py)
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN: bool = False  # Capture plans on a separate connection
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: int = 300  # Per statement
+    SLOW_QUERY_LOG_FILE: str = "logs/slow_queries.log"  # Rotating; empty for the logger only
+    SLOW_QUERY_LOG_MAX_BYTES: int = 10_000_000
+    SLOW_QUERY_LOG_BACKUP_COUNT: int = 5
+    SLOW_QUERY_MAX_STATEMENTS: int = 500  # Aggregated statements kept per worker
+
+    # Single-flight coalescing of hot identical reads (see app/core/singleflight.py)
+    SINGLE_FLIGHT_TTL_SECONDS: float = 1.0  # Result reuse after a call; 0 shares in-flight calls only
+
 
 settings = Settings()
 
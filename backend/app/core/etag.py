@@ -0,0 +1,53 @@
+"""
+Weak ETags and `If-None-Match` handling for polled GET endpoints.
+
+Endpoints derive the ETag from cheap version information (row `updated_at`
+values, catalog version counters, counts) rather than from the response
+body, so an unchanged resource is answered with `304 Not Modified` before
+it is loaded or serialized.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# Clients may keep the body but must revalidate it on every use.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Builds a weak ETag from the given version parts."""
+    digest = hashlib.blake2b(
+        "|".join(map(str, parts)).encode("utf-8"), digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the request's `If-None-Match` matches `etag` (weak comparison)."""
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = _opaque(etag)
+    return any(_opaque(candidate) == current for candidate in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """An empty 304 response carrying the current ETag."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Adds the ETag and revalidation headers to a full response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
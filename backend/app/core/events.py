@@ -0,0 +1,129 @@
+"""
+Event bus used to push real-time updates to connected clients.
+
+Service functions publish events (balance changes, finished mining cycles,
+new tasks) and the `/users/me/events` stream delivers them to the user's
+open connections, so clients no longer need to poll `/users/me`.
+
+Most routes are sync `def` functions running in a worker thread, so
+publishing is thread-safe: events are handed over to the event loop the
+bus was bound to at startup. Without a bound loop (scripts, CLI tools)
+publishing is a no-op.
+
+A user's streams may be open in any worker process. With several workers
+the bus is given a relay (a `NotifyChannel` on PostgreSQL) that hands each
+event to `receive` in every process; without one, events only reach
+streams in the publishing process.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Set
+
+# Subscribers that fall behind by more than this many events are dropped
+# rather than buffering without limit.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Sends an event message to every worker; returns False if it could not
+Relay = Callable[[Dict[str, Any]], bool]
+
+
+class EventBus:
+    """Fan-out of user-scoped and broadcast events to asyncio queues."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._relay: Optional[Relay] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Binds the bus to the application's running event loop."""
+        self._loop = loop
+
+    def unbind_loop(self) -> None:
+        """Detaches the bus from its event loop (on application shutdown)."""
+        self._loop = None
+
+    def set_relay(self, relay: Optional[Relay]) -> None:
+        """
+        Routes published events through `relay`, which must hand them back to
+        `receive` in every worker process. None delivers in-process again.
+        """
+        self._relay = relay
+
+    def receive(self, message: Dict[str, Any]) -> None:
+        """Delivers an event handed back by the relay to this process's streams."""
+        self._deliver_local(message["user_id"], message["event"], message["data"])
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Registers a new queue that receives the user's events."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        """Removes a queue previously returned by `subscribe`."""
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def is_subscribed(self, user_id: int) -> bool:
+        """Returns True if the user has an open stream in this process."""
+        with self._lock:
+            return user_id in self._subscribers
+
+    def publish(self, user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+        """Publishes an event to every open stream of a single user."""
+        self._route(user_id, event_type, data)
+
+    def broadcast(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Publishes an event to every open stream."""
+        self._route(None, event_type, data)
+
+    def _route(self, user_id: Optional[int], event_type: str, data: Dict[str, Any]) -> None:
+        relay = self._relay
+        if relay is not None and relay({"user_id": user_id, "event": event_type, "data": data}):
+            return
+        self._deliver_local(user_id, event_type, data)
+
+    def _deliver_local(self, user_id: Optional[int], event_type: str, data: Dict[str, Any]) -> None:
+        """Delivers to this process's streams of `user_id`, or all of them if None."""
+        with self._lock:
+            if user_id is None:
+                queues = [q for qs in self._subscribers.values() for q in qs]
+            else:
+                queues = list(self._subscribers.get(user_id, ()))
+        self._dispatch(queues, event_type, data)
+
+    def _dispatch(self, queues, event_type: str, data: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed() or not queues:
+            return
+        event = {"event": event_type, "data": data}
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(queues, event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, queues, event)
+
+    @staticmethod
+    def _deliver(queues, event: Dict[str, Any]) -> None:
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer; it will resynchronise from its next snapshot.
+                pass
+
+
+# Singleton bus shared by the API and the service layer
+event_bus = EventBus()
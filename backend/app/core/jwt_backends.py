@@ -0,0 +1,270 @@
+"""
+Interchangeable JWT implementations and a cache of verified tokens.
+
+Backends share one interface (`encode(claims)`, `decode(token)`) and are
+selected with `JWT_BACKEND`:
+
+- "jose": python-jose, HMAC/RSA/EC algorithms.
+- "native": hashlib/hmac for HS256/384/512 and `cryptography` for EdDSA
+  (Ed25519), with the header segment encoded once per process.
+- "pyjwt": PyJWT, if installed.
+
+With `ALGORITHM=EdDSA` tokens are signed with `JWT_PRIVATE_KEY_FILE` and
+verified with `JWT_PUBLIC_KEY_FILE` (PEM), so other services can verify them
+holding only the public key. HMAC algorithms use `SECRET_KEY`.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Type, Union
+
+from app.core.config import settings
+
+Key = Union[str, bytes]
+
+HMAC_ALGORITHMS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class InvalidTokenError(Exception):
+    """Raised by a backend when a token is malformed, forged or expired."""
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _numeric_dates(claims: dict) -> dict:
+    # Same conversion as python-jose: datetimes become whole seconds.
+    converted = dict(claims)
+    for claim in TIME_CLAIMS:
+        value = converted.get(claim)
+        if isinstance(value, datetime):
+            converted[claim] = int(value.timestamp())
+    return converted
+
+
+class JWTBackend:
+    """Signs and verifies tokens with one algorithm and key pair."""
+    name = ""
+
+    def __init__(self, algorithm: str, signing_key: Optional[Key], verifying_key: Key):
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verifying_key = verifying_key
+
+    def encode(self, claims: dict) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str) -> dict:
+        """Returns the verified claims or raises `InvalidTokenError`."""
+        raise NotImplementedError
+
+    def _require_signing_key(self) -> Key:
+        if self.signing_key is None:
+            raise RuntimeError(f"No signing key configured for {self.algorithm}.")
+        return self.signing_key
+
+
+class JoseBackend(JWTBackend):
+    """python-jose, the original implementation."""
+    name = "jose"
+
+    def __init__(self, algorithm, signing_key, verifying_key):
+        if algorithm == "EdDSA":
+            raise ValueError("python-jose does not support EdDSA; use the native or pyjwt backend.")
+        super().__init__(algorithm, signing_key, verifying_key)
+        from jose import JWTError, jwt
+        self._jwt, self._error = jwt, JWTError
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(claims, self._require_signing_key(), algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(token, self.verifying_key, algorithms=[self.algorithm])
+        except self._error as exc:
+            raise InvalidTokenError(str(exc)) from exc
+
+
+class PyJWTBackend(JWTBackend):
+    """PyJWT (optional dependency)."""
+    name = "pyjwt"
+
+    def __init__(self, algorithm, signing_key, verifying_key):
+        super().__init__(algorithm, signing_key, verifying_key)
+        try:
+            import jwt
+        except ImportError as exc:
+            raise RuntimeError("JWT_BACKEND=pyjwt requires the PyJWT package.") from exc
+        self._jwt = jwt
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(
+            _numeric_dates(claims), self._require_signing_key(), algorithm=self.algorithm
+        )
+
+    def decode(self, token: str) -> dict:
+        try:
+            return self._jwt.decode(token, self.verifying_key, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError as exc:
+            raise InvalidTokenError(str(exc)) from exc
+
+
+class NativeBackend(JWTBackend):
+    """
+    Compact-serialisation JWS with the standard library (HMAC) or
+    `cryptography` (Ed25519). Only the configured algorithm is accepted.
+    """
+    name = "native"
+
+    def __init__(self, algorithm, signing_key, verifying_key):
+        super().__init__(algorithm, signing_key, verifying_key)
+        self._header = _b64encode(
+            json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":")).encode()
+        )
+        if algorithm in HMAC_ALGORITHMS:
+            digest = HMAC_ALGORITHMS[algorithm]
+            secret = verifying_key.encode() if isinstance(verifying_key, str) else verifying_key
+            self._sign = lambda data: hmac.new(secret, data, digest).digest()
+            self._verify = lambda data, signature: hmac.compare_digest(self._sign(data), signature)
+        elif algorithm == "EdDSA":
+            from cryptography.exceptions import InvalidSignature
+            from cryptography.hazmat.primitives import serialization
+
+            public_key = serialization.load_pem_public_key(_as_bytes(verifying_key))
+            private_key = (
+                serialization.load_pem_private_key(_as_bytes(signing_key), password=None)
+                if signing_key is not None else None
+            )
+
+            def verify(data: bytes, signature: bytes) -> bool:
+                try:
+                    public_key.verify(signature, data)
+                except InvalidSignature:
+                    return False
+                return True
+
+            def sign(data: bytes) -> bytes:
+                if private_key is None:
+                    self._require_signing_key()
+                return private_key.sign(data)
+
+            self._sign, self._verify = sign, verify
+        else:
+            raise ValueError(f"The native backend does not support {algorithm}.")
+
+    def encode(self, claims: dict) -> str:
+        payload = _b64encode(
+            json.dumps(_numeric_dates(claims), separators=(",", ":")).encode()
+        )
+        signing_input = self._header + b"." + payload
+        return (signing_input + b"." + _b64encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> dict:
+        try:
+            header, payload, signature = token.encode("ascii").split(b".")
+            if header != self._header:
+                # Same algorithm, differently serialised header (e.g. another issuer)
+                fields = json.loads(_b64decode(header.decode()))
+                if not isinstance(fields, dict) or fields.get("alg") != self.algorithm:
+                    raise InvalidTokenError("Unexpected algorithm.")
+            if not self._verify(header + b"." + payload, _b64decode(signature.decode())):
+                raise InvalidTokenError("Signature verification failed.")
+            claims = json.loads(_b64decode(payload.decode()))
+        except (ValueError, UnicodeError) as exc:
+            raise InvalidTokenError("Malformed token.") from exc
+        if not isinstance(claims, dict):
+            raise InvalidTokenError("Malformed token.")
+        now = time.time()
+        try:
+            if "exp" in claims and float(claims["exp"]) <= now:
+                raise InvalidTokenError("Signature has expired.")
+            if "nbf" in claims and float(claims["nbf"]) > now:
+                raise InvalidTokenError("The token is not yet valid.")
+        except (TypeError, ValueError) as exc:
+            raise InvalidTokenError("Malformed time claim.") from exc
+        return claims
+
+
+BACKENDS: Dict[str, Type[JWTBackend]] = {
+    backend.name: backend for backend in (JoseBackend, NativeBackend, PyJWTBackend)
+}
+
+
+def _as_bytes(key: Key) -> bytes:
+    return key.encode() if isinstance(key, str) else key
+
+
+def load_keys(algorithm: str) -> Tuple[Optional[Key], Key]:
+    """The (signing, verifying) keys for `algorithm` from the settings."""
+    if algorithm.startswith("HS"):
+        return settings.SECRET_KEY, settings.SECRET_KEY
+    if not settings.JWT_PUBLIC_KEY_FILE:
+        raise RuntimeError(f"ALGORITHM={algorithm} requires JWT_PUBLIC_KEY_FILE.")
+    verifying_key = Path(settings.JWT_PUBLIC_KEY_FILE).read_bytes()
+    signing_key = (
+        Path(settings.JWT_PRIVATE_KEY_FILE).read_bytes()
+        if settings.JWT_PRIVATE_KEY_FILE else None
+    )
+    return signing_key, verifying_key
+
+
+def create_backend(
+    name: str, algorithm: str, signing_key: Optional[Key], verifying_key: Key
+) -> JWTBackend:
+    """Instantiates the backend registered under `name`."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError as exc:
+        raise ValueError(
+            f"Unknown JWT backend {name!r}; expected one of {', '.join(BACKENDS)}."
+        ) from exc
+    return backend_class(algorithm, signing_key, verifying_key)
+
+
+class VerifiedTokenCache:
+    """
+    LRU map of recently verified tokens to their claims. An entry is served
+    only until the token's `exp`; tokens without one are not cached.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+        return dict(claims)
+
+    def put(self, token: str, claims: dict) -> None:
+        if self.max_size <= 0 or not isinstance(claims.get("exp"), (int, float)):
+            return
+        with self._lock:
+            self._entries[token] = (float(claims["exp"]), dict(claims))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
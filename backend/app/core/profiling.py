@@ -0,0 +1,308 @@
+"""
+Opt-in request profiling with sampled flame graphs.
+
+With `PROFILING_ENABLED` set, `ProfilingMiddleware` profiles a random
+`PROFILING_SAMPLE_RATE` fraction of requests, plus every request carrying
+a valid `X-Ziver-Profile` header (issued to admins by
+`POST /admin/profiling/token`). While a request is profiled:
+
+- a sampler thread records the stacks of the threads working on it every
+  `PROFILING_INTERVAL_MS`: the event loop thread (idle waits skipped; it is
+  shared, so concurrent requests' async code can show up) and the worker
+  threads running its sync endpoint, which attach themselves through
+  `ProfiledRoute` and `threadpools.ThreadPool.run`;
+- SQL statements it runs are timed through engine events.
+
+Profiles of requests taking at least `PROFILING_MIN_DURATION_MS` are
+written to `PROFILING_DIR` as collapsed stacks (`.folded`, readable by
+flamegraph.pl, speedscope and inferno) with a `.json` file recording the
+route, status, latency and SQL timings.
+
+When profiling is disabled nothing is installed: no middleware, no engine
+events and endpoints are registered unwrapped.
+"""
+import functools
+import hashlib
+import hmac
+import inspect
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio.to_thread
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-Ziver-Profile"
+MAX_STACK_DEPTH = 128
+MAX_RECORDED_QUERIES = 500
+
+
+class _Profile:
+    """Samples and SQL timings collected for one request."""
+
+    def __init__(self):
+        self.threads: Dict[int, str] = {}  # Thread id -> label
+        self.stacks: Counter = Counter()
+        self.queries: List[Tuple[str, float]] = []
+        self.sql_ms = 0.0
+        self.query_count = 0
+
+
+_current: ContextVar[Optional[_Profile]] = ContextVar("ziver_profile", default=None)
+
+
+# --------------------------------------------------------------------------
+# Sampling
+# --------------------------------------------------------------------------
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    filename = code.co_filename.replace("\\", "/")
+    if "/app/" in filename:
+        filename = "app/" + filename.rsplit("/app/", 1)[1]
+    else:
+        filename = filename.rsplit("/", 1)[-1]
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _is_idle(frame) -> bool:
+    """Whether the event loop is waiting for I/O rather than running code."""
+    return frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py")
+
+
+def _collapse(label: str, frame) -> Optional[str]:
+    if label == "event-loop" and _is_idle(frame):
+        return None
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(label)
+    return ";".join(reversed(labels))
+
+
+class _Sampler:
+    """One background thread sampling the stacks of every active profile."""
+
+    def __init__(self):
+        self._profiles: List[_Profile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: _Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: _Profile) -> None:
+        with self._lock:
+            self._profiles.remove(profile)
+
+    def _run(self) -> None:
+        interval = settings.PROFILING_INTERVAL_MS / 1000
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            for profile in profiles:
+                for thread_id, label in dict(profile.threads).items():
+                    frame = frames.get(thread_id)
+                    stack = _collapse(label, frame) if frame is not None else None
+                    if stack:
+                        profile.stacks[stack] += 1
+            del frames
+            time.sleep(interval)
+
+
+_sampler = _Sampler()
+
+
+@contextmanager
+def attach(label: str = "worker"):
+    """Samples the current thread for the active profile, if any, while in the block."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profile.threads[thread_id] = label
+    try:
+        yield
+    finally:
+        profile.threads.pop(thread_id, None)
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class attaching the worker thread of sync endpoints to the active
+    profile. Endpoints are left untouched when profiling is disabled.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if settings.PROFILING_ENABLED and not inspect.iscoroutinefunction(endpoint):
+            endpoint = attached(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def attached(func):
+    """Wraps a sync function to run under `attach`."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with attach():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# --------------------------------------------------------------------------
+# SQL timings
+# --------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._ziver_profile_started = time.perf_counter()  # pylint: disable=protected-access
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, "_ziver_profile_started", None)
+    if profile is None or started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    profile.sql_ms += elapsed_ms
+    profile.query_count += 1
+    if len(profile.queries) < MAX_RECORDED_QUERIES:
+        profile.queries.append((statement, elapsed_ms))
+
+
+# --------------------------------------------------------------------------
+# Header tokens
+# --------------------------------------------------------------------------
+
+def _token_mac(expires_at: int) -> str:
+    message = f"profile:{expires_at}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def issue_token() -> Tuple[str, int]:
+    """A header value that gets requests profiled, and its expiry (unix time)."""
+    expires_at = int(time.time()) + settings.PROFILING_TOKEN_TTL_SECONDS
+    return f"{expires_at:x}.{_token_mac(expires_at)}", expires_at
+
+
+def _token_valid(value: str) -> bool:
+    expiry, _, mac = value.partition(".")
+    try:
+        expires_at = int(expiry, 16)
+    except ValueError:
+        return False
+    return expires_at >= time.time() and hmac.compare_digest(
+        mac.encode(), _token_mac(expires_at).encode()
+    )
+
+
+# --------------------------------------------------------------------------
+# Middleware and output
+# --------------------------------------------------------------------------
+
+def _requested(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-ziver-profile":
+            return _token_valid(value.decode("latin-1"))
+    return False
+
+
+def _write(profile: _Profile, record: dict) -> None:
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    route = record["route"].strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    stem = f"{stamp}_{record['method']}_{route}_{record['duration_ms']:.0f}ms"
+    (directory / f"{stem}.folded").write_text(
+        "".join(f"{stack} {count}\n" for stack, count in profile.stacks.most_common())
+    )
+    (directory / f"{stem}.json").write_text(json.dumps(record, indent=2))
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled and header-requested requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            _requested(scope) or random.random() < settings.PROFILING_SAMPLE_RATE
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile = _Profile()
+        response_status = 500
+
+        async def send_wrapper(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+            await send(message)
+
+        token = _current.set(profile)
+        profile.threads[threading.get_ident()] = "event-loop"
+        _sampler.start(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            _sampler.stop(profile)
+            _current.reset(token)
+            if duration_ms >= settings.PROFILING_MIN_DURATION_MS:
+                route = scope.get("route")
+                record = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", scope["path"]),
+                    "status": response_status,
+                    "duration_ms": round(duration_ms, 3),
+                    "samples": sum(profile.stacks.values()),
+                    "interval_ms": settings.PROFILING_INTERVAL_MS,
+                    "sql": {
+                        "count": profile.query_count,
+                        "total_ms": round(profile.sql_ms, 3),
+                        "queries": [
+                            {"statement": statement, "ms": round(ms, 3)}
+                            for statement, ms in profile.queries
+                        ],
+                    },
+                }
+                try:
+                    await anyio.to_thread.run_sync(_write, profile, record)
+                except OSError:
+                    logger.exception("Could not write request profile")
+
+
+def install(app, engine) -> None:
+    """Adds the middleware and SQL timing events if profiling is enabled."""
+    if not settings.PROFILING_ENABLED:
+        return
+    app.add_middleware(ProfilingMiddleware)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,178 @@
+"""
+Hierarchical timer wheel that fires callbacks when per-user timers expire.
+
+Used to announce the end of a mining cycle the moment it happens instead of
+scanning `users` for `mining_started_at + cycle < now`. Timers are keyed by
+user id, so scheduling again replaces the previous deadline and cancelling
+is O(1).
+
+Memory is kept compact for millions of pending timers: deadlines live in a
+flat `array('I')` indexed by user id (4 bytes per user) and each wheel slot
+is an `array('I')` of user ids (4 bytes per entry). Stale slot entries left
+behind by cancels and reschedules are discarded lazily when their slot is
+processed. Keys must therefore be non-negative integers below 2**32, and
+deadlines have one-second resolution.
+"""
+import asyncio
+import math
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+DueCallback = Callable[[Sequence[int]], None]
+
+# Slot bits per wheel level. With one-second ticks the levels span
+# 256 s, ~4.5 h, ~12 days and ~2 years; later deadlines are parked in the
+# last slot of the top level and re-cascaded until they come in range.
+LEVEL_BITS = (8, 6, 6, 6)
+
+
+class TimerWheel:
+    """Hashed hierarchical timer wheel with one-second ticks."""
+
+    def __init__(self, on_due: Optional[DueCallback] = None, start: Optional[float] = None):
+        self._on_due = on_due
+        self._lock = threading.Lock()
+        self._tick = int(time.time() if start is None else start)
+        self._levels: List[List[array]] = [
+            [array("I") for _ in range(1 << bits)] for bits in LEVEL_BITS
+        ]
+        self._deadlines = array("I")
+        self._pending = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def set_callback(self, on_due: DueCallback) -> None:
+        """Sets the function receiving the ids of expired timers."""
+        self._on_due = on_due
+
+    def schedule(self, key: int, when: datetime) -> None:
+        """Schedules (or reschedules) the timer for `key` at `when`."""
+        self.schedule_at(key, when.timestamp())
+
+    def schedule_at(self, key: int, timestamp: float) -> None:
+        """Schedules the timer for `key` at a POSIX timestamp."""
+        self.schedule_many(((key, timestamp),))
+
+    def schedule_many(self, items: Iterable[Tuple[int, float]]) -> None:
+        """Schedules many `(key, timestamp)` pairs under a single lock."""
+        with self._lock:
+            for key, timestamp in items:
+                deadline = max(1, math.ceil(timestamp))
+                if key >= len(self._deadlines):
+                    self._grow(key)
+                if not self._deadlines[key]:
+                    self._pending += 1
+                self._deadlines[key] = deadline
+                self._place(key, deadline)
+
+    def cancel(self, key: int) -> None:
+        """Cancels the pending timer for `key`, if any."""
+        with self._lock:
+            if key < len(self._deadlines) and self._deadlines[key]:
+                self._deadlines[key] = 0
+                self._pending -= 1
+
+    def clear(self) -> None:
+        """Drops every pending timer."""
+        with self._lock:
+            self._levels = [[array("I") for _ in range(1 << bits)] for bits in LEVEL_BITS]
+            self._deadlines = array("I")
+            self._pending = 0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def advance(self, now: Optional[float] = None) -> array:
+        """Processes every tick up to `now` and returns the keys that expired."""
+        now = int(time.time() if now is None else now)
+        due = array("I")
+        with self._lock:
+            while self._tick <= now:
+                self._process_tick(due)
+                self._tick += 1
+        return due
+
+    def _grow(self, key: int) -> None:
+        # Over-allocate so that sequential user ids don't resize every time.
+        size = max(key + 1, len(self._deadlines) * 2, 1024)
+        missing = size - len(self._deadlines)
+        self._deadlines.frombytes(bytes(missing * self._deadlines.itemsize))
+
+    def _place(self, key: int, deadline: int) -> None:
+        delta = deadline - self._tick
+        if delta < 0:
+            deadline, delta = self._tick, 0
+        shift = 0
+        last = len(LEVEL_BITS) - 1
+        for level, bits in enumerate(LEVEL_BITS):
+            span = 1 << (shift + bits)
+            if delta < span or level == last:
+                if delta >= span:
+                    deadline = self._tick + span - 1
+                slot = (deadline >> shift) & ((1 << bits) - 1)
+                self._levels[level][slot].append(key)
+                return
+            shift += bits
+
+    def _cascade(self, level: int) -> int:
+        """Re-distributes the current slot of `level` into lower levels."""
+        shift = sum(LEVEL_BITS[:level])
+        index = (self._tick >> shift) & ((1 << LEVEL_BITS[level]) - 1)
+        slot = self._levels[level][index]
+        self._levels[level][index] = array("I")
+        deadlines = self._deadlines
+        for key in slot:
+            deadline = deadlines[key]
+            if deadline:
+                self._place(key, deadline)
+        return index
+
+    def _process_tick(self, due: array) -> None:
+        index = self._tick & ((1 << LEVEL_BITS[0]) - 1)
+        if index == 0:
+            for level in range(1, len(LEVEL_BITS)):
+                if self._cascade(level) != 0:
+                    break
+
+        slot = self._levels[0][index]
+        if not slot:
+            return
+        self._levels[0][index] = array("I")
+        deadlines = self._deadlines
+        tick = self._tick
+        for key in slot:
+            deadline = deadlines[key]
+            # Zero means cancelled (or already fired through a duplicate
+            # entry); a later deadline means the entry was rescheduled.
+            if deadline and deadline <= tick:
+                deadlines[key] = 0
+                self._pending -= 1
+                due.append(key)
+
+    async def _run(self) -> None:
+        while True:
+            due = self.advance()
+            if len(due) and self._on_due is not None:
+                # Notifiers may do I/O; keep it off the event loop.
+                await asyncio.to_thread(self._on_due, due)
+            await asyncio.sleep(max(0.0, self._tick - time.time()))
+
+    def start(self) -> None:
+        """Starts the dispatch task on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the dispatch task. Pending timers are kept."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+# Singleton timer wheel for mining-cycle deadlines, keyed by user id
+mining_scheduler = TimerWheel()
@@ -1,12 +1,14 @@
 """
 Handles security-related functions like password hashing and JWT creation/decoding.
 """
+import uuid
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 
-from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.core import jwt_backends
 from app.core.config import settings
 
 # --- Password Hashing Context ---
@@ -26,34 +28,50 @@ def get_password_hash(password: str) -> str:
 
 # --- JSON Web Token (JWT) Functions ---
 
+_verified_tokens = jwt_backends.VerifiedTokenCache(settings.JWT_VERIFY_CACHE_SIZE)
+
+
+@lru_cache
+def get_jwt_backend() -> jwt_backends.JWTBackend:
+    """The configured JWT backend, built on first use."""
+    signing_key, verifying_key = jwt_backends.load_keys(settings.ALGORITHM)
+    return jwt_backends.create_backend(
+        settings.JWT_BACKEND, settings.ALGORITHM, signing_key, verifying_key
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Creates a new JWT access token."""
+    """
+    Creates a new JWT access token with a unique `jti` and a sub-second
+    `iat`, so it can be revoked on its own or by the user's watermark.
+    """
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(
+        expire = now + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
-    return encoded_jwt
+    to_encode.update({"exp": expire, "iat": now.timestamp(), "jti": uuid.uuid4().hex})
+    return get_jwt_backend().encode(to_encode)
 
 
 def decode_access_token(token: str) -> Optional[dict]:
     """
-    Decodes a JWT access token.
+    Decodes a JWT access token. Recently verified tokens are answered from
+    an LRU cache until they expire, skipping signature verification.
 
     Returns:
         The token's payload if valid, otherwise None.
     """
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+    payload = _verified_tokens.get(token)
+    if payload is not None:
         return payload
-    except JWTError:
+    try:
+        payload = get_jwt_backend().decode(token)
+    except jwt_backends.InvalidTokenError:
         return None
+    _verified_tokens.put(token, payload)
+    return payload
@@ -0,0 +1,137 @@
+"""
+Single-flight coalescing of hot, identical reads.
+
+When many requests make the same read at the same moment (every client
+loading the public micro-job feed when a campaign starts), each would run
+the same query. A function decorated with `single_flight` runs once per
+distinct arguments at a time: concurrent identical calls wait for the
+running call and share its result (or exception), and the result is
+reused for `SINGLE_FLIGHT_TTL_SECONDS` afterwards.
+
+The first argument is taken to be the caller's DB session and is left out
+of the key; only the leading call's session is used. Results are shared
+between threads and requests, so decorated functions must return
+immutable data (tuples, frozen dataclasses), never ORM instances bound to
+the leader's session.
+
+Coalescing is per worker process. Counters for each decorated function
+are served by `GET /admin/single-flight`.
+"""
+import functools
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Expired results are swept once this many are held
+PRUNE_THRESHOLD = 1024
+
+
+class _Call:
+    """A call in progress that identical calls wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls to one function and caches results briefly."""
+
+    def __init__(self, name: str, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, _Call] = {}
+        self._results: Dict[Hashable, Tuple[float, object]] = {}
+        self.calls = 0
+        self.executions = 0  # Calls that ran the function
+        self.coalesced = 0  # Calls that waited for a running call
+        self.cached = 0  # Calls answered from a recent result
+
+    @property
+    def ttl_seconds(self) -> float:
+        return settings.SINGLE_FLIGHT_TTL_SECONDS if self._ttl_seconds is None else self._ttl_seconds
+
+    def do(self, key: Hashable, func: Callable[[], object]):
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            cached = self._results.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self.cached += 1
+                    return cached[1]
+                del self._results[key]
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if call.error is None and self.ttl_seconds > 0:
+                    if len(self._results) >= PRUNE_THRESHOLD:
+                        self._prune()
+                    self._results[key] = (time.monotonic() + self.ttl_seconds, call.result)
+            call.done.set()
+        return call.result
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "cached": self.cached,
+                "in_flight": len(self._in_flight),
+            }
+
+
+GROUPS: Dict[str, SingleFlight] = {}
+
+
+def single_flight(name: str, ttl_seconds: Optional[float] = None):
+    """
+    Decorator coalescing concurrent identical calls of a `(db, *args)`
+    service function. `ttl_seconds` overrides `SINGLE_FLIGHT_TTL_SECONDS`;
+    0 shares only calls in flight.
+    """
+    group = GROUPS[name] = SingleFlight(name, ttl_seconds)
+
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        def wrapper(db, *args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return group.do(key, lambda: func(db, *args, **kwargs))
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
+
+
+def stats() -> List[dict]:
+    """Counters of every single-flight function in this worker."""
+    return [group.stats() for group in GROUPS.values()]
@@ -0,0 +1,138 @@
+"""
+Worker thread pools for sync endpoints.
+
+FastAPI runs every sync (`def`) endpoint and dependency through AnyIO's
+default capacity limiter, 40 threads shared by all routes, so a burst of
+slow requests (a login storm hashing passwords) can hold every token and
+queue the cheap reads behind it. This module sizes that default limiter
+from `THREADPOOL_DEFAULT_TOKENS` and adds named pools with their own
+limiters:
+
+- `auth`: `/token` and `/register`, which hash passwords;
+- `twofa`: 2FA setup, confirmation and removal;
+- `reads`: fast, frequently polled reads such as `/users/me`.
+
+An endpoint joins a pool with the `in_pool` decorator, which turns it into
+a coroutine that runs the original function under the pool's limiter.
+Threads themselves are shared; limiters only cap how many run per pool, so
+a pool at capacity queues its own requests and nobody else's. Each named
+pool records how long calls wait for a thread in a histogram, served with
+the pools' current usage by `GET /admin/threadpools`.
+"""
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import anyio
+import anyio.to_thread
+from anyio.lowlevel import RunVar
+
+from app.core import profiling
+from app.core.config import settings
+
+# Upper bounds (seconds) of the queue-time histogram buckets
+QUEUE_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """A thread-safe histogram with fixed buckets, Prometheus style."""
+
+    def __init__(self, buckets=QUEUE_TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot: above every bound
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """Cumulative counts per upper bound ("+Inf" last), total count and sum."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+            running += count
+            cumulative.append({"le": bound, "count": running})
+        return {"buckets": cumulative, "count": running, "sum": round(total, 6)}
+
+
+class ThreadPool:
+    """A named capacity limiter for sync work, with queue-time metrics."""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.queue_time = Histogram()
+        # Limiters belong to an event loop; one per loop, created on first use
+        self._limiter: RunVar[anyio.CapacityLimiter] = RunVar(f"threadpool_{name}")
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        try:
+            return self._limiter.get()
+        except LookupError:
+            limiter = anyio.CapacityLimiter(self.size)
+            self._limiter.set(limiter)
+            return limiter
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Runs `func(*args, **kwargs)` in a worker thread under this pool's limiter."""
+        queued_at = time.perf_counter()
+        target = profiling.attached(func) if settings.PROFILING_ENABLED else func
+
+        def call():
+            self.queue_time.observe(time.perf_counter() - queued_at)
+            return target(*args, **kwargs)
+
+        return await anyio.to_thread.run_sync(call, limiter=self.limiter)
+
+    def stats(self) -> dict:
+        return _limiter_stats(self.name, self.limiter, self.queue_time)
+
+
+def _limiter_stats(name: str, limiter: anyio.CapacityLimiter, queue_time: Optional[Histogram]) -> dict:
+    statistics = limiter.statistics()
+    return {
+        "name": name,
+        "size": int(limiter.total_tokens),
+        "busy": statistics.borrowed_tokens,
+        "waiting": statistics.tasks_waiting,
+        "queue_time": queue_time.snapshot() if queue_time is not None else None,
+    }
+
+
+auth_pool = ThreadPool("auth", settings.THREADPOOL_AUTH_TOKENS)
+twofa_pool = ThreadPool("twofa", settings.THREADPOOL_2FA_TOKENS)
+reads_pool = ThreadPool("reads", settings.THREADPOOL_READS_TOKENS)
+POOLS: Dict[str, ThreadPool] = {pool.name: pool for pool in (auth_pool, twofa_pool, reads_pool)}
+
+
+def in_pool(pool: ThreadPool):
+    """
+    Decorator running a sync endpoint in `pool` instead of the default
+    limiter. The wrapper keeps the endpoint's signature, so FastAPI resolves
+    its parameters and dependencies as before.
+    """
+    def decorator(func: Callable):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await pool.run(func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def configure_default_limiter() -> None:
+    """Sizes AnyIO's default limiter; call on the application's event loop."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_DEFAULT_TOKENS
+
+
+def snapshot() -> List[dict]:
+    """Usage of the default limiter and every named pool, for the current event loop."""
+    default = _limiter_stats("default", anyio.to_thread.current_default_thread_limiter(), None)
+    return [default, *(pool.stats() for pool in POOLS.values())]
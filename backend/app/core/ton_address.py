@@ -0,0 +1,79 @@
+"""
+Parsing of TON account addresses into their canonical binary form.
+
+A wallet can be written raw (`0:<64 hex>`) or user-friendly (48 base64 or
+base64url characters, bounceable or not, mainnet or testnet), so its string
+form is not an identity. `parse` accepts all of them and returns the
+workchain and 32-byte account hash; `TonAddress.key` packs them into the 33
+bytes stored and indexed as `users.ton_wallet_key`.
+"""
+import base64
+import binascii
+from dataclasses import dataclass
+
+FLAG_BOUNCEABLE = 0x11
+FLAG_NON_BOUNCEABLE = 0x51
+FLAG_TESTNET = 0x80
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/XMODEM, the checksum of user-friendly addresses."""
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return crc
+
+
+@dataclass(frozen=True)
+class TonAddress:
+    """A TON account: its workchain and the hash of its initial state."""
+    workchain: int
+    hash_part: bytes
+
+    @property
+    def key(self) -> bytes:
+        """33-byte canonical form: signed workchain byte and account hash."""
+        return self.workchain.to_bytes(1, "big", signed=True) + self.hash_part
+
+    @classmethod
+    def from_key(cls, key: bytes) -> "TonAddress":
+        return cls(int.from_bytes(key[:1], "big", signed=True), bytes(key[1:]))
+
+    def to_raw(self) -> str:
+        return f"{self.workchain}:{self.hash_part.hex()}"
+
+    def to_friendly(self, bounceable: bool = True, testnet: bool = False) -> str:
+        flags = FLAG_BOUNCEABLE if bounceable else FLAG_NON_BOUNCEABLE
+        if testnet:
+            flags |= FLAG_TESTNET
+        body = bytes([flags]) + self.key
+        return base64.urlsafe_b64encode(body + crc16(body).to_bytes(2, "big")).decode()
+
+
+def parse(address: str) -> TonAddress:
+    """Parses a raw or user-friendly address. Raises ValueError if invalid."""
+    address = address.strip()
+    if ":" in address:
+        workchain, _, account = address.partition(":")
+        try:
+            workchain_id, hash_part = int(workchain), bytes.fromhex(account)
+        except ValueError as exc:
+            raise ValueError("Malformed raw address.") from exc
+        if not -128 <= workchain_id <= 127 or len(hash_part) != 32:
+            raise ValueError("Malformed raw address.")
+        return TonAddress(workchain_id, hash_part)
+
+    if len(address) != 48:
+        raise ValueError("A user-friendly address has 48 characters.")
+    try:
+        raw = base64.urlsafe_b64decode(address.replace("+", "-").replace("/", "_"))
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError("Malformed user-friendly address.") from exc
+    if len(raw) != 36 or raw[0] & ~FLAG_TESTNET not in (FLAG_BOUNCEABLE, FLAG_NON_BOUNCEABLE):
+        raise ValueError("Malformed user-friendly address.")
+    if crc16(raw[:34]) != int.from_bytes(raw[34:], "big"):
+        raise ValueError("Address checksum mismatch.")
+    return TonAddress(int.from_bytes(raw[1:2], "big", signed=True), raw[2:34])
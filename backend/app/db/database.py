@@ -2,6 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from app.db import slow_queries
 
 # SQLAlchemy database URL from settings
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
@@ -10,6 +11,9 @@ SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 # pool_pre_ping=True helps maintain healthy connections
 engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
 
+# Time every statement and log the slow ones (SLOW_QUERY_* settings)
+slow_queries.install(engine)
+
 # Create a SessionLocal class for database sessions
 # autocommit=False means transactions are explicitly committed
 # autoflush=False means objects are not flushed to DB until commit or explicit flush
@@ -0,0 +1,122 @@
+"""
+Cross-worker mutual exclusion for background jobs.
+
+On PostgreSQL this uses session-level advisory locks held on a dedicated
+connection, so only one worker process runs a given job at a time
+(`try_advisory_lock`) or owns a long-running duty (`AdvisoryLease`). Other
+databases (e.g. SQLite in development) fall back to a process-local lock.
+"""
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+
+from app.db.database import engine
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def _lock_key(name: str) -> int:
+    """Maps a lock name to a stable signed 32-bit advisory lock key."""
+    return zlib.crc32(name.encode("utf-8")) - (1 << 31)
+
+
+@contextmanager
+def try_advisory_lock(name: str) -> Iterator[bool]:
+    """
+    Tries to take the named lock without waiting.
+
+    Yields True if the lock was acquired (and releases it on exit),
+    or False if another worker holds it.
+    """
+    if engine.dialect.name == "postgresql":
+        key = _lock_key(name)
+        with engine.connect() as conn:
+            acquired = conn.execute(select(func.pg_try_advisory_lock(key))).scalar()
+            conn.commit()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    conn.execute(select(func.pg_advisory_unlock(key)))
+                    conn.commit()
+        return
+
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(name, threading.Lock())
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+class AdvisoryLease:
+    """
+    A named lock held until `release`, for work one worker owns for as long
+    as it runs (rather than for a single job run).
+
+    On PostgreSQL the lock lives on a connection checked out for as long as
+    the lease is held; if it drops, the lock is gone and `alive` returns
+    False.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._conn = None
+        self._local_lock: Optional[threading.Lock] = None
+
+    def acquire(self) -> bool:
+        """Tries to take the lock without waiting."""
+        if engine.dialect.name == "postgresql":
+            conn = engine.connect()
+            try:
+                acquired = conn.execute(select(func.pg_try_advisory_lock(_lock_key(self.name)))).scalar()
+                conn.commit()
+            except Exception:
+                conn.close()
+                raise
+            if not acquired:
+                conn.close()
+                return False
+            self._conn = conn
+            return True
+
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(self.name, threading.Lock())
+        if not lock.acquire(blocking=False):
+            return False
+        self._local_lock = lock
+        return True
+
+    def alive(self) -> bool:
+        """Returns True while the lock is still held."""
+        if self._conn is None:
+            return self._local_lock is not None
+        try:
+            self._conn.execute(select(1))
+            self._conn.commit()
+            return True
+        except DBAPIError:
+            self._conn.invalidate()
+            self._conn.close()
+            self._conn = None
+            return False
+
+    def release(self) -> None:
+        """Releases the lock if it is held."""
+        if self._conn is not None:
+            try:
+                self._conn.execute(select(func.pg_advisory_unlock(_lock_key(self.name))))
+                self._conn.commit()
+            finally:
+                self._conn.close()
+                self._conn = None
+        if self._local_lock is not None:
+            self._local_lock.release()
+            self._local_lock = None
@@ -1,5 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Date
+    Column, Integer, BigInteger, String, DateTime, Boolean, Float, Text,
+    ForeignKey, Date, Index, LargeBinary, UniqueConstraint, text
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -23,11 +24,16 @@ class User(Base):
     current_mining_rate_zp_per_hour = Column(Integer, default=10, nullable=False)
     current_mining_capacity_zp = Column(Integer, default=50, nullable=False)
     current_mining_cycle_hours = Column(Integer, default=4, nullable=False)
+    # Purchased miner upgrade levels; the stats above are derived from them
+    mining_speed_level = Column(Integer, default=0, server_default="0", nullable=False)
+    mining_capacity_level = Column(Integer, default=0, server_default="0", nullable=False)
+    mining_hours_level = Column(Integer, default=0, server_default="0", nullable=False)
     mining_started_at = Column(DateTime(timezone=True), default=None, nullable=True)
     last_claim_at = Column(DateTime(timezone=True), default=None, nullable=True)
     daily_streak_count = Column(Integer, default=0, nullable=False)
 
     is_active = Column(Boolean, default=True)
+    is_admin = Column(Boolean, default=False, server_default=text("false"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -35,8 +41,12 @@ class User(Base):
     two_fa_secret = Column(String, nullable=True)
     is_2fa_enabled = Column(Boolean, default=False)
 
-    # Wallet field
+    # Access tokens issued before this instant are rejected (logout everywhere)
+    tokens_valid_after = Column(DateTime(timezone=True), nullable=True)
+
+    # Wallet field, as linked, and its canonical workchain + account hash
     ton_wallet_address = Column(String, unique=True, nullable=True, index=True)
+    ton_wallet_key = Column(LargeBinary(33), unique=True, nullable=True)
 
     # Relationships
     referred_users = relationship("Referral", foreign_keys="Referral.referrer_id", back_populates="referrer_user")
@@ -46,16 +56,26 @@ class User(Base):
     microjob_submissions = relationship("MicroJobSubmission", back_populates="worker")
     posted_tasks = relationship("Task", back_populates="poster") # Relationship for sponsored tasks
 
+    # Running mining cycles, loaded at startup to rebuild the reminder wheel
+    __table_args__ = (
+        Index(
+            "ix_users_mining_started_at",
+            "mining_started_at",
+            postgresql_where=text("mining_started_at IS NOT NULL"),
+            sqlite_where=text("mining_started_at IS NOT NULL"),
+        ),
+    )
+
 
 class Referral(Base):
     """Represents a referral link relationship between two users."""
     __tablename__ = "referrals"
 
     id = Column(Integer, primary_key=True, index=True)
-    referrer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    referrer_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     referred_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     status = Column(String, default="pending", nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Analytics backfill
 
     referrer_user = relationship("User", foreign_keys=[referrer_id], back_populates="referred_users")
     referred_user = relationship("User", foreign_keys=[referred_id], back_populates="referrer_of")
@@ -76,6 +96,7 @@ class Task(Base):
     # --- Fields for sponsored tasks ---
     poster_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     expiration_date = Column(DateTime(timezone=True), nullable=True)
+    max_completions = Column(Integer, nullable=True)  # Completion budget; None means unlimited
     # --- End of sponsored task fields ---
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -84,6 +105,16 @@ class Task(Base):
     user_completions = relationship("UserTaskCompletion", back_populates="task")
     poster = relationship("User", back_populates="posted_tasks") # Relationship back to the user
 
+    # Expired tasks are deactivated by the sweeper, so this only covers live rows
+    __table_args__ = (
+        Index(
+            "ix_tasks_live_expiration",
+            "expiration_date",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+    )
+
 
 class UserTaskCompletion(Base):
     """Records a user's completion of a specific task."""
@@ -98,6 +129,43 @@ class UserTaskCompletion(Base):
     user = relationship("User", back_populates="task_completions")
     task = relationship("Task", back_populates="user_completions")
 
+    # One completion per user and task; also serves the per-user lookups.
+    # Day ranges for the analytics backfill by completed_at.
+    __table_args__ = (
+        UniqueConstraint("user_id", "task_id", name="uq_user_task_completions_user_task"),
+        Index("ix_user_task_completions_completed_at", "completed_at"),
+    )
+
+
+class UserTaskCompletionArchive(Base):
+    """
+    Cold storage for completions of long-expired tasks. Range-partitioned by
+    month of `completed_at` on PostgreSQL; a plain table elsewhere.
+    """
+    __tablename__ = "user_task_completions_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Original completion id
+    completed_at = Column(DateTime(timezone=True), primary_key=True)  # Partition key
+    user_id = Column(Integer, nullable=False, index=True)
+    task_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_user_task_completions_archive_completed_at", "completed_at"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+
+
+class UserTaskSummary(Base):
+    """Compact per-user record of the tasks whose completions were archived."""
+    __tablename__ = "user_task_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    archived_task_ids = Column(LargeBinary, nullable=False)  # Sorted little-endian uint32s
+    archived_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 
 class MicroJob(Base):
     """Represents a micro-job posted by a user in the marketplace."""
@@ -118,6 +186,13 @@ class MicroJob(Base):
     poster = relationship("User", back_populates="posted_microjobs")
     submissions = relationship("MicroJobSubmission", back_populates="microjob")
 
+    # Public feed and expiration sweeps by (status, expiration_date);
+    # a poster's own jobs by (poster_id, status)
+    __table_args__ = (
+        Index("ix_microjobs_status_expiration", "status", "expiration_date"),
+        Index("ix_microjobs_poster_status", "poster_id", "status"),
+    )
+
 
 class MicroJobSubmission(Base):
     """Represents a worker's submission for a micro-job."""
@@ -134,6 +209,13 @@ class MicroJobSubmission(Base):
     microjob = relationship("MicroJob", back_populates="submissions")
     worker = relationship("User", back_populates="microjob_submissions")
 
+    # Duplicate-submission check by job and worker; reviewed submissions by
+    # day for the analytics backfill
+    __table_args__ = (
+        Index("ix_microjob_submissions_microjob_worker", "microjob_id", "worker_id"),
+        Index("ix_microjob_submissions_status_reviewed", "status", "reviewed_at"),
+    )
+
 
 class ChatMessage(Base):
     """Represents a chat message associated with a micro-job."""
@@ -148,3 +230,113 @@ class ChatMessage(Base):
     user = relationship("User")
     microjob = relationship("MicroJob")
 
+
+class IndexerCheckpoint(Base):
+    """Stores how far a chain indexer has ingested, so it resumes without rescanning."""
+    __tablename__ = "indexer_checkpoints"
+
+    name = Column(String, primary_key=True)
+    last_lt = Column(BigInteger, default=0, nullable=False)  # Logical time of the last applied transaction
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class PayoutOutbox(Base):
+    """
+    A payout intent written in the same transaction that approves a
+    micro-job submission, and sent to the escrow contract by the dispatcher.
+    """
+    __tablename__ = "payout_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("microjob_submissions.id"), unique=True, nullable=False)
+    microjob_id = Column(Integer, ForeignKey("microjobs.id"), nullable=False)
+    worker_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    performer_address = Column(String, nullable=True)  # Set once the worker has a wallet
+    status = Column(String, default="pending", nullable=False)  # awaiting_wallet, pending, sending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    tx_hash = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    submission = relationship("MicroJobSubmission")
+
+    __table_args__ = (
+        Index("ix_payout_outbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_payout_outbox_status_claimed", "status", "claimed_at"),
+    )
+
+
+class RevokedToken(Base):
+    """An access token revoked before its expiry, kept until it expires."""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Read incrementally by the revocation filter
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class CatalogVersion(Base):
+    """Version counter bumped on every change to a cached catalog (e.g. active tasks)."""
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, default=0, nullable=False)
+
+
+class SybilCluster(Base):
+    """A group of accounts the sybil detection job flagged as a likely farm."""
+    __tablename__ = "sybil_clusters"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, default="flagged", nullable=False, index=True)  # flagged, confirmed, cleared
+    score = Column(Float, nullable=False)
+    size = Column(Integer, nullable=False)
+    reasons = Column(Text, nullable=False)  # JSON evidence counts
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+    reviewed_at = Column(DateTime(timezone=True), nullable=True)
+    reviewed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    members = relationship("SybilClusterMember", back_populates="cluster")
+
+
+class SybilClusterMember(Base):
+    """An account's membership in a sybil cluster; one cluster per account."""
+    __tablename__ = "sybil_cluster_members"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    cluster_id = Column(Integer, ForeignKey("sybil_clusters.id"), nullable=False, index=True)
+
+    cluster = relationship("SybilCluster", back_populates="members")
+
+
+class DailyStat(Base):
+    """
+    One shard of a daily analytics counter, e.g. ZP issued by mining on a
+    day. Readers sum the shards; writers increment a random one.
+    """
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    metric = Column(String, primary_key=True)
+    dimension = Column(String, primary_key=True, default="")  # e.g. ZP source or task type
+    shard = Column(Integer, primary_key=True, default=0)
+    value = Column(BigInteger, default=0, nullable=False)
+
+
+class TaskCompletionShard(Base):
+    """
+    One shard of a sponsored task's completion budget. Spreading the counter
+    over several rows keeps popular tasks from serialising on a single row.
+    """
+    __tablename__ = "task_completion_shards"
+
+    task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    capacity = Column(Integer, nullable=False)
+    used = Column(Integer, default=0, nullable=False)
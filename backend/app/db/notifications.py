@@ -0,0 +1,155 @@
+"""
+Cross-worker messaging through PostgreSQL LISTEN/NOTIFY.
+
+State such as open event streams lives in one worker process, while the
+request that changes it may be served by any other. A `NotifyChannel`
+hands each message it is sent to a handler in every worker process
+(including the sender's), which applies it to its own state.
+
+Sending never blocks the caller on the database: messages are queued and a
+sender thread issues `pg_notify` in small transactions. A listener thread
+keeps a dedicated psycopg2 connection, outside the pool, LISTENing on the
+channel and reconnects after errors. Delivery is best effort: messages
+sent while a listener reconnects are lost, and payloads are limited to
+PostgreSQL's 8000 bytes.
+
+Other databases (SQLite in development) run a single worker, so
+`enabled()` is False there and callers handle messages in-process.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+# Notifications sent per transaction by the sender thread
+SEND_BATCH_SIZE = 100
+# How often the listener wakes up to check for shutdown
+POLL_SECONDS = 1.0
+RECONNECT_SECONDS = 5.0
+
+_STOP = object()
+
+Handler = Callable[[Dict[str, Any]], None]
+
+
+def enabled() -> bool:
+    """Returns True if the database can fan messages out to other workers."""
+    return engine.dialect.name == "postgresql"
+
+
+class NotifyChannel:
+    """A named NOTIFY channel with a sender and a listener thread."""
+
+    def __init__(self, name: str, handler: Handler):
+        self.name = name
+        self._handler = handler
+        self._outbox: "queue.Queue[object]" = queue.Queue()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        """Starts the sender and listener threads."""
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._send_loop, name=f"notify-send-{self.name}", daemon=True),
+            threading.Thread(target=self._listen_loop, name=f"notify-listen-{self.name}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Sends what is queued, then stops both threads."""
+        self._stopped.set()
+        self._outbox.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=RECONNECT_SECONDS)
+        self._threads = []
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        """
+        Queues `message` for every worker. Returns False, without sending,
+        if it does not fit in a notification.
+        """
+        payload = json.dumps(jsonable_encoder(message), separators=(",", ":"))
+        size = len(payload.encode("utf-8"))
+        if size > MAX_PAYLOAD_BYTES:
+            logger.warning("Message too large for channel %s (%d bytes)", self.name, size)
+            return False
+        self._outbox.put(payload)
+        return True
+
+    def _send_loop(self) -> None:
+        while True:
+            batch = [self._outbox.get()]
+            while len(batch) < SEND_BATCH_SIZE:
+                try:
+                    batch.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            payloads = [payload for payload in batch if payload is not _STOP]
+            if payloads:
+                try:
+                    # Notifications go out in order when the transaction commits
+                    with engine.begin() as conn:
+                        for payload in payloads:
+                            conn.execute(sql_select(func.pg_notify(self.name, payload)))
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Failed to send %d messages on channel %s", len(payloads), self.name)
+            if len(payloads) < len(batch):
+                return
+
+    def _listen_loop(self) -> None:
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                # LISTEN needs autocommit; keep the connection out of the pool
+                connection.detach()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.rollback()
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.name}"')
+                self._poll(dbapi_connection)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Listener for channel %s failed; reconnecting", self.name)
+                self._stopped.wait(RECONNECT_SECONDS)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _poll(self, dbapi_connection) -> None:
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([dbapi_connection], [], [], POLL_SECONDS)
+            if not readable:
+                continue
+            dbapi_connection.poll()
+            while dbapi_connection.notifies:
+                self._receive(dbapi_connection.notifies.pop(0).payload)
+
+    def _receive(self, payload: str) -> None:
+        try:
+            self._handler(json.loads(payload))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Failed to handle a message on channel %s", self.name)
+
+
+def open_channel(name: str, handler: Handler) -> Optional[NotifyChannel]:
+    """Starts a channel if the database supports it, otherwise returns None."""
+    if not enabled():
+        return None
+    channel = NotifyChannel(name, handler)
+    channel.start()
+    return channel
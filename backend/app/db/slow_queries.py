@@ -0,0 +1,290 @@
+"""
+Slow-query log for the application's engine.
+
+Engine events time every statement. A statement taking at least
+`SLOW_QUERY_THRESHOLD_MS` is recorded with:
+
+- its normalized SQL (whitespace collapsed, IN lists and literals replaced
+  by placeholders), which groups executions of one query;
+- the shape of its bound parameters (names and types, never values);
+- the calling service function (the nearest `app.services` frame, else the
+  nearest application frame) and the route of the request that ran it;
+- with `SLOW_QUERY_EXPLAIN`, its plan, captured by a background thread on a
+  separate connection at most once per `SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS`
+  for each normalized statement. Plain EXPLAIN only; the statement is never
+  run again.
+
+Records go to the `app.db.slow_queries` logger as JSON lines (to the
+rotating `SLOW_QUERY_LOG_FILE` if set) and into per-worker aggregates, served
+as a top-N view by `GET /admin/slow-queries`.
+"""
+import json
+import logging
+import logging.handlers
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SAMPLES = 5  # Distinct callers and routes kept per statement
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# The ASGI scope of the request being served, for its route
+_request_scope: ContextVar[Optional[dict]] = ContextVar("slow_query_scope", default=None)
+_explaining = threading.local()
+_file_log_lock = threading.Lock()
+_file_log_configured = False
+
+
+# --------------------------------------------------------------------------
+# Describing a statement
+# --------------------------------------------------------------------------
+
+_IN_LIST = re.compile(r"\((?:\?|%\(\w+\)s|%s)(?:, (?:\?|%\(\w+\)s|%s))+\)")
+_NUMBERED_PARAM = re.compile(r"%\(\w+?_\d+\)s")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+
+
+def normalize(statement: str) -> str:
+    """The statement with whitespace, IN lists and literals normalized."""
+    statement = " ".join(statement.split())
+    statement = _IN_LIST.sub("(?...)", statement)
+    statement = _NUMBERED_PARAM.sub("?", statement)
+    statement = _STRING_LITERAL.sub("?", statement)
+    return _NUMBER_LITERAL.sub("?", statement)
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Names and types of the bound parameters, e.g. `{user_id: int}`."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {parameter_shape(rows[0], False)}" if rows else "0 x ()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return "()"
+
+
+def _caller() -> Optional[str]:
+    """The service function that issued the statement, else the nearest app function."""
+    fallback = None
+    frame = sys._getframe(2)  # pylint: disable=protected-access
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and module != __name__:
+            name = f"{module}.{getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)}"
+            if module.startswith("app.services."):
+                return name
+            fallback = fallback or name
+        frame = frame.f_back
+    return fallback
+
+
+def _route() -> Optional[str]:
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+
+# --------------------------------------------------------------------------
+# Aggregates
+# --------------------------------------------------------------------------
+
+class _Aggregates:
+    """Per-statement totals of slow executions in this worker, bounded in size."""
+
+    def __init__(self):
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: dict) -> bool:
+        """Adds a slow execution; True if its statement is due for an EXPLAIN."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(record["statement"])
+            if entry is None:
+                if len(self._entries) >= settings.SLOW_QUERY_MAX_STATEMENTS:
+                    # Make room by dropping the statement costing least in total
+                    del self._entries[min(self._entries, key=lambda key: self._entries[key]["total_ms"])]
+                entry = self._entries[record["statement"]] = {
+                    "statement": record["statement"],
+                    "parameters": record["parameters"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "callers": [],
+                    "routes": [],
+                    "first_seen": record["at"],
+                    "last_seen": record["at"],
+                    "plan": None,
+                    "explained_at": 0.0,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += record["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], record["duration_ms"])
+            entry["last_seen"] = record["at"]
+            for key, value in (("callers", record["caller"]), ("routes", record["route"])):
+                if value and value not in entry[key] and len(entry[key]) < MAX_SAMPLES:
+                    entry[key].append(value)
+            due = now - entry["explained_at"] >= settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+            if due:
+                entry["explained_at"] = now
+            return due
+
+    def set_plan(self, statement: str, plan: List[str]) -> None:
+        with self._lock:
+            if statement in self._entries:
+                self._entries[statement]["plan"] = plan
+
+    def top(self, limit: int, order_by: str) -> List[dict]:
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry["mean_ms"] = round(entry["total_ms"] / entry["count"], 3)
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+            del entry["explained_at"]
+        key = {"total": "total_ms", "max": "max_ms", "mean": "mean_ms", "count": "count"}[order_by]
+        entries.sort(key=lambda entry: entry[key], reverse=True)
+        return entries[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+aggregates = _Aggregates()
+
+
+def top(limit: int = 20, order_by: str = "total") -> List[dict]:
+    """The slowest statements seen by this worker, by total, max or mean time or count."""
+    return aggregates.top(limit, order_by)
+
+
+# --------------------------------------------------------------------------
+# EXPLAIN capture
+# --------------------------------------------------------------------------
+
+_explainer: Optional[ThreadPoolExecutor] = None
+
+
+def _explain(engine, statement: str, raw_statement: str, parameters) -> None:
+    _explaining.active = True
+    try:
+        with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                rows = conn.exec_driver_sql("EXPLAIN " + raw_statement, parameters).all()
+            else:
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + raw_statement, parameters).all()
+            conn.rollback()
+        plan = [str(row[-1]) for row in rows]
+        aggregates.set_plan(statement, plan)
+        logger.info(json.dumps({"statement": statement, "plan": plan}))
+    except Exception as exc:  # pylint: disable=broad-except
+        aggregates.set_plan(statement, [f"EXPLAIN failed: {exc!r}"])
+    finally:
+        _explaining.active = False
+
+
+def _schedule_explain(engine, statement: str, raw_statement: str, parameters) -> None:
+    global _explainer  # pylint: disable=global-statement
+    if not raw_statement.lstrip().upper().startswith(EXPLAINABLE):
+        return
+    if _explainer is None:
+        _explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+    _explainer.submit(_explain, engine, statement, raw_statement, parameters)
+
+
+# --------------------------------------------------------------------------
+# Engine events
+# --------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()  # pylint: disable=protected-access
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_slow_query_started", None)
+    if started is None or getattr(_explaining, "active", False):
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+    record = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration_ms, 3),
+        "statement": normalize(statement),
+        "parameters": parameter_shape(parameters, executemany),
+        "caller": _caller(),
+        "route": _route(),
+    }
+    if not _file_log_configured:
+        _configure_file_log()
+    logger.warning(json.dumps(record))
+    if aggregates.add(record) and settings.SLOW_QUERY_EXPLAIN and not executemany:
+        _schedule_explain(conn.engine, record["statement"], statement, parameters)
+
+
+class RequestScopeMiddleware:
+    """ASGI middleware making the current request's route known to the slow-query log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+def _configure_file_log() -> None:
+    """Attaches the rotating file, on the first slow statement so idle runs create nothing."""
+    global _file_log_configured  # pylint: disable=global-statement
+    with _file_log_lock:
+        if _file_log_configured:
+            return
+        _file_log_configured = True
+        if settings.SLOW_QUERY_LOG_FILE:
+            logger.addHandler(_file_handler(Path(settings.SLOW_QUERY_LOG_FILE)))
+        logger.setLevel(logging.INFO)
+
+
+def _file_handler(path: Path) -> logging.Handler:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+        backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def install(engine) -> None:
+    """Times every statement on `engine` if the slow-query log is enabled."""
+    if not settings.SLOW_QUERY_LOG_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,40 @@
+"""
+Database-backed version counters for cached catalogs.
+
+Writers bump a catalog's counter in the same transaction as the change, and
+every worker compares it with the version of its in-process snapshot, so
+caches stay coherent across processes with one tiny primary-key read.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+TASKS_CATALOG = "tasks"
+
+
+def get_version(db: Session, name: str) -> int:
+    """Returns the current version of a catalog (0 if it was never bumped)."""
+    version = db.execute(
+        select(models.CatalogVersion.version).where(models.CatalogVersion.name == name)
+    ).scalar()
+    return version or 0
+
+
+def bump_version(db: Session, name: str) -> None:
+    """
+    Increments a catalog's version, creating its row on first use. A single
+    upsert, so concurrent first bumps cannot conflict. Does not commit.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Catalog versions do not support {dialect}.")
+    statement = dialect_insert(models.CatalogVersion).values(name=name, version=1)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": models.CatalogVersion.version + 1},
+    ))
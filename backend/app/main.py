@@ -4,17 +4,108 @@ Main entry point for the Ziver Backend API application.
 This file initializes the FastAPI app, sets up CORS middleware,
 creates database tables, and includes the API routers.
 """
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1 import routes as v1_routes
+from app.core import profiling, threadpools
+from app.core.background import PeriodicJob
+from app.core.config import settings
+from app.core.events import event_bus
+from app.core.scheduler import mining_scheduler
+from app.db import notifications, slow_queries
 from app.db.database import Base, engine
+from app.services import (
+    escrow_indexer,
+    expiration,
+    mining_reminders,
+    payouts,
+    task_completions,
+    token_revocation,
+    ton_proof,
+    two_factor_auth,
+)
 
 # This creates all the database tables defined in your models
 # based on the SQLAlchemy Base metadata. It's suitable for development.
 # For production, it's recommended to use a migration tool like Alembic.
 Base.metadata.create_all(bind=engine)
 
+# Maintenance jobs started with the application
+background_jobs = [
+    PeriodicJob(
+        "mining-reminder-election",
+        mining_reminders.run_election,
+        settings.MINING_REMINDER_ELECTION_SECONDS,
+    ),
+    PeriodicJob(
+        "expiration-sweeper",
+        expiration.run_sweep,
+        settings.EXPIRATION_SWEEP_INTERVAL_SECONDS,
+    ),
+    PeriodicJob(
+        "payout-dispatcher",
+        payouts.run_dispatcher,
+        settings.PAYOUT_DISPATCH_INTERVAL_SECONDS,
+    ),
+    PeriodicJob(
+        "task-completion-archiver",
+        task_completions.run_archiver,
+        settings.TASK_COMPLETION_ARCHIVE_INTERVAL_SECONDS,
+    ),
+    PeriodicJob(
+        "revoked-token-purger",
+        token_revocation.run_purger,
+        settings.TOKEN_REVOCATION_PURGE_INTERVAL_SECONDS,
+    ),
+]
+if settings.ESCROW_INDEXER_SOURCE != "none":
+    background_jobs.append(
+        PeriodicJob(
+            "escrow-indexer",
+            escrow_indexer.run_indexer,
+            settings.ESCROW_INDEXER_INTERVAL_SECONDS,
+        )
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts and stops the real-time event machinery and background jobs."""
+    threadpools.configure_default_limiter()
+    event_bus.bind_loop(asyncio.get_running_loop())
+    # With several workers, events fan out to the other processes' streams
+    event_channel = notifications.open_channel("ziver_events", event_bus.receive)
+    if event_channel is not None:
+        event_bus.set_relay(event_channel.send)
+    # Reminders run in one worker (see mining_reminders); the others forward
+    # their updates to it
+    reminder_channel = notifications.open_channel("ziver_mining_reminders", mining_reminders.apply_update)
+    if reminder_channel is not None:
+        mining_reminders.set_relay(reminder_channel.send)
+    mining_scheduler.set_callback(mining_reminders.dispatch_due)
+    mining_scheduler.start()
+    for job in background_jobs:
+        job.start()
+    yield
+    for job in background_jobs:
+        await job.stop()
+    await mining_scheduler.stop()
+    await asyncio.to_thread(mining_reminders.resign)
+    if reminder_channel is not None:
+        mining_reminders.set_relay(None)
+        await asyncio.to_thread(reminder_channel.stop)
+    ton_proof.verifier.shutdown()
+    two_factor_auth.qr_renderer.shutdown()
+    if event_channel is not None:
+        event_bus.set_relay(None)
+        await asyncio.to_thread(event_channel.stop)
+    event_bus.unbind_loop()
+
+
 # Initialize the FastAPI application instance
 app = FastAPI(
     title="Ziver Backend API",
@@ -22,7 +113,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 # Configure Cross-Origin Resource Sharing (CORS)
@@ -40,6 +132,13 @@ app.add_middleware(
 # Include all the API endpoints from the v1 router without any prefix
 app.include_router(v1_routes.router)
 
+# Opt-in request profiling (PROFILING_ENABLED); installs nothing otherwise
+profiling.install(app, engine)
+
+# Lets the slow-query log record the route of each slow statement
+if settings.SLOW_QUERY_LOG_ENABLED:
+    app.add_middleware(slow_queries.RequestScopeMiddleware)
+
 
 @app.get("/")
 async def root():
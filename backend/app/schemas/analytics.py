@@ -0,0 +1,19 @@
+from datetime import date
+from typing import List
+
+from pydantic import BaseModel
+
+
+class DailyStatResponse(BaseModel):
+    """One daily counter: a metric's value for a dimension on a day."""
+    day: date
+    metric: str
+    dimension: str
+    value: int
+
+
+class DailyStatsResponse(BaseModel):
+    """Schema for the admin daily statistics."""
+    start: date
+    end: date
+    stats: List[DailyStatResponse] = []
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+class BatchItem(BaseModel):
+    """Schema for one sub-request of a batch."""
+    id: Optional[str] = None # Echoed back to match responses to requests
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str = Field(..., pattern=r"^/[^?#]*$") # e.g. "/tasks/3/complete"; query goes in `query`
+    query: Optional[Dict[str, str]] = None
+    body: Optional[Any] = None # Sent as JSON
+
+class BatchRequest(BaseModel):
+    """Schema for a batch of sub-requests."""
+    mode: Literal["sequential", "parallel"] = "sequential" # Parallel runs GETs concurrently, writes in order
+    stop_on_error: bool = False # Sequential only: skip the rest after a 4xx/5xx
+    requests: List[BatchItem] = Field(..., min_length=1)
+
+class BatchItemResponse(BaseModel):
+    """Schema for the outcome of one sub-request."""
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    """Schema for the outcomes of a batch, in request order."""
+    responses: List[BatchItemResponse]
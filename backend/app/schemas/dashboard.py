@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+from app.schemas.microjob import MicroJobResponse
+from app.schemas.mining import MiningStatusResponse
+from app.schemas.referral import ReferralSummaryResponse
+from app.schemas.task import TaskResponse
+from app.schemas.user import UserResponse
+
+class DashboardResponse(BaseModel):
+    """
+    Schema for the app-open dashboard. Only the sections requested with
+    `fields` are present in the response.
+    """
+    user: Optional[UserResponse] = None
+    mining: Optional[MiningStatusResponse] = None
+    tasks: Optional[List[TaskResponse]] = None
+    microjobs: Optional[List[MicroJobResponse]] = None
+    referrals: Optional[ReferralSummaryResponse] = None
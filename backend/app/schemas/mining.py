@@ -27,4 +27,14 @@ class MinerUpgradeResponse(BaseModel):
     new_zp_balance: int
     cost_in_zp: Optional[int] = None
     cost_in_ton: Optional[float] = None # For higher level upgrades
+    new_level: Optional[int] = None
   
+
+class MiningStatusResponse(BaseModel):
+    """Schema for the user's current mining cycle."""
+    is_mining: bool
+    mining_started_at: Optional[datetime] = None
+    mining_ends_at: Optional[datetime] = None
+    seconds_remaining: int = 0
+    claimable_zp: int = 0
+    checkin_bonus_available: bool = False
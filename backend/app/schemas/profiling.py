@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ProfilingTokenResponse(BaseModel):
+    """Schema for a header that gets requests profiled until it expires."""
+    header: str
+    value: str
+    expires_at: int
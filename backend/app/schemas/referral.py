@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class ReferralResponse(BaseModel):
@@ -21,3 +21,10 @@ class ReferralLinkResponse(BaseModel):
     """Schema for returning the user's referral link."""
     referral_link: str
   
+
+class ReferralSummaryResponse(BaseModel):
+    """Schema for summarising a user's referrals."""
+    referral_link: str
+    total_referrals: int
+    max_referrals: int
+    referrals: List[ReferralResponse] = []
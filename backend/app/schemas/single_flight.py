@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class SingleFlightStats(BaseModel):
+    """Schema for the call counters of one coalesced read."""
+    name: str
+    calls: int
+    executions: int  # Ran the function
+    coalesced: int  # Waited for a running call
+    cached: int  # Reused a recent result
+    in_flight: int
@@ -0,0 +1,18 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class SlowQueryResponse(BaseModel):
+    """Schema for the slow executions of one normalized statement."""
+    statement: str
+    parameters: str  # Names and types of the bound parameters
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    callers: List[str] = []
+    routes: List[str] = []
+    first_seen: str
+    last_seen: str
+    plan: Optional[List[str]] = None  # With SLOW_QUERY_EXPLAIN
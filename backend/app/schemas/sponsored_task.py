@@ -1,5 +1,6 @@
 # app/schemas/sponsored_task.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 from enum import Enum
 
 class DurationOption(str, Enum):
@@ -10,6 +11,8 @@ class DurationOption(str, Enum):
 class UserSponsoredTaskCreate(BaseModel):
     title: str
     description: str
-    zp_reward: int # The reward the poster wants to give to each user who completes it
+    zp_reward: int = Field(..., gt=0) # The reward the poster wants to give to each user who completes it
     external_link: str # Link to the social media post, etc.
-    duration: DurationOption
\ No newline at end of file
+    duration: DurationOption
+    # How many users can complete it; at most, and by default, the ZP paid divided by the reward
+    max_completions: Optional[int] = Field(None, gt=0)
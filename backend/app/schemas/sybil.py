@@ -0,0 +1,27 @@
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class SybilClusterResponse(BaseModel):
+    """Schema for a flagged cluster of suspected farm accounts."""
+    id: int
+    status: str
+    score: float
+    size: int
+    reasons: Dict[str, float]
+    detected_at: Optional[datetime] = None
+    reviewed_at: Optional[datetime] = None
+    user_ids: List[int] = []
+
+
+class SybilReviewStatus(str, Enum):
+    confirmed = "confirmed"
+    cleared = "cleared"
+
+
+class SybilReviewRequest(BaseModel):
+    """Schema for an admin's decision on a cluster."""
+    status: SybilReviewStatus
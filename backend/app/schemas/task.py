@@ -18,6 +18,7 @@ class TaskCreate(TaskBase):
 class TaskResponse(TaskBase):
     """Schema for returning task data (response model)."""
     id: int
+    max_completions: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -39,4 +40,9 @@ class UserTaskCompletionResponse(BaseModel):
 
     class Config:
         from_attributes = True
-      
+
+class TaskCompletionResponse(BaseModel):
+    """Schema for the response after completing a task."""
+    message: str
+    new_zp_balance: int
+    completion: UserTaskCompletionResponse
@@ -0,0 +1,25 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class HistogramBucket(BaseModel):
+    """Number of observations up to `le` seconds ("+Inf" for all)."""
+    le: str
+    count: int
+
+
+class QueueTimeHistogram(BaseModel):
+    """Cumulative histogram of the seconds calls waited for a worker thread."""
+    buckets: List[HistogramBucket]
+    count: int
+    sum: float
+
+
+class ThreadPoolStats(BaseModel):
+    """Schema for the current usage of one worker thread pool."""
+    name: str
+    size: int
+    busy: int
+    waiting: int
+    queue_time: Optional[QueueTimeHistogram] = None  # Not recorded for the default pool
@@ -27,6 +27,9 @@ class UserResponse(UserBase):
     current_mining_rate_zp_per_hour: int
     current_mining_capacity_zp: int
     current_mining_cycle_hours: int
+    mining_speed_level: int = 0
+    mining_capacity_level: int = 0
+    mining_hours_level: int = 0
     mining_started_at: Optional[datetime] = None
     last_claim_at: Optional[datetime] = None
     daily_streak_count: int
@@ -48,7 +51,7 @@ class TwoFACode(BaseModel):
 
 class TwoFASetupResponse(BaseModel):
     secret: str
-    qr_code_image: str # Base64 encoded PNG data URL
+    qr_code_image: str # Base64 encoded PNG or SVG data URL
     message: str
 
 class UserLoginWith2FA(UserLogin):
@@ -1,7 +1,25 @@
 # Create a new Pydantic schema file: app/schemas/wallet.py
+from typing import Optional
+
 from pydantic import BaseModel
 
+
+class TonProof(BaseModel):
+   """A TON Connect `ton_proof` of wallet ownership."""
+   timestamp: int
+   domain: str
+   payload: str  # Issued by /users/me/ton-proof-payload
+   signature: str  # Base64
+   state_init: str  # Base64 bag of cells of the wallet's StateInit
+   public_key: str  # Hex
+
+
 class WalletLinkRequest(BaseModel):
    wallet_address: str
+   proof: Optional[TonProof] = None
 
 
+class TonProofPayloadResponse(BaseModel):
+   """Schema for a payload the wallet signs to prove ownership."""
+   payload: str
+   expires_at: int
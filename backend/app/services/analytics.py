@@ -0,0 +1,281 @@
+"""
+Daily analytics rollups.
+
+Admin statistics are read from `daily_stats`, a table of counters keyed by
+(day, metric, dimension). The service functions that issue ZP, complete
+tasks or approve micro-jobs add to the counters in their own transaction via
+`record`, so the rollups stay current without scanning `users`,
+`user_task_completions` or `microjobs`. Each counter is split over
+`ANALYTICS_ROLLUP_SHARDS` rows, like task budgets, so that concurrent claims
+rarely wait on the same row.
+
+`backfill` rebuilds the metrics that can be derived from stored rows (task
+completions, referrals, micro-jobs) for past days in chunked passes. Mining
+and check-in ZP and active miners are only known from the time the counters
+were introduced.
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+
+# Metrics; ZP_ISSUED and TASK_COMPLETIONS are broken down by dimension
+ZP_ISSUED = "zp_issued"  # dimension: SOURCE_*
+ACTIVE_MINERS = "active_miners"  # Users with a mining claim that day
+TASK_COMPLETIONS = "task_completions"  # dimension: task type
+MICROJOBS_COMPLETED = "microjobs_completed"
+MICROJOB_VOLUME_NANOTON = "microjob_volume_nanoton"
+MICROJOB_FEES_NANOTON = "microjob_fees_nanoton"
+
+METRICS = (
+    ZP_ISSUED, ACTIVE_MINERS, TASK_COMPLETIONS,
+    MICROJOBS_COMPLETED, MICROJOB_VOLUME_NANOTON, MICROJOB_FEES_NANOTON,
+)
+
+SOURCE_MINING = "mining"
+SOURCE_CHECKIN = "checkin"
+SOURCE_TASKS = "tasks"
+SOURCE_REFERRALS = "referrals"
+
+# Metrics `backfill` can recompute from stored rows, with their ZP sources
+BACKFILL_METRICS = (
+    ZP_ISSUED, TASK_COMPLETIONS, MICROJOBS_COMPLETED,
+    MICROJOB_VOLUME_NANOTON, MICROJOB_FEES_NANOTON,
+)
+BACKFILL_SOURCES = (SOURCE_TASKS, SOURCE_REFERRALS)
+
+NANOTON = 10 ** 9
+
+Key = Tuple[str, str]  # (metric, dimension)
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _upsert(db: Session, rows: List[dict]) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise RuntimeError(f"Analytics rollups do not support {dialect}.")
+    statement = dialect_insert(models.DailyStat).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["day", "metric", "dimension", "shard"],
+        set_={"value": models.DailyStat.value + statement.excluded.value},
+    ))
+
+
+def record(db: Session, increments: Dict[Key, int], day: Optional[date] = None) -> None:
+    """
+    Adds `increments` ({(metric, dimension): amount}) to the day's counters
+    (today by default) as part of the caller's transaction. Does not commit.
+    """
+    rows = [
+        {"day": day or _today(), "metric": metric, "dimension": dimension,
+         "shard": 0, "value": amount}
+        for (metric, dimension), amount in sorted(increments.items())
+        if amount
+    ]
+    if not rows:
+        return
+    # One shard per transaction: rows are locked in key order, so concurrent
+    # writers cannot deadlock on each other.
+    shard = random.randrange(max(1, settings.ANALYTICS_ROLLUP_SHARDS))
+    for row in rows:
+        row["shard"] = shard
+    _upsert(db, rows)
+
+
+def record_mining_claim(db: Session, user: models.User, zp_mined: int, zp_bonus: int) -> None:
+    """Counters for a mining claim. Call before updating `user.last_claim_at`."""
+    first_claim_today = user.last_claim_at is None or user.last_claim_at.date() != _today()
+    record(db, {
+        (ZP_ISSUED, SOURCE_MINING): zp_mined,
+        (ZP_ISSUED, SOURCE_CHECKIN): zp_bonus,
+        (ACTIVE_MINERS, ""): int(first_claim_today),
+    })
+
+
+def record_checkin(db: Session, zp_bonus: int) -> None:
+    """Counters for a daily check-in bonus."""
+    record(db, {(ZP_ISSUED, SOURCE_CHECKIN): zp_bonus})
+
+
+def record_task_completion(db: Session, task: models.Task) -> None:
+    """Counters for a completed task and its reward."""
+    record(db, {
+        (TASK_COMPLETIONS, task.type): 1,
+        (ZP_ISSUED, SOURCE_TASKS): task.zp_reward,
+    })
+
+
+def record_referral(db: Session, zp_reward: int) -> None:
+    """Counters for a referral reward."""
+    record(db, {(ZP_ISSUED, SOURCE_REFERRALS): zp_reward})
+
+
+def _nanoton(amount: float) -> int:
+    return int(round(amount * NANOTON))
+
+
+def record_microjob_completed(db: Session, microjob: models.MicroJob) -> None:
+    """Counters for an approved micro-job: its TON volume and Ziver's fee."""
+    record(db, {
+        (MICROJOBS_COMPLETED, ""): 1,
+        (MICROJOB_VOLUME_NANOTON, ""): _nanoton(microjob.ton_payment_amount),
+        (MICROJOB_FEES_NANOTON, ""): _nanoton(
+            microjob.ton_payment_amount * microjob.ziver_fee_percentage
+        ),
+    })
+
+
+def get_daily_stats(
+    db: Session, start: date, end: date, metrics: Optional[Iterable[str]] = None
+) -> List[dict]:
+    """Counter values per day, metric and dimension for `start`..`end` inclusive."""
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="`end` is before `start`."
+        )
+    if (end - start).days >= settings.ANALYTICS_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.ANALYTICS_MAX_RANGE_DAYS} days can be requested.",
+        )
+    metrics = list(metrics or METRICS)
+    unknown = sorted(set(metrics) - set(METRICS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metrics: {', '.join(unknown)}. Expected: {', '.join(METRICS)}.",
+        )
+    stat = models.DailyStat
+    rows = db.execute(
+        select(stat.day, stat.metric, stat.dimension, func.sum(stat.value))
+        .where(stat.day >= start, stat.day <= end, stat.metric.in_(metrics))
+        .group_by(stat.day, stat.metric, stat.dimension)
+        .order_by(stat.day, stat.metric, stat.dimension)
+    ).all()
+    return [
+        {"day": day, "metric": metric, "dimension": dimension, "value": int(value)}
+        for day, metric, dimension, value in rows
+    ]
+
+
+# --------------------------------------------------------------------------
+# Backfill
+# --------------------------------------------------------------------------
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _aggregate(db: Session, start: datetime, end: datetime) -> Dict[Tuple[date, str, str], int]:
+    totals: Dict[Tuple[date, str, str], int] = defaultdict(int)
+
+    task = models.Task
+    for completion in (models.UserTaskCompletion, models.UserTaskCompletionArchive):
+        day = func.date(completion.completed_at)
+        for value, task_type, count, reward in db.execute(
+            select(day, task.type, func.count(), func.sum(task.zp_reward))
+            .join(task, task.id == completion.task_id)
+            .where(completion.completed_at >= start, completion.completed_at < end)
+            .group_by(day, task.type)
+        ):
+            totals[(_as_date(value), TASK_COMPLETIONS, task_type)] += count
+            totals[(_as_date(value), ZP_ISSUED, SOURCE_TASKS)] += reward or 0
+
+    # The reward is the current setting; past changes to it are not known.
+    # Held referrals are not paid yet and count on their creation day once
+    # released.
+    referral = models.Referral
+    day = func.date(referral.created_at)
+    for value, count in db.execute(
+        select(day, func.count())
+        .where(
+            referral.status == "completed",
+            referral.created_at >= start,
+            referral.created_at < end,
+        )
+        .group_by(day)
+    ):
+        totals[(_as_date(value), ZP_ISSUED, SOURCE_REFERRALS)] += (
+            count * settings.REFERRAL_INITIAL_ZP_REWARD
+        )
+
+    submission, job = models.MicroJobSubmission, models.MicroJob
+    day = func.date(submission.reviewed_at)
+    for value, count, volume, fees in db.execute(
+        select(
+            day,
+            func.count(),
+            func.sum(job.ton_payment_amount),
+            func.sum(job.ton_payment_amount * job.ziver_fee_percentage),
+        )
+        .join(job, job.id == submission.microjob_id)
+        .where(
+            submission.status == "approved",
+            submission.reviewed_at >= start,
+            submission.reviewed_at < end,
+        )
+        .group_by(day)
+    ):
+        totals[(_as_date(value), MICROJOBS_COMPLETED, "")] += count
+        totals[(_as_date(value), MICROJOB_VOLUME_NANOTON, "")] += _nanoton(volume or 0)
+        totals[(_as_date(value), MICROJOB_FEES_NANOTON, "")] += _nanoton(fees or 0)
+    return totals
+
+
+def backfill_chunk(db: Session, start: date, end: date) -> int:
+    """
+    Recomputes the backfillable metrics for the days `start` (inclusive) to
+    `end` (exclusive) in one transaction. Returns the number of counters written.
+    """
+    stat = models.DailyStat
+    db.execute(delete(stat).where(
+        stat.day >= start,
+        stat.day < end,
+        stat.metric.in_(BACKFILL_METRICS),
+        # Mining and check-in ZP share the metric but cannot be rebuilt
+        or_(stat.metric != ZP_ISSUED, stat.dimension.in_(BACKFILL_SOURCES)),
+    ))
+    totals = _aggregate(
+        db,
+        datetime.combine(start, datetime.min.time(), timezone.utc),
+        datetime.combine(end, datetime.min.time(), timezone.utc),
+    )
+    rows = [
+        {"day": day, "metric": metric, "dimension": dimension, "shard": 0, "value": value}
+        for (day, metric, dimension), value in sorted(totals.items())
+        if value and start <= day < end
+    ]
+    if rows:
+        db.execute(insert(stat), rows)
+    db.commit()
+    return len(rows)
+
+
+def backfill(db: Session, start: date, end: Optional[date] = None, chunk_days: Optional[int] = None):
+    """
+    Rebuilds the backfillable metrics from `start` up to `end` (exclusive,
+    at most today, whose counters are still being written) in chunks of
+    `chunk_days`. Yields (chunk_start, chunk_end, counters_written).
+    """
+    end = min(end or _today(), _today())
+    chunk = timedelta(days=chunk_days or settings.ANALYTICS_BACKFILL_CHUNK_DAYS)
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        yield chunk_start, chunk_end, backfill_chunk(db, chunk_start, chunk_end)
+        chunk_start = chunk_end
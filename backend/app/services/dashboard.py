@@ -0,0 +1,69 @@
+"""
+Service layer for the composite app-open dashboard.
+
+Assembles the profile, mining status, available tasks, the user's micro-jobs
+and a referral summary in one request. The user row is the one already
+loaded by authentication, the task list comes from the shared catalog
+snapshot, and each remaining section costs a single query, run only when
+the section is requested.
+"""
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.services import (
+    microjobs as microjobs_service,
+    mining as mining_service,
+    referrals as referrals_service,
+    tasks as tasks_service,
+)
+
+DASHBOARD_SECTIONS = ("user", "mining", "tasks", "microjobs", "referrals")
+
+
+def parse_fields(fields: Optional[str]) -> Iterable[str]:
+    """
+    Parses a comma-separated `fields` selection. Returns every section when
+    no selection is given.
+    """
+    if not fields:
+        return DASHBOARD_SECTIONS
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(selected) - set(DASHBOARD_SECTIONS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown dashboard fields: {', '.join(unknown)}. "
+            f"Available: {', '.join(DASHBOARD_SECTIONS)}.",
+        )
+    return [section for section in DASHBOARD_SECTIONS if section in selected]
+
+
+def _referral_summary(db: Session, user: models.User) -> dict:
+    referrals = referrals_service.get_referred_users(db, user.id)
+    return {
+        "referral_link": referrals_service.get_referral_link(user.id),
+        "total_referrals": len(referrals),
+        "max_referrals": settings.MAX_REFERRALS_PER_USER,
+        "referrals": referrals,
+    }
+
+
+def get_dashboard(db: Session, user: models.User, fields: Optional[str] = None) -> dict:
+    """Builds the requested dashboard sections for the user."""
+    sections = parse_fields(fields)
+    dashboard = {}
+    if "user" in sections:
+        dashboard["user"] = user
+    if "mining" in sections:
+        dashboard["mining"] = mining_service.get_mining_status(user)
+    if "tasks" in sections:
+        dashboard["tasks"] = tasks_service.get_available_tasks(db, user.id)
+    if "microjobs" in sections:
+        dashboard["microjobs"] = microjobs_service.get_microjobs(db, user_id=user.id)
+    if "referrals" in sections:
+        dashboard["referrals"] = _referral_summary(db, user)
+    return dashboard
@@ -0,0 +1,194 @@
+"""
+Interfaces to the on-chain escrow contract (`contracts/contracts/escrow_s_m.fc`).
+
+The backend never talks to the TON network directly from request handlers.
+Background services use the pluggable interfaces defined here, so a live
+TON API implementation and the local fixture-backed ones used in tests and
+development are interchangeable.
+"""
+import bisect
+import hashlib
+import json
+import random
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Task states stored by the contract (STATE_* constants in escrow_s_m.fc)
+STATE_TASK_SET_AND_FUNDS_PENDING = 1
+STATE_ACTIVE = 2
+STATE_PENDING_VERIFICATION = 3
+STATE_SETTLED = 4
+STATE_DISPUTED = 5
+STATE_EXPIRED = 6
+STATE_REFUNDED = 7
+
+
+@dataclass(frozen=True)
+class EscrowEvent:
+    """
+    A transaction processed by the escrow contract.
+
+    `task_id` is the contract's 64-bit task key, which the backend sets to
+    the `MicroJob.id` when the poster sends the task details. `state` is the
+    task's state after the transaction was applied.
+    """
+    lt: int  # Logical time; strictly increasing per contract
+    task_id: int
+    op: str
+    state: int
+    tx_hash: str = ""
+    amount: int = 0  # nanotons moved by the transaction, if any
+
+
+class ChainSource:
+    """Interface for reading escrow transactions in logical-time order."""
+
+    def fetch(self, after_lt: int, limit: int) -> List[EscrowEvent]:
+        """Returns up to `limit` events with `lt` greater than `after_lt`."""
+        raise NotImplementedError
+
+
+class FileChainSource(ChainSource):
+    """
+    Reads escrow events from a JSON Lines file, one event object per line
+    (`{"lt": ..., "task_id": ..., "op": ..., "state": ...}`).
+
+    Used as a fixture in tests and for replaying exported transactions locally.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._events: Optional[List[EscrowEvent]] = None
+        self._lts: List[int] = []
+
+    def _load(self) -> List[EscrowEvent]:
+        if self._events is None:
+            with self.path.open("r", encoding="utf-8") as fixture:
+                events = [EscrowEvent(**json.loads(line)) for line in fixture if line.strip()]
+            events.sort(key=lambda event: event.lt)
+            self._events = events
+            self._lts = [event.lt for event in events]
+        return self._events
+
+    def fetch(self, after_lt: int, limit: int) -> List[EscrowEvent]:
+        events = self._load()
+        start = bisect.bisect_right(self._lts, after_lt)
+        return events[start:start + limit]
+
+
+# Opcode of the contract's verify_task_completion message (pays one performer)
+OP_VERIFY_TASK_COMPLETION = 0x9C0D1E2F
+
+# Contract error codes a payout can fail with (error_* constants in escrow_s_m.fc)
+ERROR_TASK_NOT_FOUND = 102
+ERROR_NOT_TASK_POSTER = 103
+
+
+@dataclass(frozen=True)
+class PayoutMessage:
+    """One `verify_task_completion` message releasing escrow to a performer."""
+    outbox_id: int
+    task_id: int
+    performer_address: str
+    query_id: int
+
+
+@dataclass(frozen=True)
+class PayoutResult:
+    """Outcome of sending a single payout message."""
+    outbox_id: int
+    ok: bool
+    tx_hash: Optional[str] = None
+    error: Optional[str] = None
+    # The performer had already been paid for the task, e.g. a resend after
+    # a crash. The contract rejects the message, but the payout is done.
+    duplicate: bool = False
+
+
+class EscrowClient:
+    """
+    Interface for sending messages to the escrow contract.
+
+    Messages are signed by the client's wallet (`sender_address`). The
+    contract accepts `verify_task_completion` only from the task's poster
+    (it throws `error_not_task_poster` otherwise), so with the contract as
+    deployed a payout can only be delivered from the poster's own wallet. A
+    backend wallet can dispatch payouts only once the contract also accepts
+    an authorised verifier, such as the task's moderator.
+    """
+
+    sender_address: str
+
+    def send_payouts(self, messages: List[PayoutMessage]) -> List[PayoutResult]:
+        """
+        Sends the messages as one batched wallet transfer (one external
+        message carrying an internal message per payout) and returns a
+        result per message.
+        """
+        raise NotImplementedError
+
+
+class SimulatedEscrowClient(EscrowClient):
+    """
+    Local stand-in for the contract, used in tests and development.
+
+    Knows the tasks registered with `register_task` and applies the
+    contract's checks: a task it does not know fails with
+    `error_task_not_found`, a message not sent from the task's poster fails
+    with `error_not_task_poster`, and a performer paid twice for the same
+    task is reported as a duplicate (`error_already_completed_performer`).
+    Records every batch and can fail a fraction of batches to exercise
+    retries.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+        sender_address: str = "simulated-backend-wallet",
+    ):
+        self.failure_rate = failure_rate
+        self.sender_address = sender_address
+        self.batches: List[List[PayoutMessage]] = []
+        self._posters: Dict[int, str] = {}
+        self._paid = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def register_task(self, task_id: int, poster_address: str) -> None:
+        """Records a task as the contract's `send_task_details` would."""
+        with self._lock:
+            self._posters[task_id] = poster_address
+
+    def send_payouts(self, messages: List[PayoutMessage]) -> List[PayoutResult]:
+        with self._lock:
+            if self._rng.random() < self.failure_rate:
+                return [
+                    PayoutResult(m.outbox_id, ok=False, error="simulated network failure")
+                    for m in messages
+                ]
+            self.batches.append(list(messages))
+            tx_hash = hashlib.sha256(
+                repr([(m.task_id, m.performer_address, m.query_id) for m in messages]).encode()
+            ).hexdigest()
+            results = []
+            for message in messages:
+                key = (message.task_id, message.performer_address)
+                poster = self._posters.get(message.task_id)
+                if poster is None:
+                    results.append(PayoutResult(
+                        message.outbox_id, ok=False, error=f"exit code {ERROR_TASK_NOT_FOUND}: task not found"
+                    ))
+                elif poster != self.sender_address:
+                    results.append(PayoutResult(
+                        message.outbox_id, ok=False,
+                        error=f"exit code {ERROR_NOT_TASK_POSTER}: sender is not the task poster",
+                    ))
+                elif key in self._paid:
+                    results.append(PayoutResult(message.outbox_id, ok=True, duplicate=True))
+                else:
+                    self._paid.add(key)
+                    results.append(PayoutResult(message.outbox_id, ok=True, tx_hash=tx_hash))
+            return results
@@ -0,0 +1,151 @@
+"""
+Service layer for indexing escrow contract transactions.
+
+Consumes escrow events from a `ChainSource`, applies the resulting state
+transitions to `MicroJob` rows in batches (funded -> active, settled ->
+completed, refunds, expiries, disputes) and stores its position in
+`indexer_checkpoints` in the same transaction, so it resumes exactly where
+it stopped without rescanning.
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import database, locks, models
+from app.services import escrow_chain, realtime
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "escrow_indexer"
+
+# Contract state after a transaction -> MicroJob.status
+STATE_TO_STATUS = {
+    escrow_chain.STATE_ACTIVE: "active",
+    escrow_chain.STATE_SETTLED: "completed",
+    escrow_chain.STATE_DISPUTED: "disputed",
+    escrow_chain.STATE_EXPIRED: "expired",
+    escrow_chain.STATE_REFUNDED: "refunded",
+}
+
+# Statuses each target status may be reached from. Anything else is stale
+# or out of order and is ignored.
+ALLOWED_TRANSITIONS = {
+    "active": {"pending_funding"},
+    "completed": {"active", "disputed"},
+    "disputed": {"active"},
+    "expired": {"pending_funding", "active"},
+    "refunded": {"pending_funding", "expired"},
+}
+
+
+def get_checkpoint(db: Session) -> int:
+    """Returns the logical time of the last applied escrow transaction."""
+    checkpoint = db.get(models.IndexerCheckpoint, CHECKPOINT_NAME)
+    return checkpoint.last_lt if checkpoint else 0
+
+
+def _save_checkpoint(db: Session, last_lt: int) -> None:
+    checkpoint = db.get(models.IndexerCheckpoint, CHECKPOINT_NAME)
+    if checkpoint is None:
+        db.add(models.IndexerCheckpoint(name=CHECKPOINT_NAME, last_lt=last_lt))
+    else:
+        checkpoint.last_lt = last_lt
+
+
+def apply_events(
+    db: Session, events: Sequence[escrow_chain.EscrowEvent]
+) -> List[Tuple[int, int, str]]:
+    """
+    Applies a batch of events with one read and one bulk update per
+    (from, to) status pair. Does not commit.
+
+    Returns the `(microjob_id, poster_id, new_status)` changes made.
+    """
+    job_ids = {event.task_id for event in events}
+    rows = db.execute(
+        select(models.MicroJob.id, models.MicroJob.status, models.MicroJob.poster_id)
+        .where(models.MicroJob.id.in_(job_ids))
+    ).all()
+    current = {job_id: job_status for job_id, job_status, _ in rows}
+    posters = {job_id: poster_id for job_id, _, poster_id in rows}
+
+    final: Dict[int, str] = {}
+    for event in events:
+        job_status = final.get(event.task_id, current.get(event.task_id))
+        target = STATE_TO_STATUS.get(event.state)
+        if job_status is None or target is None or target == job_status:
+            continue
+        if job_status in ALLOWED_TRANSITIONS[target]:
+            final[event.task_id] = target
+
+    grouped: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for job_id, target in final.items():
+        if target != current[job_id]:
+            grouped[(current[job_id], target)].append(job_id)
+
+    changes = []
+    for (from_status, to_status), ids in grouped.items():
+        # Guard on the status we read so concurrent API writes win.
+        updated_ids = db.execute(
+            update(models.MicroJob)
+            .where(models.MicroJob.id.in_(ids), models.MicroJob.status == from_status)
+            .values(status=to_status)
+            .returning(models.MicroJob.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        changes.extend((job_id, posters[job_id], to_status) for job_id in updated_ids)
+    return changes
+
+
+def run_once(db: Session, source: escrow_chain.ChainSource, batch_size: int) -> int:
+    """Ingests one batch after the checkpoint. Returns the number of events read."""
+    events = source.fetch(get_checkpoint(db), batch_size)
+    if not events:
+        return 0
+
+    changes = apply_events(db, events)
+    _save_checkpoint(db, events[-1].lt)
+    db.commit()
+
+    for job_id, poster_id, new_status in changes:
+        realtime.publish_microjob_status_changed(poster_id, job_id, new_status)
+    return len(events)
+
+
+def get_chain_source() -> Optional[escrow_chain.ChainSource]:
+    """Builds the chain source configured in settings, if any."""
+    if settings.ESCROW_INDEXER_SOURCE == "file":
+        return escrow_chain.FileChainSource(settings.ESCROW_INDEXER_FILE)
+    return None
+
+
+def run_indexer(source: Optional[escrow_chain.ChainSource] = None) -> int:
+    """
+    Drains the chain source up to its current head, unless another worker
+    is already indexing. Returns the number of events ingested.
+    """
+    source = source or get_chain_source()
+    if source is None:
+        return 0
+
+    batch_size = settings.ESCROW_INDEXER_BATCH_SIZE
+    ingested = 0
+    with locks.try_advisory_lock(CHECKPOINT_NAME) as acquired:
+        if not acquired:
+            return 0
+        db = database.SessionLocal()
+        try:
+            while True:
+                count = run_once(db, source, batch_size)
+                ingested += count
+                if count < batch_size:
+                    break
+        finally:
+            db.close()
+    if ingested:
+        logger.info("Indexed %d escrow transactions", ingested)
+    return ingested
@@ -0,0 +1,114 @@
+"""
+Service layer for expiring micro-jobs and sponsored tasks.
+
+A periodic sweeper moves expired rows out of the live sets
+(`MicroJob.status` becomes 'expired', sponsored `Task.is_active` becomes
+False) in chunked bulk updates, so the hot listing queries only read live
+rows through the `(status, expiration_date)` and partial `is_active`
+indexes. Runs are serialised across workers with an advisory lock.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import database, locks, models
+from app.services import task_catalog
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LOCK_NAME = "expiration_sweeper"
+
+# Micro-job states the escrow contract can still expire (see op_expire_task)
+EXPIRABLE_MICROJOB_STATUSES = ("pending_funding", "active")
+
+
+def expire_microjobs(db: Session, now: datetime, chunk_size: int) -> int:
+    """Marks expired micro-jobs as 'expired'. Returns the number of rows updated."""
+    expired = 0
+    while True:
+        ids = db.execute(
+            select(models.MicroJob.id)
+            .where(
+                models.MicroJob.status.in_(EXPIRABLE_MICROJOB_STATUSES),
+                models.MicroJob.expiration_date <= now,
+            )
+            .limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return expired
+
+        result = db.execute(
+            update(models.MicroJob)
+            .where(
+                models.MicroJob.id.in_(ids),
+                models.MicroJob.status.in_(EXPIRABLE_MICROJOB_STATUSES),
+            )
+            .values(status="expired")
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        expired += result.rowcount
+        if len(ids) < chunk_size:
+            return expired
+
+
+def expire_sponsored_tasks(db: Session, now: datetime, chunk_size: int) -> int:
+    """Deactivates tasks whose expiration date has passed. Returns the rows updated."""
+    expired = 0
+    while True:
+        ids = db.execute(
+            select(models.Task.id)
+            .where(
+                models.Task.is_active.is_(True),
+                models.Task.expiration_date.is_not(None),
+                models.Task.expiration_date <= now,
+            )
+            .limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return expired
+
+        result = db.execute(
+            update(models.Task)
+            .where(models.Task.id.in_(ids), models.Task.is_active.is_(True))
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            task_catalog.invalidate(db)
+        db.commit()
+        expired += result.rowcount
+        if len(ids) < chunk_size:
+            return expired
+
+
+def sweep_expired(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Expires micro-jobs and sponsored tasks in chunks of the configured size."""
+    now = now or datetime.now(timezone.utc)
+    chunk_size = settings.EXPIRATION_SWEEP_CHUNK_SIZE
+    return {
+        "microjobs": expire_microjobs(db, now, chunk_size),
+        "tasks": expire_sponsored_tasks(db, now, chunk_size),
+    }
+
+
+def run_sweep() -> Optional[Dict[str, int]]:
+    """
+    Runs one sweep unless another worker is already running it.
+    Returns the per-table counts, or None if the sweep was skipped.
+    """
+    with locks.try_advisory_lock(SWEEP_LOCK_NAME) as acquired:
+        if not acquired:
+            return None
+        db = database.SessionLocal()
+        try:
+            counts = sweep_expired(db)
+        finally:
+            db.close()
+    if any(counts.values()):
+        logger.info("Expired %(microjobs)d micro-jobs and %(tasks)d tasks", counts)
+    return counts
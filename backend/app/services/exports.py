@@ -0,0 +1,215 @@
+"""
+Streaming bulk exports of users, task completions and micro-jobs.
+
+Rows are read through a server-side cursor (`yield_per`, which enables
+`stream_results` on PostgreSQL) as plain column tuples, encoded to CSV or
+JSON Lines in chunks of `EXPORT_CHUNK_BYTES` and optionally gzipped on the
+fly, so memory stays constant however many rows are exported. Used by the
+admin export endpoint and `python -m app.tools.export_data`.
+"""
+import csv
+import io
+import json
+import zlib
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import database, models
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+@dataclass(frozen=True)
+class ExportFilters:
+    """Row filters; each is supported by the datasets listed in `FILTERS`."""
+    min_zp_balance: Optional[int] = None
+    has_wallet: Optional[bool] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    status: Optional[str] = None
+
+
+def _columns(model, names: Sequence[str]) -> Dict[str, object]:
+    return {name: getattr(model, name) for name in names}
+
+
+# Exportable columns per dataset, in default order. Secrets are never exported.
+DATASETS = {
+    "users": _columns(models.User, (
+        "id", "email", "full_name", "telegram_handle", "twitter_handle", "zp_balance",
+        "social_capital_score", "daily_streak_count", "ton_wallet_address", "is_active",
+        "created_at",
+    )),
+    "completions": _columns(models.UserTaskCompletion, (
+        "id", "user_id", "task_id", "status", "completed_at",
+    )),
+    "microjobs": _columns(models.MicroJob, (
+        "id", "poster_id", "title", "status", "ton_payment_amount", "ziver_fee_percentage",
+        "expiration_date", "created_at", "updated_at",
+    )),
+}
+
+
+# Filters each dataset supports; others are rejected rather than ignored
+FILTERS = {
+    "users": ("min_zp_balance", "has_wallet"),
+    "completions": ("since", "until", "status"),
+    "microjobs": ("since", "until", "status"),
+}
+
+
+def check_filters(dataset: str, filters: ExportFilters) -> None:
+    """Raises 400 if a filter is set that the dataset does not support."""
+    unsupported = [
+        field.name for field in fields(filters)
+        if getattr(filters, field.name) is not None and field.name not in FILTERS[dataset]
+    ]
+    if unsupported:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Filters not supported for {dataset}: {', '.join(unsupported)}. "
+            f"Supported: {', '.join(FILTERS[dataset])}.",
+        )
+
+
+def _build_query(dataset: str, columns: List[str], filters: ExportFilters):
+    model_columns = DATASETS[dataset]
+    query = select(*(model_columns[name] for name in columns))
+    if dataset == "users":
+        user = models.User
+        if filters.min_zp_balance is not None:
+            query = query.where(user.zp_balance >= filters.min_zp_balance)
+        if filters.has_wallet is not None:
+            query = query.where(
+                user.ton_wallet_address.is_not(None) if filters.has_wallet
+                else user.ton_wallet_address.is_(None)
+            )
+        return query.order_by(user.id)
+    if dataset == "completions":
+        completion = models.UserTaskCompletion
+        if filters.since is not None:
+            query = query.where(completion.completed_at >= filters.since)
+        if filters.until is not None:
+            query = query.where(completion.completed_at < filters.until)
+        if filters.status is not None:
+            query = query.where(completion.status == filters.status)
+        return query.order_by(completion.id)
+    job = models.MicroJob
+    if filters.since is not None:
+        query = query.where(job.created_at >= filters.since)
+    if filters.until is not None:
+        query = query.where(job.created_at < filters.until)
+    if filters.status is not None:
+        query = query.where(job.status == filters.status)
+    return query.order_by(job.id)
+
+
+def resolve_columns(dataset: str, columns: Optional[str]) -> List[str]:
+    """
+    Validates the dataset and a comma-separated column selection (all
+    columns if empty). Raises 400 for unknown names.
+    """
+    if dataset not in DATASETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown dataset '{dataset}'. Expected one of: {', '.join(DATASETS)}.",
+        )
+    available = DATASETS[dataset]
+    if not columns:
+        return list(available)
+    selected = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in available]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(available)}.",
+        )
+    return selected
+
+
+def media_type(export_format: str) -> str:
+    """The media type of an export format. Raises 400 for unknown formats."""
+    if export_format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown format '{export_format}'. Expected one of: {', '.join(FORMATS)}.",
+        )
+    return FORMATS[export_format]
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _encode_csv(columns: List[str], rows) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(map(_value, row))
+        if buffer.tell() >= settings.EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _encode_jsonl(columns: List[str], rows) -> Iterator[str]:
+    parts, size = [], 0
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for row in rows:
+        line = dumps(dict(zip(columns, map(_value, row))))
+        parts.append(line)
+        size += len(line) + 1
+        if size >= settings.EXPORT_CHUNK_BYTES:
+            parts.append("")
+            yield "\n".join(parts)
+            parts, size = [], 0
+    if parts:
+        parts.append("")
+        yield "\n".join(parts)
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(
+    db: Session,
+    dataset: str,
+    columns: List[str],
+    filters: ExportFilters,
+    export_format: str = "csv",
+    gzip: bool = False,
+) -> Iterator[bytes]:
+    """Yields the encoded export in chunks, streaming rows from `db`."""
+    media_type(export_format)
+    rows = db.execute(
+        _build_query(dataset, columns, filters).execution_options(
+            yield_per=settings.EXPORT_YIELD_PER
+        )
+    )
+    encode = _encode_csv if export_format == "csv" else _encode_jsonl
+    chunks = (chunk.encode() for chunk in encode(columns, rows) if chunk)
+    return _gzip(chunks) if gzip else chunks
+
+
+def stream_export_in_session(dataset: str, columns: List[str], filters: ExportFilters,
+                             export_format: str = "csv", gzip: bool = False) -> Iterator[bytes]:
+    """`stream_export` with a session of its own, for streaming responses."""
+    db = database.SessionLocal()
+    try:
+        yield from stream_export(db, dataset, columns, filters, export_format, gzip)
+    finally:
+        db.close()
@@ -1,14 +1,18 @@
 """
 Service layer for handling all micro-job marketplace logic.
 """
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import HTTPException, status
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from app.core.singleflight import single_flight
 from app.db import models
 from app.schemas import microjob as microjob_schemas
+from app.services import analytics, payouts as payouts_service, realtime
 
 
 def create_microjob(
@@ -45,27 +49,78 @@ def create_microjob(
     }
 
 
+@dataclass(frozen=True)
+class FeedMicroJob:
+    """Read-only copy of a `MicroJob` row in the public feed."""
+    id: int
+    poster_id: int
+    title: str
+    description: str
+    ton_payment_amount: float
+    verification_criteria: str
+    ziver_fee_percentage: float
+    status: str
+    expiration_date: Optional[datetime]
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+_FEED_COLUMNS = [getattr(models.MicroJob, field) for field in FeedMicroJob.__dataclass_fields__]
+
+
 def get_microjobs(
     db: Session, user_id: Optional[int] = None, status_filter: Optional[str] = None
 ):
     """
     Retrieves active micro-jobs. Can be filtered by poster or status.
     """
-    query = db.query(models.MicroJob)
-
-    if user_id:
-        query = query.filter(models.MicroJob.poster_id == user_id)
-        # If fetching user's own jobs, don't filter by status unless specified
-        if status_filter:
-            query = query.filter(models.MicroJob.status == status_filter)
-    else:
+    if not user_id:
         # For public view, only show active, funded jobs that haven't expired
-        query = query.filter(
+        return list(get_public_feed(db, get_public_feed_version(db)))
+
+    query = db.query(models.MicroJob).filter(models.MicroJob.poster_id == user_id)
+    # If fetching user's own jobs, don't filter by status unless specified
+    if status_filter:
+        query = query.filter(models.MicroJob.status == status_filter)
+    return query.all()
+
+
+@single_flight("microjobs.public_feed")
+def get_public_feed(db: Session, version: Tuple) -> Tuple[FeedMicroJob, ...]:
+    """
+    The active, funded, unexpired micro-jobs every client sees, as of
+    `version` (from `get_public_feed_version`). Concurrent loads share one
+    query and its result is reused briefly; keying on the version keeps a
+    reused feed from being served under a newer ETag.
+    """
+    rows = db.execute(
+        select(*_FEED_COLUMNS).where(
             models.MicroJob.status == "active",
             models.MicroJob.expiration_date > datetime.now(timezone.utc),
         )
+    ).all()
+    return tuple(FeedMicroJob(*row) for row in rows)
 
-    return query.all()
+
+@single_flight("microjobs.public_feed_version")
+def get_public_feed_version(db: Session) -> Tuple:
+    """
+    Cheap version of the public feed for conditional requests: an aggregate
+    over the (status, expiration_date) index that changes when a job is
+    added to, changed in or removed from the feed.
+    """
+    return tuple(
+        db.execute(
+            select(
+                func.count(),
+                func.max(models.MicroJob.id),
+                func.max(models.MicroJob.updated_at),
+            ).where(
+                models.MicroJob.status == "active",
+                models.MicroJob.expiration_date > datetime.now(timezone.utc),
+            )
+        ).one()
+    )
 
 
 def submit_microjob_completion(
@@ -122,7 +177,7 @@ def submit_microjob_completion(
 
 
 def approve_microjob_completion(db: Session, poster: models.User, submission_id: int):
-    """The job poster approves a submission, triggering on-chain payment."""
+    """The job poster approves a submission and queues the on-chain payment."""
     submission = (
         db.query(models.MicroJobSubmission)
         .filter(models.MicroJobSubmission.id == submission_id)
@@ -146,10 +201,9 @@ def approve_microjob_completion(db: Session, poster: models.User, submission_id:
             detail="Submission is not in 'submitted' status.",
         )
 
-    # --- SIMULATED ON-CHAIN INTERACTION ---
-    # Here, you would trigger the `verifyTaskCompletion` transaction on your smart contract.
-    # The smart contract handles the payout logic.
-    # For now, we simulate the result by updating our local DB.
+    # Queue the on-chain `verifyTaskCompletion` payout in the same transaction;
+    # the payout dispatcher sends it to the escrow contract in a batch.
+    intent = payouts_service.enqueue_payout(db, submission)
 
     worker = submission.worker
     worker.social_capital_score += 50  # Boost Social Capital Score
@@ -162,14 +216,20 @@ def approve_microjob_completion(db: Session, poster: models.User, submission_id:
     # Mark microjob as completed
     submission.microjob.status = "completed"
     db.add(submission.microjob)
+    analytics.record_microjob_completed(db, submission.microjob)
 
     db.commit()
     db.refresh(submission)
 
-    return {
-        "message": "Micro-job submission approved. On-chain payout initiated.",
-        "submission": submission,
-    }
+    if intent.status == "awaiting_wallet":
+        realtime.publish_payout_awaiting_wallet(worker.id, submission.microjob_id)
+        message = (
+            "Micro-job submission approved. The on-chain payout will be sent "
+            "once the worker links a TON wallet."
+        )
+    else:
+        message = "Micro-job submission approved. On-chain payout queued."
+    return {"message": message, "submission": submission}
 
 
 def reject_microjob_completion(db: Session, poster: models.User, submission_id: int):
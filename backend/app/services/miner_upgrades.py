@@ -0,0 +1,190 @@
+"""
+Miner upgrade catalog and the set-based migration that applies it.
+
+The catalog (cost and resulting stat value of every level of every upgrade
+type) is built once per process into immutable objects, either from the
+built-in table or from the JSON file named by `MINER_UPGRADE_CATALOG_FILE`.
+Users store their level per upgrade type; their mining stats are derived
+from those levels, so a catalog change is applied to everyone with one
+bulk UPDATE per upgrade type instead of touching users one by one.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Mapping, Tuple
+
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+
+# Built-in table: upgrade type -> level -> ZP cost and resulting stat value
+DEFAULT_UPGRADE_TABLE = {
+    "mining_speed": {
+        1: {"cost_zp": 150, "value": 15},
+        2: {"cost_zp": 450, "value": 20},
+        3: {"cost_zp": 700, "value": 30},
+        4: {"cost_zp": 1000, "value": 50},
+        5: {"cost_zp": 2500, "value": 100},
+    },
+    "mining_capacity": {
+        1: {"cost_zp": 200, "value": 150},
+        2: {"cost_zp": 350, "value": 300},
+        3: {"cost_zp": 650, "value": 700},
+        4: {"cost_zp": 850, "value": 1000},
+        5: {"cost_zp": 1350, "value": 1800},
+    },
+    "mining_hours": {
+        1: {"cost_zp": 250, "value": 3},
+        2: {"cost_zp": 500, "value": 4},
+        3: {"cost_zp": 700, "value": 5},
+        4: {"cost_zp": 1000, "value": 6},
+        5: {"cost_zp": 1650, "value": 7},
+    },
+}
+
+# Upgrade type -> (stat column, level column, name of the level-0 setting)
+UPGRADE_COLUMNS = {
+    "mining_speed": (
+        "current_mining_rate_zp_per_hour", "mining_speed_level", "INITIAL_MINING_RATE_ZP_PER_HOUR"
+    ),
+    "mining_capacity": (
+        "current_mining_capacity_zp", "mining_capacity_level", "INITIAL_MINING_CAPACITY_ZP"
+    ),
+    "mining_hours": (
+        "current_mining_cycle_hours", "mining_hours_level", "MINING_CYCLE_HOURS"
+    ),
+}
+
+
+@dataclass(frozen=True)
+class UpgradeLevel:
+    """One purchasable level of an upgrade type."""
+    level: int
+    cost_zp: int
+    value: int
+
+
+@dataclass(frozen=True)
+class UpgradeTrack:
+    """The ordered levels of one upgrade type and the user columns it drives."""
+    upgrade_type: str
+    stat_column: str
+    level_column: str
+    base_value: int  # Stat value at level 0
+    levels: Tuple[UpgradeLevel, ...]  # levels[0] is level 1
+
+    @property
+    def max_level(self) -> int:
+        return len(self.levels)
+
+    def get(self, level: int) -> UpgradeLevel:
+        """Returns the given level (1-based). Raises KeyError if it does not exist."""
+        if not 1 <= level <= len(self.levels):
+            raise KeyError(level)
+        return self.levels[level - 1]
+
+
+def _build_track(upgrade_type: str, table: Mapping) -> UpgradeTrack:
+    stat_column, level_column, base_setting = UPGRADE_COLUMNS[upgrade_type]
+    entries = {int(level): data for level, data in table.items()}  # JSON keys are strings
+    if sorted(entries) != list(range(1, len(entries) + 1)):
+        raise ValueError(f"Levels of {upgrade_type} must be numbered 1..N without gaps.")
+    levels = tuple(
+        UpgradeLevel(level=number, cost_zp=int(data["cost_zp"]), value=int(data["value"]))
+        for number, data in sorted(entries.items())
+    )
+    return UpgradeTrack(
+        upgrade_type=upgrade_type,
+        stat_column=stat_column,
+        level_column=level_column,
+        base_value=getattr(settings, base_setting),
+        levels=levels,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_catalog() -> Mapping[str, UpgradeTrack]:
+    """Returns the read-only upgrade catalog, built on first use."""
+    table: Dict = DEFAULT_UPGRADE_TABLE
+    if settings.MINER_UPGRADE_CATALOG_FILE:
+        with open(settings.MINER_UPGRADE_CATALOG_FILE, "r", encoding="utf-8") as catalog_file:
+            table = json.load(catalog_file)
+    unknown = set(table) - set(UPGRADE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown upgrade types in catalog: {', '.join(sorted(unknown))}")
+    return MappingProxyType({
+        upgrade_type: _build_track(upgrade_type, table.get(upgrade_type, {}))
+        for upgrade_type in UPGRADE_COLUMNS
+    })
+
+
+def _value_for_level(track: UpgradeTrack, level_column):
+    """SQL expression mapping a level column to the catalog's stat value."""
+    if not track.levels:
+        return track.base_value
+    return case(
+        {level.level: level.value for level in track.levels},
+        value=level_column,
+        else_=case(
+            (level_column > track.max_level, track.levels[-1].value),
+            else_=track.base_value,
+        ),
+    )
+
+
+def apply_catalog(db: Session) -> Dict[str, int]:
+    """
+    Recomputes every user's mining stats from their stored levels and the
+    current catalog, clamping levels that no longer exist. Runs one bulk
+    UPDATE per upgrade type, touching only rows whose values change.
+    Returns the number of users updated per type. Commits.
+    """
+    updated = {}
+    for track in get_catalog().values():
+        level_column = getattr(models.User, track.level_column)
+        stat_column = getattr(models.User, track.stat_column)
+        clamped_level = case(
+            (level_column > track.max_level, track.max_level), else_=level_column
+        )
+        target = _value_for_level(track, level_column)
+        result = db.execute(
+            update(models.User)
+            .where((stat_column != target) | (level_column > track.max_level))
+            .values({track.stat_column: target, track.level_column: clamped_level})
+            .execution_options(synchronize_session=False)
+        )
+        updated[track.upgrade_type] = result.rowcount
+    db.commit()
+    return updated
+
+
+def backfill_levels(db: Session) -> Dict[str, int]:
+    """
+    Derives the stored levels of users created before levels were tracked
+    from their current stat values. Users whose value matches no level, or
+    equals the level-0 value (a default user), keep level 0. Commits.
+    """
+    updated = {}
+    for track in get_catalog().values():
+        level_column = getattr(models.User, track.level_column)
+        stat_column = getattr(models.User, track.stat_column)
+        if not track.levels:
+            updated[track.upgrade_type] = 0
+            continue
+        inferred = case(
+            {level.value: level.level for level in track.levels},
+            value=stat_column,
+            else_=0,
+        )
+        result = db.execute(
+            update(models.User)
+            .where(level_column == 0, stat_column != track.base_value, inferred != 0)
+            .values({track.level_column: inferred})
+            .execution_options(synchronize_session=False)
+        )
+        updated[track.upgrade_type] = result.rowcount
+    db.commit()
+    return updated
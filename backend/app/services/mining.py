@@ -5,11 +5,62 @@ including starting cycles, claiming rewards, and upgrading miners.
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db import models
 from app.schemas import mining as mining_schemas
+from app.services import analytics, miner_upgrades, mining_reminders, realtime
+
+
+def mined_zp(elapsed_seconds, rate_zp_per_hour, cycle_hours, capacity_zp, minimum=min):
+    """
+    ZP earned by a mining session that has run for `elapsed_seconds`:
+    the rate applies for at most one cycle and the total is capped by the
+    miner's capacity.
+
+    Pass `minimum=numpy.minimum` to evaluate it element-wise over arrays,
+    as the economy simulator does.
+    """
+    mining_duration_seconds = minimum(elapsed_seconds, cycle_hours * 3600)
+    zp_earned_raw = (mining_duration_seconds / 3600) * rate_zp_per_hour
+    return minimum(zp_earned_raw // 1, capacity_zp)
+
+
+def get_mining_status(user: models.User) -> dict:
+    """
+    Describes the user's mining cycle: when it ends, the ZP a claim would
+    pay right now and whether the daily check-in bonus is still available.
+    """
+    now = datetime.now(timezone.utc)
+    checkin_bonus_available = user.last_checkin_date != now.date()
+    if not user.mining_started_at:
+        return {
+            "is_mining": False,
+            "mining_started_at": None,
+            "mining_ends_at": None,
+            "seconds_remaining": 0,
+            "claimable_zp": 0,
+            "checkin_bonus_available": checkin_bonus_available,
+        }
+
+    ends_at = realtime.mining_ends_at(user)
+    return {
+        "is_mining": True,
+        "mining_started_at": user.mining_started_at,
+        "mining_ends_at": ends_at,
+        "seconds_remaining": max(0, int((ends_at - now).total_seconds())),
+        "claimable_zp": int(
+            mined_zp(
+                (now - user.mining_started_at).total_seconds(),
+                user.current_mining_rate_zp_per_hour,
+                user.current_mining_cycle_hours,
+                user.current_mining_capacity_zp,
+            )
+        ),
+        "checkin_bonus_available": checkin_bonus_available,
+    }
 
 
 def start_mining(db: Session, user: models.User):
@@ -31,6 +82,7 @@ def start_mining(db: Session, user: models.User):
     db.add(user)
     db.commit()
     db.refresh(user)
+    mining_reminders.register(user)
     return {
         "message": "Mining started successfully.",
         "mining_ends_at": user.mining_started_at
@@ -50,13 +102,14 @@ def claim_zp(db: Session, user: models.User):
         )
 
     time_since_started = datetime.now(timezone.utc) - user.mining_started_at
-    mining_duration_seconds = min(
-        time_since_started.total_seconds(), user.current_mining_cycle_hours * 3600
+    zp_earned = int(
+        mined_zp(
+            time_since_started.total_seconds(),
+            user.current_mining_rate_zp_per_hour,
+            user.current_mining_cycle_hours,
+            user.current_mining_capacity_zp,
+        )
     )
-    zp_earned_raw = (
-        mining_duration_seconds / 3600
-    ) * user.current_mining_rate_zp_per_hour
-    zp_earned = min(int(zp_earned_raw), user.current_mining_capacity_zp)
 
     # Handle daily check-in bonus and streak
     today = datetime.now(timezone.utc).date()
@@ -75,6 +128,7 @@ def claim_zp(db: Session, user: models.User):
         user.last_checkin_date = today
 
     total_zp_to_add = zp_earned + zp_bonus
+    analytics.record_mining_claim(db, user, zp_earned, zp_bonus)
     user.zp_balance += total_zp_to_add
     user.mining_started_at = None  # Reset mining session
     user.last_claim_at = datetime.now(timezone.utc)
@@ -83,6 +137,8 @@ def claim_zp(db: Session, user: models.User):
     db.add(user)
     db.commit()
     db.refresh(user)
+    mining_reminders.cancel(user.id)
+    realtime.publish_balance_changed(user)
 
     return {
         "message": f"Successfully claimed {total_zp_to_add} ZP.",
@@ -94,64 +150,72 @@ def claim_zp(db: Session, user: models.User):
 def upgrade_miner(
     db: Session, user: models.User, upgrade_req: mining_schemas.MinerUpgradeRequest
 ):
-    """Upgrades the user's miner capabilities based on ZP cost."""
-    upgrade_costs = {
-        "mining_speed": {
-            1: {"cost_zp": 150, "value": 15},
-            2: {"cost_zp": 450, "value": 20},
-            3: {"cost_zp": 700, "value": 30},
-            4: {"cost_zp": 1000, "value": 50},
-            5: {"cost_zp": 2500, "value": 100},
-        },
-        "mining_capacity": {
-            1: {"cost_zp": 200, "value": 150},
-            2: {"cost_zp": 350, "value": 300},
-            3: {"cost_zp": 650, "value": 700},
-            4: {"cost_zp": 850, "value": 1000},
-            5: {"cost_zp": 1350, "value": 1800},
-        },
-        "mining_hours": {
-            1: {"cost_zp": 250, "value": 3},
-            2: {"cost_zp": 500, "value": 4},
-            3: {"cost_zp": 700, "value": 5},
-            4: {"cost_zp": 1000, "value": 6},
-            5: {"cost_zp": 1650, "value": 7},
-        },
-    }
-
-    upgrade_info = upgrade_costs.get(upgrade_req.upgrade_type)
-    if not upgrade_info:
+    """
+    Upgrades one of the user's miner stats to the next level of the upgrade
+    catalog. Levels are bought in order, one at a time.
+    """
+    track = miner_upgrades.get_catalog().get(upgrade_req.upgrade_type)
+    if not track:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid upgrade type."
         )
 
-    target_level_data = upgrade_info.get(upgrade_req.level)
-    if not target_level_data:
+    try:
+        target_level = track.get(upgrade_req.level)
+    except KeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or unavailable upgrade level.",
         )
 
-    cost_zp = target_level_data["cost_zp"]
+    current_level = getattr(user, track.level_column)
+    if target_level.level <= current_level:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Miner {track.upgrade_type} is already at level {current_level}.",
+        )
+    if target_level.level != current_level + 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Upgrade {track.upgrade_type} to level {current_level + 1} first.",
+        )
+
+    cost_zp = target_level.cost_zp
     if user.zp_balance < cost_zp:
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
             detail=f"Insufficient ZP balance. Need {cost_zp} ZP.",
         )
 
-    user.zp_balance -= cost_zp
-
-    # Apply upgrade
-    if upgrade_req.upgrade_type == "mining_speed":
-        user.current_mining_rate_zp_per_hour = target_level_data["value"]
-    elif upgrade_req.upgrade_type == "mining_capacity":
-        user.current_mining_capacity_zp = target_level_data["value"]
-    elif upgrade_req.upgrade_type == "mining_hours":
-        user.current_mining_cycle_hours = target_level_data["value"]
+    # Guarded update: a concurrent request cannot buy the same level twice
+    # or spend the same ZP.
+    level_column = getattr(models.User, track.level_column)
+    result = db.execute(
+        update(models.User)
+        .where(
+            models.User.id == user.id,
+            level_column == current_level,
+            models.User.zp_balance >= cost_zp,
+        )
+        .values({
+            "zp_balance": models.User.zp_balance - cost_zp,
+            track.level_column: target_level.level,
+            track.stat_column: target_level.value,
+        })
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Your miner or balance changed in the meantime. Please try again.",
+        )
 
-    db.add(user)
     db.commit()
     db.refresh(user)
+    # A longer cycle moves the end of a running session.
+    mining_reminders.register(user)
+    realtime.publish_balance_changed(user)
 
     return {
         "message": f"Miner {upgrade_req.upgrade_type} upgraded to level {upgrade_req.level}.",
@@ -160,6 +224,7 @@ def upgrade_miner(
         "new_mining_cycle_hours": user.current_mining_cycle_hours,
         "new_zp_balance": user.zp_balance,
         "cost_in_zp": cost_zp,
+        "new_level": target_level.level,
     }
 
 
@@ -0,0 +1,207 @@
+"""
+Service layer for end-of-mining-cycle reminders.
+
+Keeps the mining timer wheel in sync with users' mining sessions and hands
+expired timers to a pluggable notifier in batches. The wheel lives in
+memory, so it is rebuilt from `users` with one streaming query when a
+process takes it over.
+
+Exactly one worker process runs reminders: the one holding the
+`mining-reminders` advisory lease, which `run_election` tries to take
+periodically (so another worker takes over when the holder stops). Other
+workers forward `register` and `cancel` to it through a NOTIFY channel
+(`set_relay`); with a single worker they apply to the local wheel.
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.scheduler import mining_scheduler
+from app.db import database, locks, models
+from app.services import realtime
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip while rebuilding the wheel
+REBUILD_CHUNK_SIZE = 10000
+# Cycles that ended this recently (e.g. during a redeploy) still get a reminder
+REBUILD_GRACE_SECONDS = 300
+
+
+class Notifier:
+    """Interface for delivering mining-cycle reminders."""
+
+    def notify(self, user_ids: Sequence[int]) -> None:
+        """Delivers one batch of reminders."""
+        raise NotImplementedError
+
+
+class EventStreamNotifier(Notifier):
+    """Pushes reminders to the users' open event streams."""
+
+    def notify(self, user_ids: Sequence[int]) -> None:
+        realtime.publish_mining_cycles_ready(user_ids)
+
+
+class LogNotifier(Notifier):
+    """Writes reminders to the application log."""
+
+    def notify(self, user_ids: Sequence[int]) -> None:
+        logger.info("Mining cycle finished for %d users: %s", len(user_ids), list(user_ids))
+
+
+class InMemoryNotifier(Notifier):
+    """Local stub that records every batch it receives (for tests and dev)."""
+
+    def __init__(self):
+        self.batches: List[List[int]] = []
+
+    def notify(self, user_ids: Sequence[int]) -> None:
+        self.batches.append(list(user_ids))
+
+
+NOTIFIERS: Dict[str, Type[Notifier]] = {
+    "event_stream": EventStreamNotifier,
+    "log": LogNotifier,
+    "memory": InMemoryNotifier,
+}
+
+_notifier: Notifier = NOTIFIERS[settings.MINING_REMINDER_NOTIFIER]()
+
+
+def get_notifier() -> Notifier:
+    """Returns the notifier that receives due reminders."""
+    return _notifier
+
+
+def set_notifier(notifier: Notifier) -> None:
+    """Replaces the notifier that receives due reminders."""
+    global _notifier
+    _notifier = notifier
+
+
+_lease = locks.AdvisoryLease("mining-reminders")
+_is_leader = False
+_relay: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+def set_relay(relay: Optional[Callable[[Dict[str, Any]], bool]]) -> None:
+    """
+    Sends reminder updates through `relay`, which must hand them to
+    `apply_update` in every worker process. None applies them locally.
+    """
+    global _relay
+    _relay = relay
+
+
+def _update(message: Dict[str, Any]) -> None:
+    if _relay is None or not _relay(message):
+        apply_update(message)
+
+
+def apply_update(message: Dict[str, Any]) -> None:
+    """Applies a `register` or `cancel` update if this process runs reminders."""
+    if not _is_leader:
+        return
+    if message["op"] == "schedule":
+        mining_scheduler.schedule_at(message["user_id"], message["at"])
+    else:
+        mining_scheduler.cancel(message["user_id"])
+
+
+def register(user: models.User) -> None:
+    """Registers a reminder for the end of the user's current mining cycle."""
+    ends_at = realtime.mining_ends_at(user)
+    if ends_at is not None:
+        _update({"op": "schedule", "user_id": user.id, "at": ends_at.timestamp()})
+
+
+def cancel(user_id: int) -> None:
+    """Cancels the user's pending reminder, e.g. after claiming."""
+    _update({"op": "cancel", "user_id": user_id})
+
+
+def dispatch_due(user_ids: Sequence[int]) -> None:
+    """Timer wheel callback: forwards expired reminders in batches."""
+    batch_size = settings.MINING_REMINDER_BATCH_SIZE
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        try:
+            _notifier.notify(batch)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Failed to deliver %d mining reminders", len(batch))
+
+
+def rebuild_from_db(db: Session) -> int:
+    """
+    Loads every running mining cycle into the timer wheel using a single
+    streaming query. Returns the number of reminders registered.
+    """
+    cutoff = time.time() - REBUILD_GRACE_SECONDS
+    result = db.execute(
+        select(
+            models.User.id,
+            models.User.mining_started_at,
+            models.User.current_mining_cycle_hours,
+        )
+        .where(models.User.mining_started_at.is_not(None))
+        .execution_options(yield_per=REBUILD_CHUNK_SIZE)
+    )
+    registered = 0
+    for rows in result.partitions():
+        entries = []
+        for user_id, started_at, cycle_hours in rows:
+            deadline = (started_at + timedelta(hours=cycle_hours)).timestamp()
+            if deadline >= cutoff:
+                entries.append((user_id, deadline))
+        mining_scheduler.schedule_many(entries)
+        registered += len(entries)
+    return registered
+
+
+def rebuild_on_startup() -> int:
+    """Rebuilds the timer wheel with a dedicated session."""
+    db = database.SessionLocal()
+    try:
+        registered = rebuild_from_db(db)
+    finally:
+        db.close()
+    logger.info("Registered %d pending mining reminders", registered)
+    return registered
+
+
+def run_election() -> None:
+    """
+    Periodic job: takes over reminders if no worker runs them, and stops
+    running them if this process lost its lease.
+    """
+    global _is_leader
+    if _is_leader:
+        if _lease.alive():
+            return
+        logger.warning("Lost the mining reminder lease; another worker takes over")
+        _is_leader = False
+        mining_scheduler.clear()
+    if not _lease.acquire():
+        return
+    # Updates received from now on are applied, so none is missed while
+    # the wheel is rebuilt
+    _is_leader = True
+    try:
+        rebuild_on_startup()
+    except Exception:
+        resign()
+        raise
+
+
+def resign() -> None:
+    """Stops running reminders and releases the lease (on shutdown)."""
+    global _is_leader
+    _is_leader = False
+    mining_scheduler.clear()
+    _lease.release()
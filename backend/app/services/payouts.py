@@ -0,0 +1,278 @@
+"""
+Service layer for escrow payouts using a transactional outbox.
+
+Approving a micro-job submission only writes a `PayoutOutbox` row in the
+same transaction, so the HTTP request returns without touching the chain.
+The dispatcher drains the outbox in the background: it claims due intents,
+groups them into batched contract messages, sends the batches from a worker
+pool, and records the results, retrying failures with exponential backoff.
+
+Approval does not depend on the worker having linked a TON wallet: without
+one the intent waits as 'awaiting_wallet' and becomes due when the wallet
+is linked.
+
+Payouts are sent from the chain client's wallet. The escrow contract only
+accepts `verify_task_completion` from the task's poster, so until it also
+accepts an authorised verifier (e.g. the task's moderator), a live client
+cannot deliver payouts for other posters' tasks; see `escrow_chain.EscrowClient`.
+
+Resending is safe: the contract refuses to pay the same performer twice for
+a task, which the chain client reports as a duplicate and is recorded as sent.
+"""
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import database, models
+from app.services import escrow_chain, realtime
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_client: Optional[escrow_chain.EscrowClient] = None
+
+CHAIN_CLIENTS = {
+    "simulator": escrow_chain.SimulatedEscrowClient,
+}
+
+
+def get_client() -> escrow_chain.EscrowClient:
+    """Returns the configured escrow chain client."""
+    global _client
+    if _client is None:
+        _client = CHAIN_CLIENTS[settings.PAYOUT_CHAIN_CLIENT]()
+    return _client
+
+
+def set_client(client: escrow_chain.EscrowClient) -> None:
+    """Replaces the escrow chain client (e.g. with a simulator in tests)."""
+    global _client
+    _client = client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PAYOUT_WORKERS, thread_name_prefix="payout"
+        )
+    return _executor
+
+
+def enqueue_payout(db: Session, submission: models.MicroJobSubmission) -> models.PayoutOutbox:
+    """
+    Adds a payout intent for an approved submission to the session.
+    The caller commits it together with the approval. If the worker has not
+    linked a TON wallet yet, the intent waits for `release_awaiting_wallet`.
+    """
+    worker = submission.worker
+    intent = models.PayoutOutbox(
+        submission_id=submission.id,
+        microjob_id=submission.microjob_id,
+        worker_id=worker.id,
+        performer_address=worker.ton_wallet_address or None,
+        status="pending" if worker.ton_wallet_address else "awaiting_wallet",
+        next_attempt_at=datetime.now(timezone.utc),
+    )
+    db.add(intent)
+    return intent
+
+
+def release_awaiting_wallet(db: Session, worker: models.User) -> int:
+    """
+    Makes the worker's intents that were waiting for a wallet due, paying
+    the wallet now linked. Does not commit. Returns the number released.
+    """
+    result = db.execute(
+        update(models.PayoutOutbox)
+        .where(
+            models.PayoutOutbox.status == "awaiting_wallet",
+            models.PayoutOutbox.worker_id == worker.id,
+        )
+        .values(
+            status="pending",
+            performer_address=worker.ton_wallet_address,
+            next_attempt_at=datetime.now(timezone.utc),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with full jitter, capped at the configured maximum."""
+    ceiling = min(
+        settings.PAYOUT_RETRY_MAX_SECONDS,
+        settings.PAYOUT_RETRY_BASE_SECONDS * (2 ** (attempts - 1)),
+    )
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def claim_due(db: Session, limit: int) -> List[models.PayoutOutbox]:
+    """
+    Claims up to `limit` due intents by moving them to 'sending'. Intents stuck
+    in 'sending' (a dispatcher died mid-batch) are claimed again after the
+    claim timeout. Safe to run from several workers at once.
+    """
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.PAYOUT_CLAIM_TIMEOUT_SECONDS)
+    stale_sending = (models.PayoutOutbox.status == "sending") & (
+        models.PayoutOutbox.claimed_at <= stale
+    )
+    pending_due = (models.PayoutOutbox.status == "pending") & (
+        models.PayoutOutbox.next_attempt_at <= now
+    )
+    due = or_(stale_sending, pending_due)
+
+    # One query per condition so each walks its (status, ...) index, oldest first.
+    candidate_ids = []
+    for condition, order in (
+        (stale_sending, models.PayoutOutbox.claimed_at),
+        (pending_due, models.PayoutOutbox.next_attempt_at),
+    ):
+        remaining = limit - len(candidate_ids)
+        if remaining <= 0:
+            break
+        candidate_ids += db.execute(
+            select(models.PayoutOutbox.id)
+            .where(condition)
+            .order_by(order)
+            .limit(remaining)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+    if not candidate_ids:
+        db.rollback()
+        return []
+
+    # Re-check the condition so only one worker wins each row.
+    claimed_ids = db.execute(
+        update(models.PayoutOutbox)
+        .where(models.PayoutOutbox.id.in_(candidate_ids), due)
+        .values(status="sending", claimed_at=now)
+        .returning(models.PayoutOutbox.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    if not claimed_ids:
+        return []
+    return (
+        db.query(models.PayoutOutbox)
+        .filter(models.PayoutOutbox.id.in_(claimed_ids))
+        .order_by(models.PayoutOutbox.id)
+        .all()
+    )
+
+
+def _to_message(intent: models.PayoutOutbox, now: datetime) -> escrow_chain.PayoutMessage:
+    # The contract requires a query id above the task's last one, so derive
+    # it from the send time; retries therefore always use a fresh, higher id.
+    query_id = (int(now.timestamp()) << 20) | (intent.id & 0xFFFFF)
+    return escrow_chain.PayoutMessage(
+        outbox_id=intent.id,
+        task_id=intent.microjob_id,
+        performer_address=intent.performer_address,
+        query_id=query_id,
+    )
+
+
+def _send_batch(
+    client: escrow_chain.EscrowClient, messages: List[escrow_chain.PayoutMessage]
+) -> List[escrow_chain.PayoutResult]:
+    try:
+        return client.send_payouts(messages)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Payout batch of %d failed: %s", len(messages), exc)
+        return [
+            escrow_chain.PayoutResult(m.outbox_id, ok=False, error=str(exc)) for m in messages
+        ]
+
+
+def record_results(
+    db: Session,
+    intents: List[models.PayoutOutbox],
+    results: List[escrow_chain.PayoutResult],
+) -> Dict[str, int]:
+    """Stores batch results with bulk updates and schedules retries."""
+    now = datetime.now(timezone.utc)
+    by_id = {intent.id: intent for intent in intents}
+    sent_rows, retry_rows = [], []
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+
+    for result in results:
+        intent = by_id[result.outbox_id]
+        attempts = intent.attempts + 1
+        if result.ok:
+            sent_rows.append({
+                "id": intent.id, "status": "sent", "attempts": attempts,
+                "sent_at": now, "tx_hash": result.tx_hash, "last_error": None,
+            })
+            counts["sent"] += 1
+        elif attempts >= settings.PAYOUT_MAX_ATTEMPTS:
+            retry_rows.append({
+                "id": intent.id, "status": "failed", "attempts": attempts,
+                "last_error": result.error,
+            })
+            counts["failed"] += 1
+        else:
+            retry_rows.append({
+                "id": intent.id, "status": "pending", "attempts": attempts,
+                "next_attempt_at": now + _retry_delay(attempts), "last_error": result.error,
+            })
+            counts["retried"] += 1
+
+    db.expunge_all()
+    for rows in (sent_rows, retry_rows):
+        if rows:
+            db.execute(update(models.PayoutOutbox), rows)
+    db.commit()
+
+    for row in sent_rows:
+        realtime.publish_payout_sent(by_id[row["id"]].worker_id, by_id[row["id"]].microjob_id)
+    if counts["failed"]:
+        logger.error("%d payouts failed permanently", counts["failed"])
+    return counts
+
+
+def dispatch_once(db: Session, client: Optional[escrow_chain.EscrowClient] = None) -> int:
+    """
+    Claims one round of due intents, sends them as batched messages in
+    parallel and records the results. Returns the number of intents handled.
+    """
+    client = client or get_client()
+    batch_size = settings.PAYOUT_BATCH_SIZE
+    intents = claim_due(db, batch_size * settings.PAYOUT_WORKERS)
+    if not intents:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    batches = [
+        [_to_message(intent, now) for intent in intents[start:start + batch_size]]
+        for start in range(0, len(intents), batch_size)
+    ]
+    results: List[escrow_chain.PayoutResult] = []
+    for batch_results in _get_executor().map(lambda b: _send_batch(client, b), batches):
+        results.extend(batch_results)
+
+    record_results(db, intents, results)
+    return len(intents)
+
+
+def run_dispatcher() -> int:
+    """Drains every due payout intent. Returns the number handled."""
+    handled = 0
+    db = database.SessionLocal()
+    try:
+        while True:
+            count = dispatch_once(db)
+            handled += count
+            if count == 0:
+                break
+    finally:
+        db.close()
+    return handled
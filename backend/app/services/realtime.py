@@ -0,0 +1,105 @@
+"""
+Service layer for real-time user events.
+
+Connects the service functions to the event bus and formats the per-user
+Server-Sent Events stream.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.events import event_bus
+from app.db import models
+
+
+def mining_ends_at(user: models.User) -> Optional[datetime]:
+    """Returns when the user's current mining cycle ends, if one is running."""
+    if not user.mining_started_at:
+        return None
+    return user.mining_started_at + timedelta(hours=user.current_mining_cycle_hours)
+
+
+def publish_mining_cycles_ready(user_ids) -> None:
+    """Tells the users that their mining cycle ended and ZP can be claimed."""
+    for user_id in user_ids:
+        event_bus.publish(
+            user_id,
+            "mining_cycle_ready",
+            {"message": "Your mining cycle has finished. ZP is ready to claim."},
+        )
+
+
+def publish_balance_changed(user: models.User) -> None:
+    """Pushes the user's new ZP balance and social capital score."""
+    event_bus.publish(
+        user.id,
+        "balance_changed",
+        {
+            "zp_balance": user.zp_balance,
+            "social_capital_score": user.social_capital_score,
+        },
+    )
+
+
+def publish_task_created(task: models.Task) -> None:
+    """Announces a newly available task to every connected user."""
+    event_bus.broadcast(
+        "task_created",
+        {"task_id": task.id, "title": task.title, "zp_reward": task.zp_reward},
+    )
+
+
+def publish_microjob_status_changed(poster_id: int, microjob_id: int, new_status: str) -> None:
+    """Tells a poster that one of their micro-jobs changed status (e.g. got funded)."""
+    event_bus.publish(
+        poster_id,
+        "microjob_status_changed",
+        {"microjob_id": microjob_id, "status": new_status},
+    )
+
+
+def publish_payout_sent(worker_id: int, microjob_id: int) -> None:
+    """Tells a worker that the escrow payout for a micro-job was sent."""
+    event_bus.publish(worker_id, "payout_sent", {"microjob_id": microjob_id})
+
+
+def publish_payout_awaiting_wallet(worker_id: int, microjob_id: int) -> None:
+    """Tells a worker that a payout is waiting for them to link a TON wallet."""
+    event_bus.publish(worker_id, "payout_awaiting_wallet", {"microjob_id": microjob_id})
+
+
+def _format_sse(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def user_event_stream(user: models.User) -> AsyncIterator[str]:
+    """
+    Yields the SSE stream for a user: an initial mining snapshot followed by
+    live events, with comment lines as keep-alives.
+    """
+    user_id = user.id
+    ends_at = mining_ends_at(user)
+    queue = event_bus.subscribe(user_id)
+    try:
+        yield _format_sse(
+            "mining_status",
+            {"mining_started_at": user.mining_started_at, "mining_ends_at": ends_at},
+        )
+        if ends_at is not None and ends_at <= datetime.now(timezone.utc):
+            publish_mining_cycles_ready([user_id])
+
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=settings.EVENT_STREAM_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _format_sse(event["event"], event["data"])
+    finally:
+        event_bus.unsubscribe(user_id, queue)
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session, joinedload
 from app.core.config import settings
 from app.db import models
 from app.schemas import referral as referral_schemas
+from app.services import analytics, realtime, sybil
 
 
 def get_referral_link(user_id: int) -> str:
@@ -61,6 +62,16 @@ def track_referral(db: Session, referrer_id: int, referred_email: str):
             detail="Referrer has reached maximum active referrals.",
         )
 
+    # Referrers in a suspected account farm get no reward until reviewed
+    if sybil.is_flagged(db, referrer_id):
+        db_referral = models.Referral(
+            referrer_id=referrer_id, referred_id=referred_user.id, status="held"
+        )
+        db.add(db_referral)
+        db.commit()
+        db.refresh(db_referral)
+        return db_referral
+
     db_referral = models.Referral(
         referrer_id=referrer_id, referred_id=referred_user.id, status="completed"
     )
@@ -70,9 +81,11 @@ def track_referral(db: Session, referrer_id: int, referred_email: str):
     referrer.zp_balance += settings.REFERRAL_INITIAL_ZP_REWARD
     referrer.social_capital_score += settings.REFERRAL_INITIAL_ZP_REWARD
     db.add(referrer)
+    analytics.record_referral(db, settings.REFERRAL_INITIAL_ZP_REWARD)
 
     db.commit()
     db.refresh(db_referral)
+    realtime.publish_balance_changed(referrer)
     return db_referral
 
 
@@ -140,6 +153,7 @@ def delete_referral(db: Session, referrer: models.User, referral_id: int):
     db.delete(referral)
     db.add(referrer)
     db.commit()
+    realtime.publish_balance_changed(referrer)
 
     return {
         "message": f"Referral deleted successfully. {cost_to_delete} ZP deducted.",
@@ -0,0 +1,174 @@
+"""
+Service layer for sybil (account farm) review.
+
+The offline detection job (`python -m app.tools.detect_sybils`) writes
+clusters of linked accounts to `sybil_clusters`, one membership row per
+account. Reward paths call `is_flagged`, a primary-key lookup, and hold
+rewards for accounts in clusters that are flagged or confirmed; admins
+confirm or clear clusters after review. Clearing a cluster pays out the
+referral rewards held for its members.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.services import analytics, realtime
+
+FLAGGED = "flagged"
+CONFIRMED = "confirmed"
+CLEARED = "cleared"
+REVIEW_STATUSES = (CONFIRMED, CLEARED)
+HOLDING_STATUSES = (FLAGGED, CONFIRMED)  # Rewards are held for these
+
+DETECTION_LOCK_NAME = "sybil_detection"
+
+
+def is_flagged(db: Session, user_id: int) -> bool:
+    """Whether the user's rewards are held because of a sybil cluster."""
+    member, cluster = models.SybilClusterMember, models.SybilCluster
+    return bool(db.execute(
+        select(exists().where(
+            member.user_id == user_id,
+            cluster.id == member.cluster_id,
+            cluster.status.in_(HOLDING_STATUSES),
+        ))
+    ).scalar())
+
+
+def reviewed_user_ids(db: Session) -> List[int]:
+    """Members of reviewed clusters, which the detection job leaves alone."""
+    member, cluster = models.SybilClusterMember, models.SybilCluster
+    return list(db.execute(
+        select(member.user_id)
+        .join(cluster, cluster.id == member.cluster_id)
+        .where(cluster.status.in_(REVIEW_STATUSES))
+    ).scalars())
+
+
+def replace_flagged_clusters(db: Session, clusters: Iterable[dict], batch_size: int = 5000) -> int:
+    """
+    Replaces the unreviewed clusters with a fresh detection result, in one
+    transaction. Each cluster is a dict with `score`, `reasons` and
+    `user_ids`. Returns the number of clusters written.
+    """
+    cluster, member = models.SybilCluster, models.SybilClusterMember
+    unreviewed = select(cluster.id).where(cluster.status == FLAGGED)
+    db.execute(delete(member).where(member.cluster_id.in_(unreviewed)))
+    db.execute(delete(cluster).where(cluster.status == FLAGGED))
+
+    written, members = 0, []
+    for found in clusters:
+        cluster_id = db.execute(
+            insert(cluster)
+            .values(
+                status=FLAGGED,
+                score=found["score"],
+                size=len(found["user_ids"]),
+                reasons=json.dumps(found["reasons"], sort_keys=True),
+            )
+            .returning(cluster.id)
+        ).scalar_one()
+        members.extend({"user_id": user_id, "cluster_id": cluster_id} for user_id in found["user_ids"])
+        if len(members) >= batch_size:
+            db.execute(insert(member), members)
+            members = []
+        written += 1
+    if members:
+        db.execute(insert(member), members)
+    db.commit()
+    return written
+
+
+def list_clusters(db: Session, status_filter: Optional[str] = FLAGGED, limit: int = 100):
+    """Clusters for review, highest score first."""
+    query = select(models.SybilCluster)
+    if status_filter:
+        query = query.where(models.SybilCluster.status == status_filter)
+    clusters = db.execute(
+        query.order_by(models.SybilCluster.score.desc(), models.SybilCluster.id).limit(limit)
+    ).scalars().all()
+    return [_cluster_dict(db, found) for found in clusters]
+
+
+def _cluster_dict(db: Session, cluster: models.SybilCluster) -> dict:
+    return {
+        "id": cluster.id,
+        "status": cluster.status,
+        "score": cluster.score,
+        "size": cluster.size,
+        "reasons": json.loads(cluster.reasons),
+        "detected_at": cluster.detected_at,
+        "reviewed_at": cluster.reviewed_at,
+        "user_ids": sorted(
+            db.execute(
+                select(models.SybilClusterMember.user_id).where(
+                    models.SybilClusterMember.cluster_id == cluster.id
+                )
+            ).scalars()
+        ),
+    }
+
+
+def review_cluster(db: Session, reviewer: models.User, cluster_id: int, new_status: str) -> dict:
+    """Confirms or clears a cluster; clearing pays out its members' held referral rewards."""
+    if new_status not in REVIEW_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Status must be one of: {', '.join(REVIEW_STATUSES)}.",
+        )
+    cluster = db.get(models.SybilCluster, cluster_id, with_for_update=True)
+    if cluster is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Sybil cluster not found."
+        )
+    cluster.status = new_status
+    cluster.reviewed_at = datetime.now(timezone.utc)
+    cluster.reviewed_by = reviewer.id
+    credited = _release_held_referrals(db, cluster.id) if new_status == CLEARED else []
+    db.commit()
+    for referrer in credited:
+        realtime.publish_balance_changed(referrer)
+    db.refresh(cluster)
+    return _cluster_dict(db, cluster)
+
+
+def _release_held_referrals(db: Session, cluster_id: int) -> List[models.User]:
+    """
+    Completes the referrals held for the cluster's members and credits
+    their rewards, in the caller's transaction. Returns the referrers credited.
+    """
+    referral = models.Referral
+    held = db.execute(
+        select(referral)
+        .where(
+            referral.status == "held",
+            referral.referrer_id.in_(
+                select(models.SybilClusterMember.user_id).where(
+                    models.SybilClusterMember.cluster_id == cluster_id
+                )
+            ),
+        )
+        .with_for_update()
+    ).scalars().all()
+    if not held:
+        return []
+
+    reward = settings.REFERRAL_INITIAL_ZP_REWARD
+    counts = {}
+    for found in held:
+        found.status = "completed"
+        counts[found.referrer_id] = counts.get(found.referrer_id, 0) + 1
+    referrers = db.execute(
+        select(models.User).where(models.User.id.in_(counts)).with_for_update()
+    ).scalars().all()
+    for referrer in referrers:
+        referrer.zp_balance += reward * counts[referrer.id]
+        referrer.social_capital_score += reward * counts[referrer.id]
+    analytics.record_referral(db, reward * len(held))
+    return list(referrers)
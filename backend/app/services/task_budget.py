@@ -0,0 +1,78 @@
+"""
+Service layer for sponsored-task completion budgets.
+
+A task's `max_completions` is split across `TaskCompletionShard` rows. A
+completion reserves a slot with a conditional increment on one randomly
+chosen shard, falling back to the others when it is full, so concurrent
+completions of a popular task rarely touch the same row. Reservations are
+part of the completion's transaction and are released by its rollback.
+"""
+import random
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.services import task_catalog
+
+
+def create_shards(db: Session, task: models.Task) -> None:
+    """Splits the task's completion budget into counter shards. Does not commit."""
+    shard_count = max(1, min(task.max_completions, settings.TASK_BUDGET_SHARDS))
+    base, extra = divmod(task.max_completions, shard_count)
+    db.add_all(
+        models.TaskCompletionShard(
+            task_id=task.id, shard=shard, capacity=base + (1 if shard < extra else 0), used=0
+        )
+        for shard in range(shard_count)
+    )
+
+
+def completions_used(db: Session, task_id: int) -> int:
+    """Returns how many completions of the task have been reserved."""
+    used = db.execute(
+        select(func.sum(models.TaskCompletionShard.used)).where(
+            models.TaskCompletionShard.task_id == task_id
+        )
+    ).scalar()
+    return used or 0
+
+
+def reserve_completion(db: Session, task: models.Task) -> bool:
+    """
+    Reserves one completion slot for the task. Returns False if the budget is
+    exhausted. Tasks without a budget always succeed. Does not commit.
+    """
+    if task.max_completions is None:
+        return True
+
+    shard_count = max(1, min(task.max_completions, settings.TASK_BUDGET_SHARDS))
+    shards = list(range(shard_count))
+    random.shuffle(shards)
+    for shard in shards:
+        reserved = db.execute(
+            update(models.TaskCompletionShard)
+            .where(
+                models.TaskCompletionShard.task_id == task.id,
+                models.TaskCompletionShard.shard == shard,
+                models.TaskCompletionShard.used < models.TaskCompletionShard.capacity,
+            )
+            .values(used=models.TaskCompletionShard.used + 1)
+            .returning(models.TaskCompletionShard.used, models.TaskCompletionShard.capacity)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if reserved is not None:
+            used, capacity = reserved
+            # Only a shard filling up can exhaust the whole budget.
+            if used >= capacity and completions_used(db, task.id) >= task.max_completions:
+                deactivate(db, task)
+            return True
+    return False
+
+
+def deactivate(db: Session, task: models.Task) -> None:
+    """Deactivates a task whose budget is used up. Does not commit."""
+    task.is_active = False
+    db.add(task)
+    task_catalog.invalidate(db)
@@ -0,0 +1,187 @@
+"""
+In-process snapshot of the active task catalog.
+
+Every user sees the same active tasks minus the ones they completed, so the
+catalog is loaded once into an immutable, versioned snapshot and per-user
+lists are computed by filtering it. The snapshot is invalidated by the task
+service functions (write-through), coordinated across workers through the
+`tasks` version counter in the database, and bounded in time so expired
+tasks drop out even before the sweeper deactivates them.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models, versions
+
+
+@dataclass(frozen=True)
+class CatalogTask:
+    """Read-only copy of an active `Task` row."""
+    id: int
+    title: str
+    description: str
+    zp_reward: int
+    type: str
+    external_link: Optional[str]
+    is_active: bool
+    poster_user_id: Optional[int]
+    expiration_date: Optional[datetime]
+    max_completions: Optional[int]
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Active tasks as of a given catalog version."""
+    version: int
+    tasks: Tuple[CatalogTask, ...]
+    loaded_at: float  # time.monotonic() of the load
+    next_expiration: Optional[datetime]  # Earliest expiration among the tasks
+
+
+_TASK_COLUMNS = [
+    getattr(models.Task, field) for field in CatalogTask.__dataclass_fields__
+]
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """A loaded datetime as UTC-aware; SQLite returns them naive."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+_lock = threading.Lock()
+_snapshot: Optional[CatalogSnapshot] = None
+_checked_at = 0.0  # time.monotonic() of the last version check
+_DIRTY_KEY = "task_catalog_dirty"
+
+
+def _load(db: Session, version: int) -> CatalogSnapshot:
+    now = datetime.now(timezone.utc)
+    rows = db.execute(
+        select(*_TASK_COLUMNS)
+        .where(
+            models.Task.is_active.is_(True),
+            or_(
+                models.Task.expiration_date.is_(None),
+                models.Task.expiration_date > now,
+            ),
+        )
+        .order_by(models.Task.id)
+    ).all()
+    tasks = tuple(
+        CatalogTask(**{**row._mapping, "expiration_date": as_utc(row.expiration_date)})
+        for row in rows
+    )
+    expirations = [task.expiration_date for task in tasks if task.expiration_date]
+    return CatalogSnapshot(
+        version=version,
+        tasks=tasks,
+        loaded_at=time.monotonic(),
+        next_expiration=min(expirations) if expirations else None,
+    )
+
+
+def _is_fresh(snapshot: CatalogSnapshot, now: datetime) -> bool:
+    if time.monotonic() - snapshot.loaded_at > settings.TASK_CATALOG_MAX_AGE_SECONDS:
+        return False
+    return snapshot.next_expiration is None or snapshot.next_expiration > now
+
+
+def get_snapshot(db: Session) -> CatalogSnapshot:
+    """
+    Returns the current catalog snapshot. The database version counter is
+    consulted at most once per `TASK_CATALOG_CHECK_SECONDS`, and the catalog
+    is reloaded only when the version changed, a task expired or the
+    snapshot reached its maximum age.
+    """
+    global _snapshot, _checked_at
+    now = datetime.now(timezone.utc)
+    snapshot = _snapshot
+    if (
+        snapshot is not None
+        and time.monotonic() - _checked_at < settings.TASK_CATALOG_CHECK_SECONDS
+        and _is_fresh(snapshot, now)
+    ):
+        return snapshot
+
+    with _lock:
+        # Another thread may have refreshed it while we waited.
+        snapshot = _snapshot
+        if (
+            snapshot is not None
+            and time.monotonic() - _checked_at < settings.TASK_CATALOG_CHECK_SECONDS
+            and _is_fresh(snapshot, now)
+        ):
+            return snapshot
+
+        version = versions.get_version(db, versions.TASKS_CATALOG)
+        if snapshot is None or snapshot.version != version or not _is_fresh(snapshot, now):
+            snapshot = _load(db, version)
+            _snapshot = snapshot
+        _checked_at = time.monotonic()
+        return snapshot
+
+
+def _discard_local(session: Session) -> None:
+    global _snapshot
+    if session.info.pop(_DIRTY_KEY, False):
+        with _lock:
+            _snapshot = None
+
+
+def invalidate(db: Session) -> None:
+    """
+    Marks the catalog as changed. Call before committing a change to the
+    active tasks: the version bump is part of the same transaction, and this
+    worker drops its snapshot as soon as the transaction commits.
+    """
+    versions.bump_version(db, versions.TASKS_CATALOG)
+    db.info[_DIRTY_KEY] = True
+    if not event.contains(db, "after_commit", _discard_local):
+        event.listen(db, "after_commit", _discard_local)
+
+
+def _is_live(task: CatalogTask, now: datetime) -> bool:
+    return task.expiration_date is None or task.expiration_date > now
+
+
+def available_tasks(db: Session, user_id: int) -> Tuple[CatalogTask, ...]:
+    """Active, non-expired catalog tasks the user has not completed yet."""
+    snapshot = get_snapshot(db)
+    completed = set(
+        db.execute(
+            select(models.UserTaskCompletion.task_id).where(
+                models.UserTaskCompletion.user_id == user_id
+            )
+        ).scalars()
+    )
+    now = datetime.now(timezone.utc)
+    return tuple(
+        task for task in snapshot.tasks if task.id not in completed and _is_live(task, now)
+    )
+
+
+def available_tasks_version(db: Session, user_id: int) -> Tuple:
+    """
+    Cheap version of `available_tasks` for conditional requests: changes
+    whenever the catalog version, the set of unexpired catalog tasks or the
+    user's completions change, without loading the completions.
+    """
+    snapshot = get_snapshot(db)
+    now = datetime.now(timezone.utc)
+    live = sum(1 for task in snapshot.tasks if _is_live(task, now))
+    completions, last_completion = db.execute(
+        select(func.count(), func.max(models.UserTaskCompletion.id)).where(
+            models.UserTaskCompletion.user_id == user_id
+        )
+    ).one()
+    return snapshot.version, live, completions, last_completion
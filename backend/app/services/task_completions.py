@@ -0,0 +1,197 @@
+"""
+Service layer for task completion records and their archival.
+
+`user_task_completions` only holds completions of live and recently expired
+tasks, with a unique `(user_id, task_id)` index. An archival job moves the
+completions of long-expired tasks in bulk to `user_task_completions_archive`
+(month-partitioned on PostgreSQL) and folds their task ids into a compact
+per-user `UserTaskSummary`, which duplicate checks consult instead of the
+archived rows.
+"""
+import logging
+import sys
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, exists, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import database, locks, models
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_LOCK_NAME = "task_completion_archiver"
+
+
+def _unpack(blob: Optional[bytes]) -> array:
+    ids = array("I")
+    if blob:
+        ids.frombytes(blob)
+        if sys.byteorder == "big":
+            ids.byteswap()
+    return ids
+
+
+def _pack(ids: Iterable[int]) -> bytes:
+    packed = array("I", sorted(ids))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def archived_task_ids(db: Session, user_id: int) -> array:
+    """Sorted ids of the tasks whose completions by the user were archived."""
+    blob = db.execute(
+        select(models.UserTaskSummary.archived_task_ids).where(
+            models.UserTaskSummary.user_id == user_id
+        )
+    ).scalar()
+    return _unpack(blob)
+
+
+def has_completed(db: Session, user_id: int, task_id: int) -> bool:
+    """Whether the user completed the task, archived completions included."""
+    if db.execute(
+        select(
+            exists().where(
+                models.UserTaskCompletion.user_id == user_id,
+                models.UserTaskCompletion.task_id == task_id,
+            )
+        )
+    ).scalar():
+        return True
+    archived = archived_task_ids(db, user_id)
+    index = bisect_left(archived, task_id)
+    return index < len(archived) and archived[index] == task_id
+
+
+def ensure_archive_partitions(db: Session, start: datetime, end: datetime) -> None:
+    """
+    Creates the monthly archive partitions covering `start`..`end` on
+    PostgreSQL, plus a default partition. No-op on other databases.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    table = models.UserTaskCompletionArchive.__tablename__
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_{year}_{month:02d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{year}-{month:02d}-01') TO ('{next_year}-{next_month:02d}-01')"
+        ))
+        year, month = next_year, next_month
+
+
+def _merge_summaries(db: Session, archived_by_user) -> None:
+    existing = {
+        summary.user_id: summary
+        for summary in db.execute(
+            select(models.UserTaskSummary)
+            .where(models.UserTaskSummary.user_id.in_(list(archived_by_user)))
+            .with_for_update()
+        ).scalars()
+    }
+    updates, inserts = [], []
+    for user_id, task_ids in archived_by_user.items():
+        summary = existing.get(user_id)
+        if summary is None:
+            inserts.append({
+                "user_id": user_id,
+                "archived_task_ids": _pack(set(task_ids)),
+                "archived_count": len(task_ids),
+            })
+        else:
+            merged = set(_unpack(summary.archived_task_ids)) | set(task_ids)
+            updates.append({
+                "user_id": user_id,
+                "archived_task_ids": _pack(merged),
+                "archived_count": summary.archived_count + len(task_ids),
+            })
+    if inserts:
+        db.execute(insert(models.UserTaskSummary), inserts)
+    if updates:
+        db.execute(update(models.UserTaskSummary), updates)
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """
+    Moves up to `batch_size` completions of tasks that expired before
+    `cutoff` to the archive and updates the users' summaries, in one
+    transaction. Returns the number of completions moved.
+    """
+    completion = models.UserTaskCompletion
+    rows = db.execute(
+        select(
+            completion.id,
+            completion.user_id,
+            completion.task_id,
+            func.coalesce(completion.completed_at, models.Task.expiration_date).label("completed_at"),
+            completion.status,
+        )
+        .join(models.Task, models.Task.id == completion.task_id)
+        .where(
+            models.Task.is_active.is_(False),
+            models.Task.expiration_date < cutoff,
+        )
+        .order_by(completion.id)
+        .limit(batch_size)
+        .with_for_update(of=completion, skip_locked=True)
+    ).mappings().all()
+    if not rows:
+        db.rollback()
+        return 0
+
+    ensure_archive_partitions(
+        db, min(row["completed_at"] for row in rows), max(row["completed_at"] for row in rows)
+    )
+    db.execute(insert(models.UserTaskCompletionArchive), [dict(row) for row in rows])
+
+    archived_by_user = defaultdict(list)
+    for row in rows:
+        archived_by_user[row["user_id"]].append(row["task_id"])
+    _merge_summaries(db, archived_by_user)
+
+    db.execute(
+        delete(completion)
+        .where(completion.id.in_([row["id"] for row in rows]))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(rows)
+
+
+def archive_completions(db: Session, now: Optional[datetime] = None) -> int:
+    """Archives every eligible completion in batches. Returns the number moved."""
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.TASK_COMPLETION_ARCHIVE_AFTER_DAYS)
+    batch_size = settings.TASK_COMPLETION_ARCHIVE_BATCH_SIZE
+    archived = 0
+    while True:
+        moved = archive_batch(db, cutoff, batch_size)
+        archived += moved
+        if moved < batch_size:
+            return archived
+
+
+def run_archiver() -> Optional[int]:
+    """
+    Runs one archival pass unless another worker is already running it.
+    Returns the number of completions archived, or None if skipped.
+    """
+    with locks.try_advisory_lock(ARCHIVE_LOCK_NAME) as acquired:
+        if not acquired:
+            return None
+        db = database.SessionLocal()
+        try:
+            archived = archive_completions(db)
+        finally:
+            db.close()
+    if archived:
+        logger.info("Archived %d task completions", archived)
+    return archived
@@ -5,18 +5,24 @@ tasks and task completions.
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy import or_, not_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.db import models
 from app.schemas import sponsored_task as sponsored_task_schemas
 from app.schemas import task as task_schemas
+from app.services import (
+    analytics, realtime, sybil, task_budget, task_catalog, task_completions
+)
 
 
 def create_sponsored_task(
     db: Session, user: models.User, task_data: sponsored_task_schemas.UserSponsoredTaskCreate
 ):
-    """Deducts ZP from a user to create a user-sponsored task with an expiration."""
+    """
+    Deducts ZP from a user to create a user-sponsored task with an expiration
+    and a completion budget.
+    """
     duration_costs = {
         "1_day": {"cost": 10000, "delta": timedelta(days=1)},
         "5_days": {"cost": 30000, "delta": timedelta(days=5)},
@@ -29,6 +35,20 @@ def create_sponsored_task(
             status_code=402, detail=f"Insufficient ZP. This requires {config['cost']} ZP."
         )
 
+    if task_data.zp_reward > config["cost"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The reward per completion cannot exceed the {config['cost']} ZP paid.",
+        )
+    # The ZP paid funds the rewards of at most this many completions
+    completion_cap = config["cost"] // task_data.zp_reward
+    if task_data.max_completions and task_data.max_completions > completion_cap:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{config['cost']} ZP funds at most {completion_cap} completions "
+            f"at {task_data.zp_reward} ZP each.",
+        )
+
     user.zp_balance -= config["cost"]
     expiration = datetime.now(timezone.utc) + config["delta"]
 
@@ -41,46 +61,42 @@ def create_sponsored_task(
         is_active=True,
         poster_user_id=user.id,
         expiration_date=expiration,
+        max_completions=task_data.max_completions or completion_cap,
     )
     db.add(new_task)
     db.add(user)
+    db.flush()
+    task_budget.create_shards(db, new_task)
+    task_catalog.invalidate(db)
     db.commit()
     db.refresh(new_task)
+    realtime.publish_balance_changed(user)
+    realtime.publish_task_created(new_task)
     return new_task
 
 
 def get_available_tasks(db: Session, user_id: int):
-    """Retrieves all active, non-expired tasks that the user has not completed."""
-    completed_task_ids_query = (
-        db.query(models.UserTaskCompletion.task_id)
-        .filter(models.UserTaskCompletion.user_id == user_id)
-        .all()
-    )
-    completed_task_ids = [task_id for (task_id,) in completed_task_ids_query]
-
-    now = datetime.now(timezone.utc)
-    tasks = (
-        db.query(models.Task)
-        .filter(
-            models.Task.is_active.is_(True),
-            not_(models.Task.id.in_(completed_task_ids)),
-            # Task is valid if it has NO expiration date OR its expiration is in the future
-            or_(
-                models.Task.expiration_date.is_(None),
-                models.Task.expiration_date > now,
-            ),
-        )
-        .all()
-    )
-    return tasks
+    """
+    Retrieves all active, non-expired tasks that the user has not completed,
+    filtered from the shared in-process task catalog snapshot.
+    """
+    return list(task_catalog.available_tasks(db, user_id))
+
+
+def get_available_tasks_version(db: Session, user_id: int):
+    """Cheap version of the user's available tasks, for ETags."""
+    return task_catalog.available_tasks_version(db, user_id)
 
 
 def create_task(db: Session, task_data: task_schemas.TaskCreate):
     """Creates a new admin-defined task."""
     db_task = models.Task(**task_data.model_dump())
     db.add(db_task)
+    task_catalog.invalidate(db)
     db.commit()
     db.refresh(db_task)
+    if db_task.is_active:
+        realtime.publish_task_created(db_task)
     return db_task
 
 
@@ -95,19 +111,31 @@ def complete_task(db: Session, user: models.User, task_id: int):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Task is no longer active."
         )
-
-    existing_completion = (
-        db.query(models.UserTaskCompletion)
-        .filter(
-            models.UserTaskCompletion.user_id == user.id,
-            models.UserTaskCompletion.task_id == task_id,
+    expiration_date = task_catalog.as_utc(task.expiration_date)
+    if expiration_date and expiration_date <= datetime.now(timezone.utc):
+        # Expired but not yet swept
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Task has expired."
         )
-        .first()
+
+    already_completed = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="You have already completed this task.",
     )
-    if existing_completion:
+    if task_completions.has_completed(db, user.id, task_id):
+        raise already_completed
+    if sybil.is_flagged(db, user.id):
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="You have already completed this task.",
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Task rewards are on hold while this account is under review.",
+        )
+
+    if not task_budget.reserve_completion(db, task):
+        task_budget.deactivate(db, task)
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This task has reached its completion limit.",
         )
 
     db_completion = models.UserTaskCompletion(
@@ -118,10 +146,17 @@ def complete_task(db: Session, user: models.User, task_id: int):
     user.zp_balance += task.zp_reward
     user.social_capital_score += task.zp_reward
     db.add(user)
-
-    db.commit()
+    analytics.record_task_completion(db, task)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request recorded the same completion first.
+        db.rollback()
+        raise already_completed
     db.refresh(db_completion)
     db.refresh(user)
+    realtime.publish_balance_changed(user)
 
     return {
         "message": f"Task '{task.title}' completed! You earned {task.zp_reward} ZP.",
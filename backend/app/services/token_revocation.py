@@ -0,0 +1,199 @@
+"""
+Revocation of issued access tokens.
+
+Every access token carries a `jti` (token id) and an `iat` (issue time). A
+token is rejected when:
+
+- its `jti` is in `revoked_tokens` (logout), or
+- it was issued before the user's `tokens_valid_after` watermark (logout
+  everywhere, 2FA disabled).
+
+The watermark is checked against the user row the request loads anyway. To
+keep revoked-jti checks off the database, each worker holds a Bloom filter of
+the unexpired revoked jtis, extended at most once per
+`TOKEN_REVOCATION_CHECK_SECONDS` with the rows revoked since the latest one
+read. Each refresh reads back `TOKEN_REVOCATION_OVERLAP_SECONDS` before that
+point, so a revocation committed after a later one is still picked up
+(adding a jti twice is harmless). Only jtis the filter reports as possibly
+revoked are confirmed with a lookup; a revocation made by another worker
+takes effect here within that interval.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.db import database, locks, models
+
+logger = logging.getLogger(__name__)
+
+PURGE_LOCK_NAME = "revoked_token_purger"
+
+
+class _RevokedFilter:
+    """The worker's Bloom filter of revoked jtis and how far it has read."""
+
+    def __init__(self, capacity: int):
+        self.bloom = BloomFilter(capacity, settings.TOKEN_REVOCATION_FILTER_ERROR_RATE)
+        self.last_revoked_at: Optional[datetime] = None  # Latest revoked_at read
+        self.checked_at = 0.0  # time.monotonic() of the last refresh
+        self.built_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_filter: Optional[_RevokedFilter] = None
+
+
+def _rebuild(db: Session) -> _RevokedFilter:
+    # Sized from the live rows, so purged revocations drop out on rebuild.
+    live = db.execute(
+        select(func.count()).where(
+            models.RevokedToken.expires_at > datetime.now(timezone.utc)
+        )
+    ).scalar()
+    return _RevokedFilter(max(settings.TOKEN_REVOCATION_FILTER_CAPACITY, 2 * live))
+
+
+def _extend(db: Session, revoked: _RevokedFilter) -> None:
+    query = select(models.RevokedToken.jti, models.RevokedToken.revoked_at).where(
+        models.RevokedToken.expires_at > datetime.now(timezone.utc)
+    )
+    if revoked.last_revoked_at is not None:
+        # Ids and timestamps can commit out of order; overlap the last read.
+        overlap = timedelta(seconds=settings.TOKEN_REVOCATION_OVERLAP_SECONDS)
+        query = query.where(models.RevokedToken.revoked_at >= revoked.last_revoked_at - overlap)
+    for jti, revoked_at in db.execute(query).all():
+        revoked.bloom.add(jti)
+        if revoked_at is not None and (
+            revoked.last_revoked_at is None or revoked_at > revoked.last_revoked_at
+        ):
+            revoked.last_revoked_at = revoked_at
+    revoked.checked_at = time.monotonic()
+
+
+def get_filter(db: Session) -> _RevokedFilter:
+    """
+    Returns the worker's filter, reading revocations added since the last
+    refresh when `TOKEN_REVOCATION_CHECK_SECONDS` have passed. The filter is
+    rebuilt from scratch when it is over capacity or older than
+    `TOKEN_REVOCATION_FILTER_MAX_AGE_SECONDS`.
+    """
+    global _filter
+    revoked = _filter
+    if (
+        revoked is not None
+        and time.monotonic() - revoked.checked_at < settings.TOKEN_REVOCATION_CHECK_SECONDS
+    ):
+        return revoked
+
+    with _lock:
+        revoked = _filter
+        now = time.monotonic()
+        if revoked is not None and now - revoked.checked_at < settings.TOKEN_REVOCATION_CHECK_SECONDS:
+            return revoked
+        if (
+            revoked is None
+            or revoked.bloom.is_full
+            or now - revoked.built_at > settings.TOKEN_REVOCATION_FILTER_MAX_AGE_SECONDS
+        ):
+            revoked = _rebuild(db)
+        _extend(db, revoked)
+        _filter = revoked
+        return revoked
+
+
+def is_revoked(db: Session, jti: str) -> bool:
+    """Whether the token id was revoked. Usually answered from memory."""
+    if jti not in get_filter(db).bloom:
+        return False
+    return bool(
+        db.execute(
+            select(exists().where(models.RevokedToken.jti == jti))
+        ).scalar()
+    )
+
+
+def is_token_valid(db: Session, user: models.User, claims: dict) -> bool:
+    """
+    Whether a decoded token of `user` is still valid: issued after the user's
+    watermark and not individually revoked. Tokens without a `jti` predate
+    revocation and are only subject to the watermark.
+    """
+    if user.tokens_valid_after is not None:
+        issued_at = claims.get("iat", 0)
+        if issued_at < user.tokens_valid_after.timestamp():
+            return False
+    jti = claims.get("jti")
+    return not (jti and is_revoked(db, jti))
+
+
+def revoke_token(db: Session, user: models.User, claims: dict) -> None:
+    """Revokes one token until it expires (logout)."""
+    jti = claims.get("jti")
+    if not jti:
+        # Issued before token ids existed; only the watermark can end it.
+        revoke_all_tokens(db, user)
+        return
+    db.add(models.RevokedToken(
+        jti=jti,
+        user_id=user.id,
+        expires_at=datetime.fromtimestamp(claims["exp"], timezone.utc),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Already revoked by a concurrent request.
+        db.rollback()
+        return
+    # This worker honours the revocation immediately, without a refresh.
+    revoked = _filter
+    if revoked is not None:
+        revoked.bloom.add(jti)
+
+
+def revoke_all_tokens(db: Session, user: models.User, commit: bool = True) -> None:
+    """
+    Invalidates every token issued to the user so far (logout everywhere).
+    With `commit=False` the watermark is part of the caller's transaction.
+    """
+    user.tokens_valid_after = datetime.now(timezone.utc)
+    db.add(user)
+    if commit:
+        db.commit()
+        db.refresh(user)
+
+
+def purge_expired(db: Session) -> int:
+    """Deletes revocations of tokens that have expired anyway. Returns the count."""
+    result = db.execute(
+        delete(models.RevokedToken).where(
+            models.RevokedToken.expires_at <= datetime.now(timezone.utc)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def run_purger() -> Optional[int]:
+    """
+    Purges expired revocations unless another worker is already doing it.
+    Returns the number of rows deleted, or None if skipped.
+    """
+    with locks.try_advisory_lock(PURGE_LOCK_NAME) as acquired:
+        if not acquired:
+            return None
+        db = database.SessionLocal()
+        try:
+            purged = purge_expired(db)
+        finally:
+            db.close()
+    if purged:
+        logger.info("Purged %d expired token revocations", purged)
+    return purged
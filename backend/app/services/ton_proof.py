@@ -0,0 +1,311 @@
+"""
+Verification of TON Connect `ton_proof` wallet ownership proofs.
+
+A proof is valid when:
+
+- its payload is one this server issued to the user and has not expired;
+- its timestamp is recent and its domain is one of `TON_PROOF_DOMAINS`;
+- the wallet's `state_init` hashes to the claimed address and carries the
+  public key (standard wallet v2-v5 data layouts);
+- the Ed25519 signature over the TON Connect message verifies with that key.
+
+The first two checks are cheap and run inline. The hashing and signature
+checks run in `verify_batch` on a worker pool (processes by default).
+Proofs from concurrent requests are collected for up to
+`TON_PROOF_BATCH_WINDOW_MS` or `TON_PROOF_BATCH_SIZE` proofs and sent to
+the pool as one batch, so request threads and the event loop never do
+Ed25519 work and the cost of handing work to the pool is shared.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import struct
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.ton_address import TonAddress
+
+logger = logging.getLogger(__name__)
+
+PROOF_PREFIX = b"ton-proof-item-v2/"
+CONNECT_PREFIX = b"\xff\xffton-connect"
+PUBLIC_KEY_BIT_OFFSETS = (64, 65, 32)  # wallet v3/v4, v5, v2 data cells
+
+
+# --------------------------------------------------------------------------
+# Payloads
+# --------------------------------------------------------------------------
+
+def _payload_mac(user_id: int, expires_at: int) -> str:
+    message = f"ton-proof:{user_id}:{expires_at}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def issue_payload(user_id: int) -> Tuple[str, int]:
+    """A payload for the user's wallet to sign, and its expiry (unix time)."""
+    expires_at = int(time.time()) + settings.TON_PROOF_TTL_SECONDS
+    return f"{expires_at:x}.{_payload_mac(user_id, expires_at)}", expires_at
+
+
+def _payload_valid(user_id: int, payload: str) -> bool:
+    expiry, _, mac = payload.partition(".")
+    try:
+        expires_at = int(expiry, 16)
+    except ValueError:
+        return False
+    # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+    return expires_at >= time.time() and hmac.compare_digest(
+        mac.encode(), _payload_mac(user_id, expires_at).encode()
+    )
+
+
+# --------------------------------------------------------------------------
+# State init binding and signature (run in the pool)
+# --------------------------------------------------------------------------
+
+def _parse_boc(boc: bytes) -> Tuple[List[tuple], int]:
+    """Cells of a bag of cells as (d1, d2, data, refs), and the root index."""
+    if boc[:4] != b"\xb5\xee\x9c\x72":
+        raise ValueError("Not a bag of cells.")
+    flags, offset_size = boc[4], boc[5]
+    has_index, size = flags & 0x80, flags & 0x07
+    position = 6
+
+    def read(length: int) -> int:
+        nonlocal position
+        value = int.from_bytes(boc[position:position + length], "big")
+        position += length
+        return value
+
+    cell_count, root_count, _absent = read(size), read(size), read(size)
+    read(offset_size)  # Total cells size
+    if root_count != 1:
+        raise ValueError("Expected a single root cell.")
+    root = read(size)
+    if has_index:
+        position += cell_count * offset_size
+    cells = []
+    for _ in range(cell_count):
+        d1, d2 = boc[position], boc[position + 1]
+        position += 2
+        if d1 & 0x18 or d1 >> 5:
+            raise ValueError("Exotic, hashed or leveled cells are not supported.")
+        length = (d2 + 1) // 2
+        data = boc[position:position + length]
+        position += length
+        refs = [read(size) for _ in range(d1 & 7)]
+        cells.append((d1, d2, data, refs))
+    return cells, root
+
+
+def _cell_hashes(cells: List[tuple]) -> List[Tuple[bytes, int]]:
+    """Representation hash and depth of every cell; references point forward."""
+    hashes: List[Optional[Tuple[bytes, int]]] = [None] * len(cells)
+    for index in range(len(cells) - 1, -1, -1):
+        d1, d2, data, refs = cells[index]
+        if any(ref <= index for ref in refs):
+            raise ValueError("Cell references must point forward.")
+        children = [hashes[ref] for ref in refs]
+        representation = bytes([d1, d2]) + data
+        representation += b"".join(struct.pack(">H", depth) for _, depth in children)
+        representation += b"".join(digest for digest, _ in children)
+        depth = 1 + max((child_depth for _, child_depth in children), default=-1)
+        hashes[index] = (hashlib.sha256(representation).digest(), depth)
+    return hashes
+
+
+def _bits(d2: int, data: bytes) -> Tuple[int, int]:
+    """A cell's data as an integer and its bit length (completion tag removed)."""
+    value, length = int.from_bytes(data, "big"), len(data) * 8
+    if d2 & 1:  # Incomplete last byte: strip the trailing 1 and zeros
+        trailing = (value & -value).bit_length()
+        value >>= trailing
+        length -= trailing
+    return value, length
+
+
+def _data_cell(cells: List[tuple], root: int) -> tuple:
+    """The data cell of a StateInit: split_depth, special, code, data, library."""
+    d1, d2, data, refs = cells[root]
+    value, length = _bits(d2, data)
+
+    def bit(position: int) -> int:
+        return (value >> (length - 1 - position)) & 1
+
+    position = 0
+    if bit(position):  # split_depth
+        position += 5
+    position += 1
+    if bit(position):  # special
+        position += 2
+    position += 1
+    has_code = bit(position)
+    has_data = bit(position + 1)
+    if not has_data:
+        raise ValueError("StateInit has no data.")
+    return cells[refs[1 if has_code else 0]]
+
+
+def _has_public_key(data_cell: tuple, public_key: bytes) -> bool:
+    _, d2, data, _ = data_cell
+    value, length = _bits(d2, data)
+    key = int.from_bytes(public_key, "big")
+    return any(
+        offset + 256 <= length
+        and (value >> (length - offset - 256)) & ((1 << 256) - 1) == key
+        for offset in PUBLIC_KEY_BIT_OFFSETS
+    )
+
+
+def proof_message(address: TonAddress, domain: str, timestamp: int, payload: str) -> bytes:
+    """The TON Connect message whose hash the wallet signs."""
+    domain_bytes = domain.encode()
+    message = (
+        PROOF_PREFIX
+        + struct.pack(">i", address.workchain) + address.hash_part
+        + struct.pack("<I", len(domain_bytes)) + domain_bytes
+        + struct.pack("<Q", timestamp)
+        + payload.encode()
+    )
+    return hashlib.sha256(CONNECT_PREFIX + hashlib.sha256(message).digest()).digest()
+
+
+def verify_proof(item: dict) -> bool:
+    """
+    Checks the state init binding and the signature of one proof. `item`
+    holds the address key, public key, signature, state init BoC, domain,
+    timestamp and payload. Never raises.
+    """
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    try:
+        address = TonAddress.from_key(item["address_key"])
+        cells, root = _parse_boc(item["state_init"])
+        if _cell_hashes(cells)[root][0] != address.hash_part:
+            return False
+        if not _has_public_key(_data_cell(cells, root), item["public_key"]):
+            return False
+        Ed25519PublicKey.from_public_bytes(item["public_key"]).verify(
+            item["signature"],
+            proof_message(address, item["domain"], item["timestamp"], item["payload"]),
+        )
+        return True
+    except (InvalidSignature, ValueError, IndexError, KeyError, TypeError):
+        return False
+
+
+def verify_batch(items: List[dict]) -> List[bool]:
+    """`verify_proof` over a batch; the unit of work sent to the pool."""
+    return [verify_proof(item) for item in items]
+
+
+# --------------------------------------------------------------------------
+# Batching pool
+# --------------------------------------------------------------------------
+
+class ProofVerifier:
+    """Collects proofs from concurrent requests and verifies them in batches."""
+
+    def __init__(self):
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if settings.TON_PROOF_EXECUTOR == "process":
+                self._executor = ProcessPoolExecutor(max_workers=settings.TON_PROOF_WORKERS)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.TON_PROOF_WORKERS, thread_name_prefix="ton-proof"
+                )
+        return self._executor
+
+    async def verify(self, item: dict) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= settings.TON_PROOF_BATCH_SIZE:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                settings.TON_PROOF_BATCH_WINDOW_MS / 1000, self._flush, loop
+            )
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        done = loop.run_in_executor(
+            self._get_executor(), verify_batch, [item for item, _ in batch]
+        )
+        done.add_done_callback(lambda result: self._resolve(batch, result))
+
+    @staticmethod
+    def _resolve(batch, result: asyncio.Future) -> None:
+        error = result.exception() if not result.cancelled() else asyncio.CancelledError()
+        if error is not None:
+            logger.error("ton_proof verification batch failed: %r", error)
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result.result()[index])
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+verifier = ProofVerifier()
+
+
+def _decode(value: str, what: str) -> bytes:
+    try:
+        return bytes.fromhex(value) if what == "public key" else base64.b64decode(value, validate=True)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed ton_proof {what}."
+        ) from exc
+
+
+async def check_ownership(user_id: int, address: TonAddress, proof) -> None:
+    """
+    Raises unless `proof` (a `TonProof` schema) proves that the user controls
+    `address`. Cheap checks run inline; the cryptographic ones in the pool.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid wallet ownership proof."
+    )
+    if not _payload_valid(user_id, proof.payload):
+        raise invalid
+    if abs(time.time() - proof.timestamp) > settings.TON_PROOF_TTL_SECONDS:
+        raise invalid
+    allowed_domains = [domain.strip() for domain in settings.TON_PROOF_DOMAINS.split(",") if domain.strip()]
+    if allowed_domains and proof.domain not in allowed_domains:
+        raise invalid
+    valid = await verifier.verify({
+        "address_key": address.key,
+        "public_key": _decode(proof.public_key, "public key"),
+        "signature": _decode(proof.signature, "signature"),
+        "state_init": _decode(proof.state_init, "state_init"),
+        "domain": proof.domain,
+        "timestamp": proof.timestamp,
+        "payload": proof.payload,
+    })
+    if not valid:
+        raise invalid
@@ -1,9 +1,21 @@
 """
 Service layer for handling all Two-Factor Authentication (2FA) logic,
 including enabling, confirming, and disabling TOTP for users.
+
+Setup is split in two so the database session is not held while the QR
+code renders: `begin_2fa_setup` stores the pending secret and commits, then
+`get_setup_payload` renders the QR code in a worker pool (processes by
+default) and caches the result per pending secret, so reloading the setup
+screen does not render it again.
 """
+import asyncio
 import io
+import threading
+import time
 from base64 import b64encode
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
 
 import pyotp
 import qrcode
@@ -12,6 +24,10 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db import models
+from app.services import token_revocation
+
+QR_FORMATS = ("png", "svg")
+SETUP_MESSAGE = "Scan this QR code with your authenticator app and confirm with a code."
 
 
 def generate_2fa_secret() -> str:
@@ -37,40 +53,138 @@ def verify_totp_code(secret: str, code: str) -> bool:
     return totp.verify(code, valid_window=1)
 
 
-def enable_2fa_for_user(db: Session, user: models.User):
+def begin_2fa_setup(db: Session, user: models.User) -> str:
     """
-    Generates a 2FA secret and returns data for QR code generation.
-    The secret is saved temporarily, but 2FA is not enabled until confirmed.
+    Returns the user's pending 2FA secret, generating and committing one if
+    setup has not started. 2FA is not enabled until confirmed.
     """
     if user.is_2fa_enabled:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="2FA is already enabled for this account.",
         )
-    if user.two_fa_secret:
+    if not user.two_fa_secret:
+        user.two_fa_secret = generate_2fa_secret()
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+    return user.two_fa_secret
+
+
+# --------------------------------------------------------------------------
+# QR code rendering (run in the pool)
+# --------------------------------------------------------------------------
+
+def _svg(matrix) -> str:
+    """One path with a rectangle per horizontal run of dark modules."""
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            runs.append(f"M{start} {y}h{x - start}v1H{start}z")
+    size = len(matrix)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'shape-rendering="crispEdges"><path d="{"".join(runs)}"/></svg>'
+    )
+
+
+def render_qr(data: str, qr_format: str = "png") -> str:
+    """Renders `data` as a QR code data URL, PNG or SVG."""
+    code = qrcode.QRCode(border=4)
+    code.add_data(data)
+    code.make(fit=True)
+    if qr_format == "svg":
+        encoded = b64encode(_svg(code.get_matrix()).encode()).decode("ascii")
+        return f"data:image/svg+xml;base64,{encoded}"
+    buf = io.BytesIO()
+    code.make_image().save(buf)
+    return f"data:image/png;base64,{b64encode(buf.getvalue()).decode('ascii')}"
+
+
+class _QRRenderer:
+    """Renders QR codes in a worker pool and caches them per pending secret."""
+
+    def __init__(self):
+        self._executor: Optional[Executor] = None
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if settings.TWO_FA_QR_EXECUTOR == "process":
+                self._executor = ProcessPoolExecutor(max_workers=settings.TWO_FA_QR_WORKERS)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.TWO_FA_QR_WORKERS, thread_name_prefix="qr-render"
+                )
+        return self._executor
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key: Tuple[str, str], image: str) -> None:
+        if settings.TWO_FA_SETUP_CACHE_SIZE <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + settings.TWO_FA_SETUP_CACHE_TTL_SECONDS, image)
+            self._cache.move_to_end(key)
+            while len(self._cache) > settings.TWO_FA_SETUP_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    async def render(self, secret: str, data: str, qr_format: str) -> str:
+        key = (secret, qr_format)
+        image = self._cached(key)
+        if image is None:
+            image = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), render_qr, data, qr_format
+            )
+            self._store(key, image)
+        return image
+
+    def forget(self, secret: str) -> None:
+        """Drops the cached images of a secret that is no longer pending."""
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == secret]:
+                del self._cache[key]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+qr_renderer = _QRRenderer()
+
+
+def check_qr_format(qr_format: str) -> None:
+    """Raises 400 unless `qr_format` is one of `QR_FORMATS`."""
+    if qr_format not in QR_FORMATS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="2FA setup already initiated. Please confirm or disable the existing setup.",
+            detail=f"Unknown QR format '{qr_format}'. Expected one of: {', '.join(QR_FORMATS)}.",
         )
 
-    secret = generate_2fa_secret()
-    user.two_fa_secret = secret
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-
-    # Generate QR code as a base64 data URL for the frontend
-    totp_uri = get_totp_uri(secret, user.email)
-    img = qrcode.make(totp_uri)
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    qr_code_base64 = b64encode(buf.getvalue()).decode("utf-8")
 
-    return {
-        "secret": secret,
-        "qr_code_image": f"data:image/png;base64,{qr_code_base64}",
-        "message": "Scan this QR code with your authenticator app and confirm with a code.",
-    }
+async def get_setup_payload(secret: str, user_email: str, qr_format: str = "png") -> dict:
+    """The setup screen's data for a pending secret: the secret and its QR code."""
+    check_qr_format(qr_format)
+    image = await qr_renderer.render(secret, get_totp_uri(secret, user_email), qr_format)
+    return {"secret": secret, "qr_code_image": image, "message": SETUP_MESSAGE}
 
 
 def confirm_2fa_setup(db: Session, user: models.User, code: str) -> bool:
@@ -86,6 +200,7 @@ def confirm_2fa_setup(db: Session, user: models.User, code: str) -> bool:
         )
 
     if verify_totp_code(user.two_fa_secret, code):
+        qr_renderer.forget(user.two_fa_secret)
         user.is_2fa_enabled = True
         db.add(user)
         db.commit()
@@ -115,6 +230,8 @@ def disable_2fa_for_user(db: Session, user: models.User, code: str) -> bool:
 
     user.two_fa_secret = None
     user.is_2fa_enabled = False
+    # Sessions opened under 2FA must log in again.
+    token_revocation.revoke_all_tokens(db, user, commit=False)
     db.add(user)
     db.commit()
     db.refresh(user)
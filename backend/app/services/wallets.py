@@ -0,0 +1,57 @@
+"""
+Service layer for linking TON wallets to user accounts.
+
+Addresses are compared by their canonical binary form (`ton_wallet_key`,
+workchain and account hash), so the raw, bounceable and non-bounceable
+forms of one wallet cannot be linked to different accounts.
+"""
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import ton_address
+from app.db import models
+from app.services import payouts
+
+
+def parse_wallet_address(address: str) -> ton_address.TonAddress:
+    """Parses a wallet address in any form. Raises 400 if it is invalid."""
+    try:
+        return ton_address.parse(address)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid TON address: {exc}"
+        ) from exc
+
+
+def link_wallet(
+    db: Session, user: models.User, address: str, parsed: ton_address.TonAddress
+) -> models.User:
+    """
+    Links the wallet to the user unless another account already has it, and
+    releases payouts that were waiting for a wallet.
+    """
+    already_linked = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="This wallet address is already linked to another account.",
+    )
+    owner_id = db.execute(
+        select(models.User.id).where(models.User.ton_wallet_key == parsed.key)
+    ).scalar()
+    if owner_id is not None and owner_id != user.id:
+        raise already_linked
+
+    user.ton_wallet_address = address.strip()
+    user.ton_wallet_key = parsed.key
+    db.add(user)
+    payouts.release_awaiting_wallet(db, user)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Linked concurrently by another account, or the same string is
+        # still stored as another account's unconverted address.
+        db.rollback()
+        raise already_linked
+    db.refresh(user)
+    return user
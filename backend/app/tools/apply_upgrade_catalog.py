@@ -0,0 +1,44 @@
+"""
+Applies a changed miner upgrade catalog to every user.
+
+Run after the economy team edits the catalog (the built-in table or the file
+in `MINER_UPGRADE_CATALOG_FILE`): each user's mining stats are recomputed
+from their stored upgrade levels with one set-based UPDATE per upgrade type.
+
+Usage (from the `backend` directory):
+    python -m app.tools.apply_upgrade_catalog
+    python -m app.tools.apply_upgrade_catalog --backfill-levels  # once, for users
+                                                                # created before levels were stored
+"""
+import argparse
+
+from app.db import database, locks
+from app.services import miner_upgrades
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute miner stats from the upgrade catalog.")
+    parser.add_argument(
+        "--backfill-levels", action="store_true",
+        help="First derive missing upgrade levels from the users' current stats",
+    )
+    args = parser.parse_args()
+
+    for track in miner_upgrades.get_catalog().values():
+        levels = ", ".join(f"L{level.level}={level.value} ({level.cost_zp} ZP)" for level in track.levels)
+        print(f"{track.upgrade_type}: L0={track.base_value}, {levels}")
+
+    with locks.try_advisory_lock("apply_upgrade_catalog") as acquired:
+        if not acquired:
+            raise SystemExit("Another catalog migration is running.")
+        db = database.SessionLocal()
+        try:
+            if args.backfill_levels:
+                print("Backfilled levels:", miner_upgrades.backfill_levels(db))
+            print("Updated users:", miner_upgrades.apply_catalog(db))
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Rebuilds the daily analytics rollups from stored rows.
+
+Task completions (archived ones included), referral rewards and approved
+micro-jobs are re-aggregated for past days, one transaction per chunk of
+days, replacing the counters of those days. Mining and check-in ZP and
+active miners have no history to rebuild from and are left untouched.
+
+Usage (from the `backend` directory):
+    python -m app.tools.backfill_rollups --start 2025-01-01
+    python -m app.tools.backfill_rollups --start 2025-01-01 --end 2025-07-01 --chunk-days 3
+"""
+import argparse
+import time
+from datetime import date
+
+from app.db import database
+from app.services import analytics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the daily analytics rollups.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (UTC)")
+    parser.add_argument("--end", type=date.fromisoformat,
+                        help="Day after the last one to rebuild (default and maximum: today)")
+    parser.add_argument("--chunk-days", type=int, help="Days per transaction")
+    args = parser.parse_args()
+
+    db = database.SessionLocal()
+    started = time.perf_counter()
+    total = 0
+    try:
+        for chunk_start, chunk_end, written in analytics.backfill(
+            db, args.start, args.end, args.chunk_days
+        ):
+            total += written
+            print(f"{chunk_start}..{chunk_end}: {written} counters")
+    finally:
+        db.close()
+    print(f"Wrote {total} counters in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Fills `users.ton_wallet_key` for wallets linked before it existed.
+
+Walks users with a linked address and no key in id order and stores each
+address's canonical workchain + hash in batches. Addresses that do not
+parse, and wallets already linked to another account under a different
+address form, are reported and left without a key for manual review.
+
+Usage (from the `backend` directory):
+    python -m app.tools.backfill_wallet_keys --batch-size 5000
+"""
+import argparse
+
+from sqlalchemy import select, update
+
+from app.core import ton_address
+from app.db import database, models
+
+
+def backfill(db, batch_size: int):
+    """Yields (converted, invalid, duplicates) per batch."""
+    user = models.User
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(user.id, user.ton_wallet_address)
+            .where(
+                user.id > last_id,
+                user.ton_wallet_address.is_not(None),
+                user.ton_wallet_key.is_(None),
+            )
+            .order_by(user.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        keys, invalid = {}, []
+        for row in rows:
+            try:
+                keys.setdefault(ton_address.parse(row.ton_wallet_address).key, []).append(row.id)
+            except ValueError:
+                invalid.append((row.id, row.ton_wallet_address))
+        taken = set(db.execute(
+            select(user.ton_wallet_key).where(user.ton_wallet_key.in_(list(keys)))
+        ).scalars())
+        updates, duplicates = [], []
+        for key, user_ids in keys.items():
+            if key in taken or len(user_ids) > 1:
+                duplicates.append((key, user_ids))
+            else:
+                updates.append({"id": user_ids[0], "ton_wallet_key": key})
+        if updates:
+            db.execute(update(user), updates)
+        db.commit()
+        yield len(updates), invalid, duplicates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill canonical TON wallet keys.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    db = database.SessionLocal()
+    converted = 0
+    try:
+        for count, invalid, duplicates in backfill(db, args.batch_size):
+            converted += count
+            for user_id, address in invalid:
+                print(f"user {user_id}: invalid address {address!r}")
+            for key, user_ids in duplicates:
+                address = ton_address.TonAddress.from_key(key).to_raw()
+                print(f"users {user_ids}: wallet {address} is linked more than once")
+    finally:
+        db.close()
+    print(f"Stored {converted:,} wallet keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Throughput benchmark for the escrow indexer.
+
+Generates a JSON Lines fixture of synthetic escrow transactions for a set of
+pending micro-jobs, ingests it through `FileChainSource` into a scratch
+SQLite database and reports sustained events per second.
+
+Usage (from the `backend` directory):
+    python -m app.tools.bench_escrow_indexer --jobs 50000 --batch-size 1000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.database import Base
+from app.services import escrow_chain, escrow_indexer
+
+
+def write_fixture(path: str, job_count: int, seed: int = 42) -> int:
+    """
+    Writes a funding transaction and one outcome (settled, expired or
+    disputed) for every job. Returns the event count.
+    """
+    rng = random.Random(seed)
+    outcomes = [
+        (0.7, "verify_task_completion", escrow_chain.STATE_SETTLED),
+        (0.9, "expire_task", escrow_chain.STATE_EXPIRED),
+        (1.0, "raise_dispute", escrow_chain.STATE_DISPUTED),
+    ]
+    lt = 0
+    with open(path, "w", encoding="utf-8") as fixture:
+        # Interleave jobs in windows of 500, as funding and payouts of
+        # different jobs overlap on chain.
+        for window_start in range(1, job_count + 1, 500):
+            window = range(window_start, min(window_start + 500, job_count + 1))
+            for job_id in window:
+                lt += 1
+                fixture.write(json.dumps({"lt": lt, "task_id": job_id, "op": "deposit_funds", "state": escrow_chain.STATE_ACTIVE}) + "\n")
+            for job_id in window:
+                roll = rng.random()
+                op, state = next((op, state) for limit, op, state in outcomes if roll < limit)
+                lt += 1
+                fixture.write(json.dumps({"lt": lt, "task_id": job_id, "op": op, "state": state}) + "\n")
+    return lt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="escrow-bench-")
+    fixture_path = os.path.join(workdir, "events.jsonl")
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    event_count = write_fixture(fixture_path, args.jobs)
+    with Session() as db:
+        db.add(models.User(id=1, email="bench@ziver.app", hashed_password="-"))
+        db.flush()
+        db.execute(
+            models.MicroJob.__table__.insert(),
+            [
+                {
+                    "id": job_id, "poster_id": 1, "title": "bench", "description": "-",
+                    "ton_payment_amount": 1.0, "status": "pending_funding",
+                    "verification_criteria": "-", "ziver_fee_percentage": 0.05,
+                }
+                for job_id in range(1, args.jobs + 1)
+            ],
+        )
+        db.commit()
+
+    source = escrow_chain.FileChainSource(fixture_path)
+    source.fetch(0, 1)  # Exclude fixture parsing from the timing.
+    started = time.perf_counter()
+    ingested = 0
+    with Session() as db:
+        while True:
+            count = escrow_indexer.run_once(db, source, args.batch_size)
+            ingested += count
+            if count < args.batch_size:
+                break
+        elapsed = time.perf_counter() - started
+        statuses = dict(
+            db.execute(
+                select(models.MicroJob.status, func.count()).group_by(models.MicroJob.status)
+            ).all()
+        )
+        checkpoint = escrow_indexer.get_checkpoint(db)
+
+    print(f"events: {ingested}/{event_count}  batch size: {args.batch_size}")
+    print(f"elapsed: {elapsed:.2f}s  throughput: {ingested / elapsed:,.0f} events/s")
+    print(f"checkpoint lt: {checkpoint}  statuses: {statuses}")
+
+
+if __name__ == "__main__":
+    main()
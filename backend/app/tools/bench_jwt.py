@@ -0,0 +1,119 @@
+"""
+Sign/verify throughput benchmark for the JWT backends.
+
+Issues tokens with the claims `create_access_token` produces and reports
+operations per second for signing, full verification and verification
+answered by the verified-token cache, for every backend and algorithm that
+is available here. EdDSA runs with a throwaway Ed25519 key pair.
+
+Usage (from the `backend` directory):
+    python -m app.tools.bench_jwt --seconds 1
+    python -m app.tools.bench_jwt --backend native --algorithm HS256 --algorithm EdDSA
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from app.core import jwt_backends
+
+ALGORITHMS = ("HS256", "EdDSA")
+
+
+def _ed25519_keys():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    private_key = Ed25519PrivateKey.generate()
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem, public_pem
+
+
+def _claims() -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "sub": "user42@example.com",
+        "exp": now + timedelta(hours=1),
+        "iat": now.timestamp(),
+        "jti": uuid.uuid4().hex,
+    }
+
+
+def _rate(func: Callable[[], object], seconds: float) -> float:
+    """Calls `func` repeatedly for about `seconds` and returns calls per second."""
+    calls, batch = 0, 64
+    started = time.perf_counter()
+    deadline = started + seconds
+    while True:
+        for _ in range(batch):
+            func()
+        calls += batch
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - started)
+
+
+def bench_backend(backend: jwt_backends.JWTBackend, seconds: float) -> Dict[str, float]:
+    """Sign, verify and cached-verify rates for one backend."""
+    claims = _claims()
+    token = backend.encode(claims)
+    backend.decode(token)  # Fail early if the round trip is broken
+    cache = jwt_backends.VerifiedTokenCache(1024)
+
+    def cached_verify():
+        if cache.get(token) is None:
+            cache.put(token, backend.decode(token))
+
+    return {
+        "sign": _rate(lambda: backend.encode(claims), seconds),
+        "verify": _rate(lambda: backend.decode(token), seconds),
+        "verify_cached": _rate(cached_verify, seconds),
+    }
+
+
+def make_backend(name: str, algorithm: str, secret: str) -> Optional[jwt_backends.JWTBackend]:
+    """The backend for `algorithm`, or None if it is unavailable here."""
+    if algorithm == "EdDSA":
+        signing_key, verifying_key = _ed25519_keys()
+    else:
+        signing_key = verifying_key = secret
+    try:
+        return jwt_backends.create_backend(name, algorithm, signing_key, verifying_key)
+    except (RuntimeError, ValueError) as exc:
+        print(f"  skipped {name}/{algorithm}: {exc}")
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the JWT backends.")
+    parser.add_argument("--backend", action="append", choices=list(jwt_backends.BACKENDS),
+                        help="Backend to run (repeatable; default all)")
+    parser.add_argument("--algorithm", action="append",
+                        help=f"Algorithm to run (repeatable; default {', '.join(ALGORITHMS)})")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Duration of each measurement")
+    args = parser.parse_args()
+
+    secret = uuid.uuid4().hex
+    results = []
+    for algorithm in args.algorithm or ALGORITHMS:
+        for name in args.backend or jwt_backends.BACKENDS:
+            backend = make_backend(name, algorithm, secret)
+            if backend is not None:
+                results.append((name, algorithm, bench_backend(backend, args.seconds)))
+
+    print(f"\n{'backend':<8} {'algorithm':<9} {'sign/s':>12} {'verify/s':>12} {'cached/s':>12}")
+    for name, algorithm, rates in results:
+        print(f"{name:<8} {algorithm:<9} {rates['sign']:>12,.0f} "
+              f"{rates['verify']:>12,.0f} {rates['verify_cached']:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Offline sybil (account farm) detection over the referral and wallet graph.
+
+Loads every account and referral once into flat NumPy arrays and links
+accounts by three kinds of evidence:
+
+- referral bursts: accounts referred by the same user and created within
+  `SYBIL_BURST_SECONDS` of each other, together with their referrer;
+- shared handle patterns: the same email, Telegram or Twitter handle once
+  digits, separators and `+tags` are stripped (groups larger than
+  `SYBIL_MAX_KEY_GROUP` are too generic and ignored);
+- the same TON wallet linked in different address forms (bounceable,
+  non-bounceable, raw) by accounts whose canonical `ton_wallet_key` has
+  not been backfilled yet.
+
+Connected components of these links are found with a vectorised union-find
+(hooking plus pointer jumping), so a run stays near-linear in the number of
+accounts and links. Each component of at least `SYBIL_MIN_CLUSTER_SIZE`
+accounts is scored as a noisy-or of the share of its members backed by each
+kind of evidence. Clusters scoring `SYBIL_FLAG_SCORE` or more replace the
+unreviewed clusters in `sybil_clusters`, where reward paths check them.
+
+Usage (from the `backend` directory):
+    python -m app.tools.detect_sybils
+    python -m app.tools.detect_sybils --dry-run --top 20
+
+Requires NumPy (`pip install numpy`), which the API itself does not need.
+"""
+import argparse
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - tool-only dependency
+    sys.exit("Sybil detection requires NumPy: pip install numpy")
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core import ton_address
+from app.core.config import settings
+from app.db import database, locks, models
+from app.services import sybil
+
+# Evidence kinds and how strongly each, on its own, indicates a farm
+EVIDENCE_WEIGHTS = {"referral_burst": 0.6, "shared_handle": 0.4, "shared_wallet": 0.9}
+# Popular referrers get a few sign-ups close together; bursts only count in
+# full from this cluster size on.
+BURST_FULL_WEIGHT_SIZE = 10
+
+_SEPARATORS = re.compile(r"[\d._\-]+")
+MIN_SKELETON_LENGTH = 4
+
+
+def handle_skeleton(handle: Optional[str]) -> Optional[str]:
+    """A handle without case, digits, separators or `+tag`, e.g. farmer_01 -> farmer."""
+    if not handle:
+        return None
+    skeleton = _SEPARATORS.sub("", handle.lower().lstrip("@").split("+", 1)[0])
+    return skeleton if len(skeleton) >= MIN_SKELETON_LENGTH else None
+
+
+def email_skeleton(email: Optional[str]) -> Optional[str]:
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.rpartition("@")
+    skeleton = handle_skeleton(local)
+    return f"{skeleton}@{domain.lower()}" if skeleton else None
+
+
+def wallet_key(address: Optional[str]) -> Optional[bytes]:
+    """Canonical workchain and account hash of a TON address in any form."""
+    if not address:
+        return None
+    try:
+        return ton_address.parse(address).key
+    except ValueError:
+        return None
+
+
+# --------------------------------------------------------------------------
+# Loading
+# --------------------------------------------------------------------------
+
+def load_graph(db: Session) -> Dict[str, np.ndarray]:
+    """Reads accounts and referrals into arrays indexed by account position."""
+    user = models.User
+    ids, created, key_rows = [], [], []
+    rows = db.execute(
+        select(user.id, user.created_at, user.email, user.telegram_handle,
+               user.twitter_handle, user.ton_wallet_address)
+        .order_by(user.id)
+        .execution_options(yield_per=50000)
+    )
+    for position, (user_id, created_at, email, telegram, twitter, wallet) in enumerate(rows):
+        ids.append(user_id)
+        created.append(created_at.timestamp() if created_at else 0.0)
+        telegram, twitter = handle_skeleton(telegram), handle_skeleton(twitter)
+        for kind, key in (
+            ("shared_handle", email_skeleton(email)),
+            ("shared_handle", telegram and "tg:" + telegram),
+            ("shared_handle", twitter and "tw:" + twitter),
+            ("shared_wallet", wallet_key(wallet)),
+        ):
+            if key is not None:
+                key_rows.append((kind, position, hash(key)))
+
+    ids_array = np.asarray(ids, dtype=np.int64)
+    referrals = np.asarray(
+        db.execute(select(models.Referral.referrer_id, models.Referral.referred_id)).all(),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    # Map user ids to positions; ids are sorted by the query
+    referrer = np.searchsorted(ids_array, referrals[:, 0])
+    referred = np.searchsorted(ids_array, referrals[:, 1])
+    return {
+        "ids": ids_array,
+        "created": np.asarray(created, dtype=np.float64),
+        "referrer": referrer,
+        "referred": referred,
+        "handle_keys": _keys(key_rows, "shared_handle"),
+        "wallet_keys": _keys(key_rows, "shared_wallet"),
+    }
+
+
+def _keys(key_rows: List[Tuple[str, int, int]], kind: str) -> np.ndarray:
+    selected = [(position, key) for row_kind, position, key in key_rows if row_kind == kind]
+    return np.asarray(selected, dtype=np.int64).reshape(-1, 2)
+
+
+# --------------------------------------------------------------------------
+# Links and components
+# --------------------------------------------------------------------------
+
+def burst_links(referrer: np.ndarray, referred: np.ndarray, created: np.ndarray,
+                window: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Links between same-referrer accounts created within `window` seconds, and to the referrer."""
+    order = np.lexsort((created[referred], referrer))
+    referrer, referred = referrer[order], referred[order]
+    close = (referrer[1:] == referrer[:-1]) & (
+        created[referred[1:]] - created[referred[:-1]] <= window
+    )
+    a, b = referred[:-1][close], referred[1:][close]
+    # Tie each burst to its referrer as well
+    return np.concatenate([a, referrer[1:][close]]), np.concatenate([b, b])
+
+
+def shared_key_links(keys: np.ndarray, max_group: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Chains accounts sharing a key, skipping groups larger than `max_group`."""
+    if not len(keys):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    keys = keys[np.argsort(keys[:, 1], kind="stable")]
+    _, counts = np.unique(keys[:, 1], return_counts=True)
+    group_size = np.repeat(counts, counts)
+    same = (keys[1:, 1] == keys[:-1, 1]) & (group_size[1:] <= max_group)
+    return keys[:-1, 0][same], keys[1:, 0][same]
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Component label (its smallest member) of each of `n` nodes, given edges
+    a[i]-b[i]. Union-find over whole arrays: every round hooks the larger
+    root of each cross edge under the smaller one, then flattens all paths.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    while True:
+        root_a, root_b = parent[a], parent[b]
+        low, high = np.minimum(root_a, root_b), np.maximum(root_a, root_b)
+        cross = low != high
+        if not cross.any():
+            return parent
+        np.minimum.at(parent, high[cross], low[cross])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def detect(graph: Dict[str, np.ndarray], excluded_ids: np.ndarray) -> List[dict]:
+    """Scored clusters of linked accounts, best first."""
+    n = len(graph["ids"])
+    links = {
+        "referral_burst": burst_links(
+            graph["referrer"], graph["referred"], graph["created"], settings.SYBIL_BURST_SECONDS
+        ),
+        "shared_handle": shared_key_links(graph["handle_keys"], settings.SYBIL_MAX_KEY_GROUP),
+        "shared_wallet": shared_key_links(graph["wallet_keys"], settings.SYBIL_MAX_KEY_GROUP),
+    }
+    excluded = np.isin(graph["ids"], excluded_ids)
+    for kind, (a, b) in links.items():
+        keep = ~(excluded[a] | excluded[b])
+        links[kind] = (a[keep], b[keep])
+
+    a = np.concatenate([pair[0] for pair in links.values()])
+    b = np.concatenate([pair[1] for pair in links.values()])
+    labels = connected_components(n, a, b)
+
+    linked = np.zeros(n, dtype=bool)
+    linked[a] = linked[b] = True
+    sizes = np.bincount(labels[linked], minlength=n)
+    candidates = np.flatnonzero(sizes >= settings.SYBIL_MIN_CLUSTER_SIZE)
+    if not len(candidates):
+        return []
+
+    # Noisy-or over the share of members backed by each kind of evidence
+    keep_probability = np.ones(len(candidates))
+    shares = {}
+    for kind, (ka, kb) in links.items():
+        backed = np.zeros(n, dtype=bool)
+        backed[ka] = backed[kb] = True
+        share = np.bincount(labels[backed], minlength=n)[candidates] / sizes[candidates]
+        shares[kind] = share
+        weight = EVIDENCE_WEIGHTS[kind]
+        if kind == "referral_burst":
+            weight = weight * np.minimum(1.0, sizes[candidates] / BURST_FULL_WEIGHT_SIZE)
+        keep_probability *= 1.0 - weight * share
+    scores = 1.0 - keep_probability
+    flagged = scores >= settings.SYBIL_FLAG_SCORE
+
+    members = np.flatnonzero(linked)
+    members = members[np.argsort(labels[members], kind="stable")]
+    member_labels = labels[members]
+    clusters = []
+    for index in np.flatnonzero(flagged):
+        label = candidates[index]
+        lo, hi = np.searchsorted(member_labels, [label, label + 1])
+        positions = members[lo:hi]
+        created = graph["created"][positions]
+        clusters.append({
+            "score": round(float(scores[index]), 4),
+            "user_ids": graph["ids"][positions].tolist(),
+            "reasons": {
+                **{kind: round(float(share[index]), 4) for kind, share in shares.items()},
+                "created_span_seconds": int(created.max() - created.min()),
+            },
+        })
+    clusters.sort(key=lambda cluster: (-cluster["score"], -len(cluster["user_ids"])))
+    return clusters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Flag clusters of likely farm accounts.")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing clusters")
+    parser.add_argument("--top", type=int, default=10, help="Clusters to print")
+    args = parser.parse_args()
+
+    with locks.try_advisory_lock(sybil.DETECTION_LOCK_NAME) as acquired:
+        if not acquired:
+            sys.exit("Another detection run is in progress.")
+        db = database.SessionLocal()
+        try:
+            started = time.perf_counter()
+            graph = load_graph(db)
+            loaded = time.perf_counter()
+            clusters = detect(graph, np.asarray(sybil.reviewed_user_ids(db), dtype=np.int64))
+            detected = time.perf_counter()
+            print(f"{len(graph['ids']):,} accounts, {len(graph['referrer']):,} referrals "
+                  f"loaded in {loaded - started:.1f}s; {len(clusters):,} clusters "
+                  f"({sum(len(c['user_ids']) for c in clusters):,} accounts) "
+                  f"found in {detected - loaded:.1f}s")
+            for cluster in clusters[:args.top]:
+                print(f"  score {cluster['score']:.2f} size {len(cluster['user_ids']):>5} "
+                      f"{cluster['reasons']}")
+            if not args.dry_run:
+                written = sybil.replace_flagged_clusters(db, clusters)
+                print(f"Wrote {written:,} flagged clusters")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Vectorized ZP economy simulator for tuning the issuance settings.
+
+Models the daily behaviour of a synthetic user population (mining sessions
+and claims, check-ins, upgrades, referrals, task completions) with one NumPy
+array per user attribute, so millions of users simulate in seconds. Mining
+earnings come from `app.services.mining.mined_zp`, upgrade prices from the
+miner upgrade catalog and the rewards from `Settings`, so results follow the
+production rules. Settings can be overridden to compare tunings.
+
+Usage (from the `backend` directory):
+    python -m app.tools.economy_simulator --users 1000000 --days 90
+    python -m app.tools.economy_simulator --set ZP_DAILY_CHECKIN_BONUS=30 --csv supply.csv
+
+Requires NumPy (`pip install numpy`), which the API itself does not need.
+"""
+import argparse
+import csv
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - tool-only dependency
+    sys.exit("The economy simulator requires NumPy: pip install numpy")
+
+from app.core.config import Settings, settings
+from app.services import miner_upgrades, mining
+
+UPGRADE_TYPES = tuple(miner_upgrades.UPGRADE_COLUMNS)  # Same order as the stats below
+
+
+@dataclass
+class Behaviour:
+    """Assumptions about how users behave; tune them alongside the settings."""
+    initial_users: int = 100_000
+    daily_growth: float = 0.02  # New users per day, as a share of current users
+    referred_share: float = 0.6  # Share of new users who arrive through a referral
+    mean_activity: float = 0.45  # Mean probability that a user opens the app on a day
+    mean_opens_per_day: float = 2.0  # Mean app opens (claim + restart) per active day
+    upgrade_propensity: float = 0.3  # Probability an active user tries to buy an upgrade
+    tasks_per_day: int = 3  # Tasks available to a user per day
+    task_completion_rate: float = 0.25
+    mean_task_reward: int = 100
+
+
+def _upgrade_tables():
+    """Cost and value lookup tables indexed by [type, current level]."""
+    catalog = miner_upgrades.get_catalog()
+    max_level = max(track.max_level for track in catalog.values())
+    costs = np.full((len(UPGRADE_TYPES), max_level + 1), np.inf)
+    values = np.zeros((len(UPGRADE_TYPES), max_level + 1))
+    for t, upgrade_type in enumerate(UPGRADE_TYPES):
+        for level in catalog[upgrade_type].levels:
+            costs[t, level.level - 1] = level.cost_zp  # Price of reaching `level`
+            values[t, level.level - 1] = level.value
+    return costs, values
+
+
+def simulate(days: int, behaviour: Behaviour, config: Settings, seed: int = 0) -> List[Dict]:
+    """Runs the simulation and returns one row of supply statistics per day."""
+    rng = np.random.default_rng(seed)
+    capacity = int(behaviour.initial_users * (1 + behaviour.daily_growth) ** days) + 1
+    users = behaviour.initial_users
+
+    # Per-user state, one array each
+    balance = np.zeros(capacity, dtype=np.int64)
+    rate = np.full(capacity, config.INITIAL_MINING_RATE_ZP_PER_HOUR, dtype=np.float64)
+    cap = np.full(capacity, config.INITIAL_MINING_CAPACITY_ZP, dtype=np.float64)
+    cycle = np.full(capacity, config.MINING_CYCLE_HOURS, dtype=np.float64)
+    levels = np.zeros((len(UPGRADE_TYPES), capacity), dtype=np.int64)
+    referrals = np.zeros(capacity, dtype=np.int64)
+    # Heterogeneous habits, fixed per user: activity ~ Beta, opens ~ Poisson(Gamma)
+    activity = rng.beta(
+        2.0, 2.0 * (1 - behaviour.mean_activity) / behaviour.mean_activity, capacity
+    ).astype(np.float32)
+    opens = np.maximum(1, rng.poisson(rng.gamma(2.0, behaviour.mean_opens_per_day / 2.0, capacity)))
+
+    costs, values = _upgrade_tables()
+    stats = (rate, cap, cycle)
+    supply = 0
+    rows = []
+    for day in range(1, days + 1):
+        # New users, some of them referred by existing users below the limit
+        new_users = min(int(users * behaviour.daily_growth), capacity - users)
+        referred = int(new_users * behaviour.referred_share)
+        referral_zp = 0
+        if referred:
+            eligible = np.flatnonzero(referrals[:users] < config.MAX_REFERRALS_PER_USER)
+            if len(eligible):
+                referrers = rng.choice(eligible, size=referred)
+                counts = np.bincount(referrers, minlength=users)
+                granted = np.minimum(counts, config.MAX_REFERRALS_PER_USER - referrals[:users])
+                referrals[:users] += granted
+                balance[:users] += granted * config.REFERRAL_INITIAL_ZP_REWARD
+                referral_zp = int(granted.sum()) * config.REFERRAL_INITIAL_ZP_REWARD
+        users += new_users
+
+        # Only active users change state, so work on their indices
+        active = np.flatnonzero(rng.random(users, dtype=np.float32) < activity[:users])
+        n_active = len(active)
+        user_rate, user_cap, user_cycle = rate[active], cap[active], cycle[active]
+
+        # Mining: each open claims the running session and starts a new one
+        user_opens = opens[active]
+        sessions = np.minimum(user_opens, np.floor(24 / user_cycle))
+        per_session = mining.mined_zp(
+            24 * 3600 / user_opens, user_rate, user_cycle, user_cap, minimum=np.minimum
+        )
+        mined = (sessions * per_session).astype(np.int64)
+
+        # Daily check-in bonus (granted by the first claim or check-in of the day)
+        checkin_zp = n_active * config.ZP_DAILY_CHECKIN_BONUS
+
+        # Tasks
+        task_zp = (
+            rng.binomial(behaviour.tasks_per_day, behaviour.task_completion_rate, n_active)
+            * behaviour.mean_task_reward
+        )
+        user_balance = balance[active] + mined + config.ZP_DAILY_CHECKIN_BONUS + task_zp
+
+        # Upgrades: buy the cheapest next level if affordable
+        next_costs = costs[np.arange(len(UPGRADE_TYPES))[:, None], levels[:, active]]
+        choice = next_costs.argmin(axis=0)
+        price = np.take_along_axis(next_costs, choice[None, :], axis=0)[0]
+        buys = (
+            (rng.random(n_active, dtype=np.float32) < behaviour.upgrade_propensity)
+            & (user_balance >= price)
+        )
+        burned = int(price[buys].sum())
+        user_balance -= np.where(buys, price, 0).astype(np.int64)
+        balance[active] = user_balance
+        for t, stat in enumerate(stats):
+            upgraded = active[buys & (choice == t)]
+            levels[t, upgraded] += 1
+            stat[upgraded] = values[t, levels[t, upgraded] - 1]
+
+        issued = int(mined.sum()) + checkin_zp + int(task_zp.sum()) + referral_zp
+        supply += issued - burned
+        rows.append({
+            "day": day,
+            "users": users,
+            "active_users": n_active,
+            "issued_mining": int(mined.sum()),
+            "issued_checkin": checkin_zp,
+            "issued_tasks": int(task_zp.sum()),
+            "issued_referrals": referral_zp,
+            "burned_upgrades": burned,
+            "circulating_supply": supply,
+            "mean_balance": round(float(balance[:users].mean()), 1),
+        })
+    return rows
+
+
+def _parse_overrides(pairs: List[str]) -> Dict[str, str]:
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        if key not in Settings.model_fields:
+            raise SystemExit(f"Unknown setting: {key}")
+        overrides[key] = value
+    return overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate ZP supply for the current settings.")
+    parser.add_argument("--users", type=int, default=Behaviour.initial_users)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--growth", type=float, default=Behaviour.daily_growth)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        metavar="KEY=VALUE", help="Override a Settings value")
+    parser.add_argument("--csv", help="Write the daily rows to this CSV file")
+    args = parser.parse_args()
+
+    overrides = _parse_overrides(args.overrides)
+    config = Settings.model_validate({**settings.model_dump(), **overrides})
+    behaviour = Behaviour(initial_users=args.users, daily_growth=args.growth)
+
+    started = time.perf_counter()
+    rows = simulate(args.days, behaviour, config, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    header = ("day", "users", "active_users", "issued_mining", "issued_checkin",
+              "issued_tasks", "issued_referrals", "burned_upgrades", "circulating_supply")
+    print(" ".join(f"{name:>18}" for name in header))
+    step = max(1, len(rows) // 15)
+    for row in rows[step - 1::step]:
+        print(" ".join(f"{row[name]:>18,}" for name in header))
+    final = rows[-1]
+    print(f"\n{final['users']:,} users after {args.days} days, "
+          f"supply {final['circulating_supply']:,} ZP, mean balance {final['mean_balance']:,} ZP "
+          f"(simulated in {elapsed:.1f}s)")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as output:
+            writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Grants (or revokes) administrator access, which the `/admin/*` endpoints
+require.
+
+Usage (from the `backend` directory):
+    python -m app.tools.grant_admin alice@example.com
+    python -m app.tools.grant_admin alice@example.com --revoke
+"""
+import argparse
+
+from sqlalchemy import update
+
+from app.db import database, models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Grant administrator access to a user.")
+    parser.add_argument("email", help="Email address of the account")
+    parser.add_argument("--revoke", action="store_true", help="Remove administrator access instead")
+    args = parser.parse_args()
+
+    db = database.SessionLocal()
+    try:
+        updated = db.execute(
+            update(models.User)
+            .where(models.User.email == args.email)
+            .values(is_admin=not args.revoke)
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    if not updated:
+        raise SystemExit(f"No user with email {args.email!r}.")
+    print(f"{args.email} is {'no longer' if args.revoke else 'now'} an administrator")
+
+
+if __name__ == "__main__":
+    main()
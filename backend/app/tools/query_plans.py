@@ -0,0 +1,529 @@
+"""
+Query-plan regression suite with an index advisor.
+
+Seeds a scratch database with a realistic amount of data, runs the service
+layer through a scenario that exercises its queries, captures every
+SELECT/UPDATE/DELETE it issues and collects their `EXPLAIN` plans. Full
+table scans of tables above a row threshold are flagged together with a
+proposed index, derived from the statement's predicates on that table.
+
+Each query's table accesses are compared with a stored snapshot, so a
+schema or query change that makes a previously indexed access scan the
+table fails the suite. Accept intended changes with `--update`.
+
+Usage (from the `backend` directory):
+    python -m app.tools.query_plans              # compare with the snapshot
+    python -m app.tools.query_plans --update     # rewrite the snapshot
+    python -m app.tools.query_plans --database-url postgresql://...  # empty scratch DB
+
+Exits with status 1 when a regression or a new flagged scan is found.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, func, insert, inspect, select, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.types import DateTime
+
+from app.core import ton_address
+from app.core.config import settings
+from app.db import models
+from app.db.database import Base
+from app.schemas import microjob as microjob_schemas
+from app.services import (
+    analytics,
+    dashboard,
+    escrow_chain,
+    escrow_indexer,
+    expiration,
+    microjobs,
+    mining_reminders,
+    payouts,
+    referrals,
+    task_completions,
+    tasks,
+    token_revocation,
+    wallets,
+)
+
+SNAPSHOT_DIR = Path(__file__).with_name("query_plan_snapshots")
+
+# Statements worth explaining; inserts and DDL have no interesting plans.
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+
+class _AwareSQLiteDateTime(sqlite.DATETIME):
+    """Reads SQLite datetimes as UTC-aware, as PostgreSQL returns them."""
+
+    def result_processor(self, dialect, coltype):
+        process = super().result_processor(dialect, coltype)
+
+        def aware(value):
+            value = process(value) if process else value
+            if value is not None and value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value
+        return aware
+
+
+def make_engine(url: str):
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        # SQLite drops the offset; the services compare with aware datetimes.
+        engine.dialect.colspecs = {**engine.dialect.colspecs, DateTime: _AwareSQLiteDateTime}
+    return engine
+
+
+# --------------------------------------------------------------------------
+# Seed data
+# --------------------------------------------------------------------------
+
+def seed(db: Session, scale: float = 1.0, seed_value: int = 7) -> None:
+    """Fills an empty database with deterministic synthetic data."""
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    n_users, n_tasks = int(5000 * scale), int(300 * scale)
+    n_jobs, n_completions = int(3000 * scale), int(30000 * scale)
+
+    db.execute(insert(models.User), [
+        {
+            "id": i,
+            "email": f"user{i}@example.com",
+            "hashed_password": "x",
+            "zp_balance": rng.randint(0, 5000),
+            "ton_wallet_address": f"EQwallet{i}" if i % 3 else None,
+            "mining_started_at": now - timedelta(minutes=rng.randint(0, 300)) if i % 4 == 0 else None,
+        }
+        for i in range(1, n_users + 1)
+    ])
+    db.execute(insert(models.Task), [
+        {
+            "id": i,
+            "title": f"Task {i}",
+            "description": "d",
+            "zp_reward": 10,
+            "type": "sponsored" if i % 2 else "in_app",
+            "is_active": i % 5 != 0,
+            "expiration_date": now + timedelta(days=rng.randint(-90, 30)) if i % 2 else None,
+        }
+        for i in range(1, n_tasks + 1)
+    ])
+    pairs = set()
+    while len(pairs) < n_completions:
+        pairs.add((rng.randint(1, n_users), rng.randint(1, n_tasks)))
+    db.execute(insert(models.UserTaskCompletion), [
+        {"user_id": user_id, "task_id": task_id, "completed_at": now - timedelta(days=rng.randint(0, 120))}
+        for user_id, task_id in sorted(pairs)
+    ])
+    db.execute(insert(models.Referral), [
+        {"referrer_id": rng.randint(1, n_users // 10), "referred_id": i, "status": "completed"}
+        for i in range(n_users // 10 + 1, n_users // 10 + 1 + n_users // 2)
+    ])
+    statuses = ["pending_funding", "active", "active", "active", "completed", "expired"]
+    db.execute(insert(models.MicroJob), [
+        {
+            "id": i,
+            "poster_id": rng.randint(1, n_users),
+            "title": f"Job {i}",
+            "description": "d",
+            "ton_payment_amount": 1.0,
+            "status": rng.choice(statuses),
+            "expiration_date": now + timedelta(days=rng.randint(-10, 20)),
+            "verification_criteria": "v",
+        }
+        for i in range(1, n_jobs + 1)
+    ])
+    submissions = set()
+    while len(submissions) < n_jobs * 3:
+        submissions.add((rng.randint(1, n_jobs), rng.randint(1, n_users)))
+    db.execute(insert(models.MicroJobSubmission), [
+        {"microjob_id": job_id, "worker_id": worker_id, "submission_details": "proof"}
+        for job_id, worker_id in sorted(submissions)
+    ])
+    db.execute(insert(models.PayoutOutbox), [
+        {
+            "submission_id": len(submissions) - i + 1,
+            "microjob_id": rng.randint(1, n_jobs),
+            "worker_id": rng.randint(1, n_users),
+            "performer_address": "EQ",
+            "status": rng.choice(["sent", "sent", "sent", "pending", "failed"]),
+            "next_attempt_at": now - timedelta(minutes=rng.randint(-60, 60)),
+        }
+        for i in range(1, n_jobs + 1)
+    ])
+    db.execute(insert(models.RevokedToken), [
+        {
+            "jti": f"{i:032x}",
+            "user_id": rng.randint(1, n_users),
+            "expires_at": now + timedelta(minutes=rng.randint(-120, 60)),
+        }
+        for i in range(1, n_users // 5 + 1)
+    ])
+    db.commit()
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+
+# --------------------------------------------------------------------------
+# Scenario: one step per service query path
+# --------------------------------------------------------------------------
+
+def _first_id(db: Session, column, *conditions) -> int:
+    return db.execute(select(column).where(*conditions).order_by(column).limit(1)).scalar()
+
+
+def prepare(db: Session) -> Dict[str, int]:
+    """Picks the rows the scenario acts on. Runs before queries are captured."""
+    now = datetime.now(timezone.utc)
+    return {
+        "job_id": _first_id(db, models.MicroJob.id, models.MicroJob.status == "active",
+                            models.MicroJob.expiration_date > now),
+        "submission_id": _first_id(db, models.MicroJobSubmission.id,
+                                   models.MicroJobSubmission.status == "submitted"),
+        "task_id": _first_id(db, models.Task.id, models.Task.is_active.is_(True),
+                             models.Task.expiration_date.is_(None)),
+        "revoked_id": _first_id(db, models.RevokedToken.id, models.RevokedToken.expires_at > now),
+    }
+
+
+def scenario(ids: Dict[str, int]) -> List[Tuple[str, Callable[[Session], object]]]:
+    """The service calls whose queries are checked, in execution order."""
+    now = datetime.now(timezone.utc)
+
+    def user(db: Session, user_id: int = 42) -> models.User:
+        return db.get(models.User, user_id)
+
+    def submit(db: Session):
+        return microjobs.submit_microjob_completion(
+            db, user(db, 7),
+            microjob_schemas.MicroJobSubmissionCreate(
+                microjob_id=ids["job_id"], submission_details="p"
+            ),
+        )
+
+    def approve(db: Session):
+        submission = db.get(models.MicroJobSubmission, ids["submission_id"])
+        return microjobs.approve_microjob_completion(
+            db, submission.microjob.poster, ids["submission_id"]
+        )
+
+    def complete(db: Session):
+        return tasks.complete_task(db, user(db, 4999), ids["task_id"])
+
+    def link_wallet(db: Session):
+        address = "0:" + "ab" * 32
+        return wallets.link_wallet(db, user(db), address, ton_address.parse(address))
+
+    def indexer(db: Session):
+        events = [
+            escrow_chain.EscrowEvent(lt=i, task_id=i, op="deposit", state=escrow_chain.STATE_ACTIVE)
+            for i in range(1, 200)
+        ]
+        escrow_indexer.apply_events(db, events)
+        db.rollback()
+
+    return [
+        ("auth.user_by_email", lambda db: db.query(models.User)
+         .filter(models.User.email == "user42@example.com").first()),
+        ("auth.user_by_id", lambda db: user(db)),
+        ("tasks.available", lambda db: tasks.get_available_tasks(db, 42)),
+        ("tasks.available_version", lambda db: tasks.get_available_tasks_version(db, 42)),
+        ("tasks.complete", complete),
+        ("task_completions.has_completed", lambda db: task_completions.has_completed(db, 42, 3)),
+        ("microjobs.feed", lambda db: microjobs.get_microjobs(db)),
+        ("microjobs.feed_version", microjobs.get_public_feed_version),
+        ("microjobs.by_poster", lambda db: microjobs.get_microjobs(db, user_id=42)),
+        ("microjobs.submit", submit),
+        ("microjobs.approve", approve),
+        ("referrals.list", lambda db: referrals.get_referred_users(db, 42)),
+        ("referrals.track", lambda db: referrals.track_referral(db, 42, "user4999@example.com")),
+        ("dashboard", lambda db: dashboard.get_dashboard(db, user(db))),
+        ("expiration.sweep", lambda db: expiration.sweep_expired(db, now)),
+        ("payouts.claim_due", lambda db: payouts.claim_due(db, 100)),
+        ("mining_reminders.rebuild", mining_reminders.rebuild_from_db),
+        ("escrow_indexer.apply_events", indexer),
+        ("task_completions.archive", lambda db: task_completions.archive_batch(
+            db, now - timedelta(days=30), 1000)),
+        ("analytics.daily_stats", lambda db: analytics.get_daily_stats(
+            db, now.date() - timedelta(days=29), now.date())),
+        ("analytics.backfill_chunk", lambda db: analytics.backfill_chunk(
+            db, now.date() - timedelta(days=7), now.date())),
+        ("token_revocation.refresh", token_revocation.get_filter),
+        ("token_revocation.is_revoked", lambda db: token_revocation.is_revoked(
+            db, f"{ids['revoked_id']:032x}")),
+        ("token_revocation.purge", token_revocation.purge_expired),
+        ("wallets.link", link_wallet),
+    ]
+
+
+def capture(engine, session_factory) -> List[Dict]:
+    """Runs the scenario and returns the distinct explainable statements issued."""
+    # Every step issues its own queries; restored so importers are unaffected
+    ttl_seconds = settings.SINGLE_FLIGHT_TTL_SECONDS
+    settings.SINGLE_FLIGHT_TTL_SECONDS = 0
+    try:
+        return _capture(engine, session_factory)
+    finally:
+        settings.SINGLE_FLIGHT_TTL_SECONDS = ttl_seconds
+
+
+def _capture(engine, session_factory) -> List[Dict]:
+    with session_factory() as db:
+        ids = prepare(db)
+    captured: Dict[str, Dict] = {}
+    current_step = [""]
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not EXPLAINABLE.match(statement):
+            return
+        normalized = normalize(statement)
+        key = hashlib.sha1(normalized.encode()).hexdigest()[:12]
+        captured.setdefault(key, {
+            "key": key, "step": current_step[0], "sql": normalized,
+            "statement": statement, "parameters": parameters,
+        })
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        for name, step in scenario(ids):
+            current_step[0] = name
+            db = session_factory()
+            try:
+                step(db)
+            except HTTPException as exc:
+                print(f"  note: {name} raised {exc.status_code}: {exc.detail}")
+                db.rollback()
+            except Exception as exc:  # pylint: disable=broad-except
+                # Queries issued before the failure are still checked.
+                print(f"  note: {name} failed: {exc!r}")
+                db.rollback()
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return list(captured.values())
+
+
+def normalize(statement: str) -> str:
+    """Collapses whitespace and expanded IN lists so a query's text is stable."""
+    statement = " ".join(statement.split())
+    statement = re.sub(r"\((?:\?|%\(\w+\)s|%s)(?:, (?:\?|%\(\w+\)s|%s))+\)", "(?...)", statement)
+    return re.sub(r"%\(\w+?_\d+\)s", "?", statement)
+
+
+# --------------------------------------------------------------------------
+# Plans
+# --------------------------------------------------------------------------
+
+def _aliases(sql: str) -> Dict[str, str]:
+    return {
+        alias: table
+        for table, alias in re.findall(r"\b(?:FROM|JOIN) (\w+) AS (\w+)\b", sql)
+    }
+
+
+def explain(conn, query: Dict) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Returns the raw plan lines and the access method per table:
+    'index:<name>', 'pk', 'full-index:<name>' or 'scan'.
+    """
+    aliases = _aliases(query["statement"])
+    access: Dict[str, str] = {}
+
+    def record(table: str, method: str) -> None:
+        table = aliases.get(table, table)
+        # Keep the worst access if a table is visited several times.
+        if access.get(table) != "scan":
+            access[table] = method
+
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + query["statement"], query["parameters"]
+        ).scalar()
+        lines = []
+
+        def walk(node, depth=0):
+            node_type = node["Node Type"]
+            relation = node.get("Alias") or node.get("Relation Name")
+            lines.append("  " * depth + f"{node_type} {relation or ''} {node.get('Index Name', '')}".rstrip())
+            if node_type == "Seq Scan":
+                record(relation, "scan")
+            elif node_type in ("Index Scan", "Index Only Scan"):
+                record(relation, f"index:{node['Index Name']}")
+            elif node_type == "Bitmap Heap Scan":
+                index_names = [child.get("Index Name") for child in node.get("Plans", [])]
+                record(relation, "index:" + "+".join(name for name in index_names if name))
+            for child in node.get("Plans", []):
+                walk(child, depth + 1)
+
+        walk(plan[0]["Plan"])
+        return lines, access
+
+    rows = conn.exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + query["statement"], query["parameters"]
+    ).all()
+    lines = [row[-1] for row in rows]
+    for line in lines:
+        match = re.match(
+            r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (COVERING INDEX|INDEX|INTEGER PRIMARY KEY|PRIMARY KEY)(?: (\w+))?)?",
+            line,
+        )
+        if not match:
+            continue
+        operation, table, using, index = match.groups()
+        if table == "CONSTANT":  # SCAN CONSTANT ROW
+            continue
+        if using and "PRIMARY KEY" in using:
+            record(table, "pk")
+        elif using:
+            record(table, f"{'index' if operation == 'SEARCH' else 'full-index'}:{index}")
+        else:
+            record(table, "scan" if operation == "SCAN" else "pk")
+    return lines, access
+
+
+def _is_scan(method: str) -> bool:
+    return method == "scan" or method.startswith("full-index")
+
+
+def propose_index(sql: str, table: str, existing: Dict[str, List[List[str]]]) -> Optional[str]:
+    """
+    Proposes an index on the table's columns used in the statement's
+    predicates: equality columns first, then one range column.
+    """
+    where = re.split(r"\bWHERE\b", sql, maxsplit=1)
+    if len(where) < 2:
+        return None
+    names = {table} | {alias for alias, name in _aliases(sql).items() if name == table}
+    equality, ranges = [], []
+    for owner, column, operator in re.findall(
+        r"\b(\w+)\.(\w+)\s*(=|IN\b|IS\b|<=|>=|<|>|!=)", where[1]
+    ):
+        if owner not in names:
+            continue
+        target = equality if operator in ("=", "IN", "IS") else ranges
+        if column not in equality and column not in ranges:
+            target.append(column)
+    columns = equality + ranges[:1]
+    if not columns:
+        return None
+    for index_columns in existing.get(table, []):
+        if index_columns[:len(columns)] == columns:
+            return f"existing index on ({', '.join(index_columns)}) is not used"
+    return f"CREATE INDEX ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+# --------------------------------------------------------------------------
+# Suite
+# --------------------------------------------------------------------------
+
+def run(engine, snapshot_path: Path, threshold: int, update: bool) -> int:
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    queries = capture(engine, session_factory)
+
+    inspector = inspect(engine)
+    existing_indexes = {
+        table: [index["column_names"] for index in inspector.get_indexes(table)]
+        + [constraint["column_names"] for constraint in inspector.get_unique_constraints(table)]
+        for table in inspector.get_table_names()
+    }
+    with engine.connect() as conn:
+        row_counts = {
+            table: conn.execute(select(func.count()).select_from(text(table))).scalar()
+            for table in existing_indexes
+        }
+        results = {}
+        for query in queries:
+            lines, access = explain(conn, query)
+            results[query["key"]] = {
+                "step": query["step"], "sql": query["sql"], "plan": lines, "access": access,
+            }
+
+    if not snapshot_path.exists() and not update:
+        print(f"No snapshot at {snapshot_path}; run with --update to create it.")
+    snapshot = json.loads(snapshot_path.read_text()) if snapshot_path.exists() else {}
+    failures, flagged = [], []
+    for key, result in results.items():
+        previous = snapshot.get(key, {}).get("access", {})
+        for table, method in result["access"].items():
+            accepted = previous.get(table)
+            if _is_scan(method) and accepted and not _is_scan(accepted):
+                # Lost an index, whatever the table size
+                failures.append(f"{result['step']}: {table} now {method}, previously {accepted}")
+                continue
+            if method != "scan" or row_counts.get(table, 0) < threshold:
+                continue
+            proposal = propose_index(result["sql"], table, existing_indexes)
+            flagged.append((result["step"], table, row_counts[table], proposal))
+            if accepted != "scan":
+                failures.append(
+                    f"{result['step']}: full scan of {table} ({row_counts[table]} rows), new query"
+                )
+    missing = [value["step"] + ": " + value["sql"][:80] for key, value in snapshot.items() if key not in results]
+
+    print(f"\n{len(results)} distinct queries explained ({engine.dialect.name}).")
+    if flagged:
+        print(f"\nFull scans of tables with >= {threshold} rows:")
+        for step, table, rows, proposal in flagged:
+            print(f"  {step}: {table} ({rows} rows)\n      -> {proposal or 'no predicate to index'}")
+    if missing:
+        print("\nSnapshot queries no longer issued (run --update if intended):")
+        for line in missing:
+            print("  " + line)
+
+    if update:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        snapshot_path.write_text(json.dumps(dict(sorted(results.items())), indent=2, sort_keys=True) + "\n")
+        print(f"\nSnapshot written to {snapshot_path}")
+        return 0
+    if failures:
+        print("\nPlan regressions:")
+        for failure in failures:
+            print("  " + failure)
+        return 1
+    print("\nNo plan regressions.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check service query plans against a snapshot.")
+    parser.add_argument("--database-url", help="Empty scratch database (default: temporary SQLite)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Seed data multiplier")
+    parser.add_argument("--threshold", type=int, default=1000, help="Rows above which a scan is flagged")
+    parser.add_argument("--snapshot", type=Path, help="Snapshot file (default: per dialect)")
+    parser.add_argument("--update", action="store_true", help="Rewrite the snapshot")
+    args = parser.parse_args()
+
+    scratch = None
+    url = args.database_url
+    if not url:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        scratch.close()
+        url = f"sqlite:///{scratch.name}"
+    engine = make_engine(url)
+    try:
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            seed(db, args.scale)
+        snapshot_path = args.snapshot or SNAPSHOT_DIR / f"{engine.dialect.name}.json"
+        status = run(engine, snapshot_path, args.threshold, args.update)
+    finally:
+        engine.dispose()
+        if scratch:
+            os.unlink(scratch.name)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Brings an existing database up to the current models.
+
+The application only runs `create_all` at startup, which creates missing
+tables but never changes existing ones. This tool also adds the columns,
+indexes and unique constraints the models gained since a table was created
+(e.g. `users.is_admin` and `users.ton_wallet_key`), so `User` queries keep
+working after a deploy. It never drops columns; the only change to an
+existing column is dropping NOT NULL where the model now allows NULL (e.g.
+`payout_outbox.performer_address`).
+
+Some changes cannot be applied automatically and are reported instead:
+
+- columns that are NOT NULL without a server default, which cannot be
+  added to a table with rows;
+- NOT NULL to drop on SQLite, which cannot alter columns;
+- unique indexes over rows that are already duplicated (e.g. a user who
+  completed a task twice before `uq_user_task_completions_user_task`).
+  The duplicates are listed with a query that removes them, keeping the
+  oldest row; run it after checking them, then run the tool again.
+
+The tool exits with status 1 while such manual steps remain.
+
+Usage (from the `backend` directory):
+    python -m app.tools.upgrade_schema --dry-run   # print the DDL only
+    python -m app.tools.upgrade_schema
+"""
+import argparse
+from typing import List
+
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app.db import models  # noqa: F401  (registers the tables)
+from app.db.database import Base, engine
+
+# Duplicated values listed per unique index that cannot be created
+DUPLICATES_SHOWN = 10
+
+
+def plan(conn, manual: List[str]) -> List[str]:
+    """
+    DDL adding what the existing tables lack, in execution order. Changes
+    that need a manual step are described in `manual` instead.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # Created by create_all
+        columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+        names = {index["name"] for index in inspector.get_indexes(table.name)}
+        names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+
+        for column in table.columns:
+            if column.name in columns:
+                if column.nullable and not columns[column.name]["nullable"]:
+                    statements.extend(_drop_not_null(conn, table, column, manual))
+                continue
+            if not column.nullable and column.server_default is None:
+                manual.append(f"{table.name}.{column.name}: NOT NULL without a server default; add it manually")
+                continue
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            statements.append(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            if column.unique:
+                statements.extend(
+                    _unique_index(conn, f"uq_{table.name}_{column.name}", table, [column], columns, manual)
+                )
+
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in names:
+                continue
+            if index.unique:
+                statements.extend(_unique_index(conn, index.name, table, index.columns, columns, manual))
+            else:
+                statements.append(str(CreateIndex(index).compile(dialect=conn.dialect)))
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in names:
+                # A unique index enforces the same rule and works on every dialect
+                statements.extend(
+                    _unique_index(conn, constraint.name, table, constraint.columns, columns, manual)
+                )
+    return statements
+
+
+def _drop_not_null(conn, table, column, manual: List[str]) -> List[str]:
+    if conn.dialect.name == "sqlite":
+        manual.append(f"{table.name}.{column.name}: drop NOT NULL manually (SQLite cannot alter columns)")
+        return []
+    quote = conn.dialect.identifier_preparer.quote
+    return [f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} DROP NOT NULL"]
+
+
+def _unique_index(conn, name: str, table, columns, existing_columns, manual: List[str]) -> List[str]:
+    """The index DDL, or nothing (with a report) if existing rows violate it."""
+    quote = conn.dialect.identifier_preparer.quote
+    column_list = ", ".join(quote(column.name) for column in columns)
+    statement = f"CREATE UNIQUE INDEX {quote(name)} ON {quote(table.name)} ({column_list})"
+    if not all(column.name in existing_columns for column in columns):
+        return [statement]  # Columns added by this run hold no values yet
+
+    # NULLs never conflict in a unique index
+    not_null = " AND ".join(f"{quote(column.name)} IS NOT NULL" for column in columns)
+    duplicates = conn.execute(text(
+        f"SELECT {column_list}, COUNT(*) FROM {quote(table.name)} WHERE {not_null} "
+        f"GROUP BY {column_list} HAVING COUNT(*) > 1"
+    )).all()
+    if not duplicates:
+        return [statement]
+    manual.append(_describe_duplicates(name, table, columns, duplicates, not_null))
+    return []
+
+
+def _describe_duplicates(name: str, table, columns, duplicates, not_null: str) -> str:
+    column_names = ", ".join(column.name for column in columns)
+    lines = [f"{name}: not created, {len(duplicates)} ({column_names}) values of {table.name} are duplicated:"]
+    lines += [f"    {tuple(values)}: {count} rows" for *values, count in duplicates[:DUPLICATES_SHOWN]]
+    if len(duplicates) > DUPLICATES_SHOWN:
+        lines.append(f"    ... and {len(duplicates) - DUPLICATES_SHOWN} more")
+    if "id" in table.columns:
+        lines += [
+            "  Keep the oldest row of each with:",
+            f"    DELETE FROM {table.name} WHERE {not_null} AND id NOT IN "
+            f"(SELECT MIN(id) FROM {table.name} GROUP BY {column_names});",
+        ]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add missing columns and indexes to an existing database.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the DDL without running it")
+    args = parser.parse_args()
+
+    if not args.dry_run:
+        Base.metadata.create_all(bind=engine)
+    manual: List[str] = []
+    with engine.begin() as conn:
+        statements = plan(conn, manual)
+        for statement in statements:
+            print(statement.strip() + ";")
+            if not args.dry_run:
+                conn.exec_driver_sql(statement)
+    if manual:
+        # A non-zero exit stops deploy scripts until the steps are done
+        raise SystemExit("Manual steps required before the schema is up to date:\n" + "\n".join(manual))
+    if not statements:
+        print("Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Shared fixtures. The tests run against a throwaway SQLite database, so the
+settings are pointed at it before the application is imported.
+
+Run from the `backend` directory:
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+TEST_DATABASE = Path(tempfile.gettempdir()) / "ziver-backend-tests.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DATABASE}")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db import database, models  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables."""
+    database.Base.metadata.drop_all(bind=database.engine)
+    database.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """Creates and commits a user."""
+    def make(email: str, **fields) -> models.User:
+        user = models.User(email=email, hashed_password="not-a-hash", **fields)
+        db.add(user)
+        db.commit()
+        return user
+    return make
@@ -0,0 +1,113 @@
+"""Escrow indexer: status transitions and checkpoint resume."""
+import json
+
+import pytest
+
+from app.db import models
+from app.services import escrow_chain, escrow_indexer
+
+FUNDED = escrow_chain.STATE_ACTIVE
+SETTLED = escrow_chain.STATE_SETTLED
+EXPIRED = escrow_chain.STATE_EXPIRED
+REFUNDED = escrow_chain.STATE_REFUNDED
+
+
+@pytest.fixture
+def jobs(db, make_user):
+    """Creates micro-jobs with the given statuses; returns their ids."""
+    poster = make_user("poster@example.com")
+
+    def make(*statuses: str):
+        created = [
+            models.MicroJob(
+                poster_id=poster.id,
+                title=f"Job {index}",
+                description="Test job",
+                ton_payment_amount=1.0,
+                verification_criteria="Screenshot",
+                status=job_status,
+            )
+            for index, job_status in enumerate(statuses)
+        ]
+        db.add_all(created)
+        db.commit()
+        return [job.id for job in created]
+    return make
+
+
+def write_fixture(path, events):
+    path.write_text("".join(json.dumps(event) + "\n" for event in events), encoding="utf-8")
+    return escrow_chain.FileChainSource(path)
+
+
+def statuses(db, ids):
+    db.expire_all()
+    return [db.get(models.MicroJob, job_id).status for job_id in ids]
+
+
+def test_applies_transitions_in_logical_time_order(db, jobs, tmp_path):
+    funded, expired = jobs("pending_funding", "pending_funding")
+    # Lines out of order on purpose: the source sorts them by lt
+    source = write_fixture(tmp_path / "events.jsonl", [
+        {"lt": 30, "task_id": funded, "op": "verify_task_completion", "state": SETTLED},
+        {"lt": 10, "task_id": funded, "op": "deposit_funds", "state": FUNDED},
+        {"lt": 20, "task_id": expired, "op": "expire_task", "state": EXPIRED},
+        {"lt": 40, "task_id": expired, "op": "refund", "state": REFUNDED},
+    ])
+
+    assert escrow_indexer.run_once(db, source, batch_size=100) == 4
+    assert statuses(db, [funded, expired]) == ["completed", "refunded"]
+    assert escrow_indexer.get_checkpoint(db) == 40
+
+
+def test_ignores_disallowed_and_unknown_transitions(db, jobs, tmp_path):
+    unfunded, done = jobs("pending_funding", "completed")
+    source = write_fixture(tmp_path / "events.jsonl", [
+        # Settling needs an active job
+        {"lt": 1, "task_id": unfunded, "op": "verify_task_completion", "state": SETTLED},
+        # A stale funding event must not reopen a completed job
+        {"lt": 2, "task_id": done, "op": "deposit_funds", "state": FUNDED},
+        # Jobs the backend does not know are skipped
+        {"lt": 3, "task_id": 999, "op": "deposit_funds", "state": FUNDED},
+    ])
+
+    assert escrow_indexer.run_once(db, source, batch_size=100) == 3
+    assert statuses(db, [unfunded, done]) == ["pending_funding", "completed"]
+    assert escrow_indexer.get_checkpoint(db) == 3
+
+
+def test_resumes_from_checkpoint_without_rescanning(db, jobs, tmp_path):
+    first, second, third = jobs("pending_funding", "pending_funding", "pending_funding")
+    path = tmp_path / "events.jsonl"
+    events = [
+        {"lt": 100, "task_id": first, "op": "deposit_funds", "state": FUNDED},
+        {"lt": 200, "task_id": second, "op": "deposit_funds", "state": FUNDED},
+        {"lt": 300, "task_id": third, "op": "deposit_funds", "state": FUNDED},
+    ]
+
+    assert escrow_indexer.run_once(db, write_fixture(path, events), batch_size=2) == 2
+    assert escrow_indexer.get_checkpoint(db) == 200
+    assert statuses(db, [first, second, third]) == ["active", "active", "pending_funding"]
+
+    # An event already applied must not be replayed after a restart (a fresh
+    # source over the same file), even if the job changed since.
+    db.get(models.MicroJob, first).status = "pending_funding"
+    db.commit()
+    assert escrow_indexer.run_once(db, write_fixture(path, events), batch_size=2) == 1
+    assert statuses(db, [first, second, third]) == ["pending_funding", "active", "active"]
+    assert escrow_indexer.get_checkpoint(db) == 300
+
+    assert escrow_indexer.run_once(db, write_fixture(path, events), batch_size=2) == 0
+
+
+def test_run_indexer_drains_the_source(db, jobs, tmp_path, monkeypatch):
+    ids = jobs(*["pending_funding"] * 5)
+    source = write_fixture(tmp_path / "events.jsonl", [
+        {"lt": lt, "task_id": job_id, "op": "deposit_funds", "state": FUNDED}
+        for lt, job_id in enumerate(ids, start=1)
+    ])
+    monkeypatch.setattr(escrow_indexer.settings, "ESCROW_INDEXER_BATCH_SIZE", 2)
+
+    assert escrow_indexer.run_indexer(source) == 5
+    assert statuses(db, ids) == ["active"] * 5
+    assert escrow_indexer.run_indexer(source) == 0
@@ -0,0 +1,157 @@
+"""Payout outbox: claiming, retry backoff and duplicate sends, against the simulator."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.db import models
+from app.services import escrow_chain, payouts
+
+POSTER_WALLET = "EQ-poster-wallet"
+
+
+@pytest.fixture
+def client():
+    """A simulated contract sending from the poster's wallet."""
+    return escrow_chain.SimulatedEscrowClient(seed=1, sender_address=POSTER_WALLET)
+
+
+@pytest.fixture
+def make_intent(db, make_user, client):
+    """Approves a submission by a new worker and returns its payout intent."""
+    poster = make_user("poster@example.com", ton_wallet_address=POSTER_WALLET)
+    job = models.MicroJob(
+        poster_id=poster.id,
+        title="Follow us",
+        description="Test job",
+        ton_payment_amount=1.0,
+        verification_criteria="Screenshot",
+        status="active",
+    )
+    db.add(job)
+    db.commit()
+    client.register_task(job.id, POSTER_WALLET)
+
+    def make(email: str, wallet=None) -> models.PayoutOutbox:
+        worker = make_user(email, ton_wallet_address=wallet)
+        submission = models.MicroJobSubmission(
+            microjob_id=job.id, worker_id=worker.id, submission_details="done", status="approved"
+        )
+        db.add(submission)
+        db.flush()
+        intent = payouts.enqueue_payout(db, submission)
+        db.commit()
+        return intent
+    return make
+
+
+def reload(db, intent_id) -> models.PayoutOutbox:
+    db.expire_all()
+    return db.get(models.PayoutOutbox, intent_id)
+
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def make_due(db, intent_id) -> None:
+    db.execute(
+        update(models.PayoutOutbox)
+        .where(models.PayoutOutbox.id == intent_id)
+        .values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    db.commit()
+
+
+def test_sends_due_payouts(db, make_intent, client):
+    first = make_intent("w1@example.com", wallet="EQ-w1").id
+    second = make_intent("w2@example.com", wallet="EQ-w2").id
+
+    assert payouts.dispatch_once(db, client) == 2
+
+    for intent_id in (first, second):
+        intent = reload(db, intent_id)
+        assert (intent.status, intent.attempts) == ("sent", 1)
+        assert intent.tx_hash
+    assert [[m.performer_address for m in batch] for batch in client.batches] == [["EQ-w1", "EQ-w2"]]
+    assert payouts.dispatch_once(db, client) == 0
+
+
+def test_claim_is_exclusive_until_the_claim_times_out(db, make_intent, monkeypatch):
+    intent_id = make_intent("w1@example.com", wallet="EQ-w1").id
+
+    assert [intent.id for intent in payouts.claim_due(db, 10)] == [intent_id]
+    assert reload(db, intent_id).status == "sending"
+    assert payouts.claim_due(db, 10) == []
+
+    # The dispatcher that claimed it died: it is claimed again after the timeout
+    monkeypatch.setattr(payouts.settings, "PAYOUT_CLAIM_TIMEOUT_SECONDS", 0)
+    assert [intent.id for intent in payouts.claim_due(db, 10)] == [intent_id]
+
+
+def test_waits_for_a_wallet(db, make_intent, client):
+    intent = make_intent("w1@example.com")
+    assert intent.status == "awaiting_wallet"
+    assert payouts.dispatch_once(db, client) == 0
+
+    worker = db.get(models.User, intent.worker_id)
+    worker.ton_wallet_address = "EQ-w1"
+    assert payouts.release_awaiting_wallet(db, worker) == 1
+    db.commit()
+
+    assert payouts.dispatch_once(db, client) == 1
+    assert reload(db, intent.id).status == "sent"
+
+
+def test_failures_back_off_then_fail_permanently(db, make_intent, monkeypatch):
+    monkeypatch.setattr(payouts.settings, "PAYOUT_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(payouts.settings, "PAYOUT_RETRY_BASE_SECONDS", 10)
+    failing = escrow_chain.SimulatedEscrowClient(failure_rate=1.0, sender_address=POSTER_WALLET)
+    intent_id = make_intent("w1@example.com", wallet="EQ-w1").id
+
+    for attempts, ceiling in ((1, 10), (2, 20)):
+        before = datetime.now(timezone.utc)
+        assert payouts.dispatch_once(db, failing) == 1
+        intent = reload(db, intent_id)
+        assert (intent.status, intent.attempts) == ("pending", attempts)
+        assert intent.last_error == "simulated network failure"
+        # Full jitter between half the ceiling and the ceiling
+        delay = (as_utc(intent.next_attempt_at) - before).total_seconds()
+        assert ceiling / 2 - 1 <= delay <= ceiling + 1
+        # Not due again before the backoff elapses
+        assert payouts.dispatch_once(db, failing) == 0
+        make_due(db, intent_id)
+
+    assert payouts.dispatch_once(db, failing) == 1
+    intent = reload(db, intent_id)
+    assert (intent.status, intent.attempts) == ("failed", 3)
+
+
+def test_resend_after_a_crash_is_recorded_as_sent(db, make_intent, client):
+    intent_id = make_intent("w1@example.com", wallet="EQ-w1").id
+    assert payouts.dispatch_once(db, client) == 1
+
+    # The dispatcher crashed before recording the result: the intent is sent again
+    db.execute(
+        update(models.PayoutOutbox)
+        .where(models.PayoutOutbox.id == intent_id)
+        .values(status="pending", next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    db.commit()
+    assert payouts.dispatch_once(db, client) == 1
+
+    intent = reload(db, intent_id)
+    assert (intent.status, intent.attempts) == ("sent", 2)
+    assert len(client.batches) == 2  # The contract saw both messages but paid once
+
+
+def test_sender_must_be_the_task_poster(db, make_intent):
+    other_wallet = escrow_chain.SimulatedEscrowClient(sender_address="EQ-backend-wallet")
+    intent = make_intent("w1@example.com", wallet="EQ-w1")
+    other_wallet.register_task(intent.microjob_id, POSTER_WALLET)
+
+    assert payouts.dispatch_once(db, other_wallet) == 1
+
+    intent = reload(db, intent.id)
+    assert intent.status == "pending"
+    assert intent.last_error.startswith(f"exit code {escrow_chain.ERROR_NOT_TASK_POSTER}")
@@ -0,0 +1,100 @@
+"""Timer wheel: firing, cascading between levels, cancelling and rescheduling."""
+import pytest
+
+from app.core.scheduler import LEVEL_BITS, TimerWheel
+from app.services import mining_reminders
+
+START = 1_000_000
+
+
+def test_fires_at_the_deadline_and_not_before():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_at(7, START + 5)
+
+    assert list(wheel.advance(START + 4)) == []
+    assert list(wheel.advance(START + 5)) == [7]
+    assert len(wheel) == 0
+
+
+@pytest.mark.parametrize("delay", [
+    (1 << LEVEL_BITS[0]) + 3,                        # level 1
+    (1 << sum(LEVEL_BITS[:2])) + 17,                 # level 2
+    (1 << sum(LEVEL_BITS[:3])) + 65,                 # level 3
+])
+def test_cascades_from_higher_levels(delay):
+    wheel = TimerWheel(start=START)
+    wheel.schedule_at(1, START + delay)
+    wheel.schedule_at(2, START + 1)
+
+    assert list(wheel.advance(START + delay - 1)) == [2]
+    assert list(wheel.advance(START + delay)) == [1]
+
+
+def test_rounds_fractional_deadlines_up():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_at(3, START + 9.2)
+
+    assert list(wheel.advance(START + 9)) == []
+    assert list(wheel.advance(START + 10)) == [3]
+
+
+def test_past_deadline_fires_on_the_next_tick():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_at(4, START - 60)
+
+    assert list(wheel.advance(START)) == [4]
+
+
+def test_cancel():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_many([(1, START + 10), (2, START + 10)])
+    wheel.cancel(1)
+    wheel.cancel(99)  # Unknown keys are ignored
+
+    assert len(wheel) == 1
+    assert list(wheel.advance(START + 10)) == [2]
+
+
+def test_cancelled_timer_can_be_scheduled_again():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_at(5, START + 300)
+    wheel.cancel(5)
+    wheel.schedule_at(5, START + 600)
+
+    assert list(wheel.advance(START + 599)) == []
+    assert list(wheel.advance(START + 600)) == [5]
+
+
+def test_rescheduling_replaces_the_deadline():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_at(6, START + 10)
+    wheel.schedule_at(6, START + 400)  # Later, in a higher level
+    wheel.schedule_at(8, START + 400)
+    wheel.schedule_at(8, START + 20)  # Earlier
+
+    assert list(wheel.advance(START + 10)) == []
+    assert list(wheel.advance(START + 20)) == [8]
+    assert list(wheel.advance(START + 400)) == [6]
+    assert len(wheel) == 0
+
+
+def test_clear():
+    wheel = TimerWheel(start=START)
+    wheel.schedule_many([(key, START + 30) for key in range(10)])
+    wheel.clear()
+
+    assert len(wheel) == 0
+    assert list(wheel.advance(START + 30)) == []
+
+
+def test_due_reminders_reach_the_notifier_in_batches(monkeypatch):
+    notifier = mining_reminders.InMemoryNotifier()
+    monkeypatch.setattr(mining_reminders, "_notifier", notifier)
+    monkeypatch.setattr(mining_reminders.settings, "MINING_REMINDER_BATCH_SIZE", 2)
+    wheel = TimerWheel(start=START)
+    wheel.schedule_many([(key, START + 1) for key in (1, 2, 3, 4, 5)])
+    wheel.cancel(3)
+
+    mining_reminders.dispatch_due(wheel.advance(START + 1))
+
+    assert notifier.batches == [[1, 2], [4, 5]]